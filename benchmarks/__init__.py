@@ -0,0 +1,8 @@
+'''
+Host side benchmarks. They run on CPython on top of the mocked CircuitPython
+environment and the simulated clock of the unit tests, and print their results
+as JSON, so that they can be compared across commits.
+'''
+
+# Install the CircuitPython mocks before anything from kmk is imported.
+import tests  # noqa: F401
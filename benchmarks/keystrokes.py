@@ -0,0 +1,279 @@
+'''
+Replays a typing trace through a keyboard with a typical module stack and
+reports throughput, processing time per key event and memory allocated per key
+event.
+
+    python -m benchmarks.keystrokes --keystrokes 10000 --wpm 150
+
+A trace is a JSON list of `[time_ms, key_index, is_pressed]` events. Unless a
+recorded trace is given with `--trace`, a reproducible one is generated from
+`--seed`.
+'''
+import argparse
+import json
+import random
+import sys
+import tracemalloc
+from time import perf_counter_ns
+from unittest.mock import patch
+
+from kmk.hid import AbstractHID
+from kmk.keys import KC
+from kmk.kmktime import ticks_diff
+from kmk.modules.combos import Chord, Combos
+from kmk.modules.holdtap import HoldTap
+from kmk.modules.layers import Layers
+from kmk.modules.oneshot import OneShot
+from kmk.modules.string_substitution import StringSubstitution
+from kmk.scheduler import get_next_deadline
+from tests.keyboard_test import KeyboardTest
+from tests.mocks import clock
+
+# Key index of each character on the base layer. The home row keys are
+# mod-taps, numbers are on the top row of layer 1.
+LAYOUT = 'qwertyuiopasdfghjkl;zxcvbnm,./'
+SPACE = len(LAYOUT)
+ONESHOT_SHIFT = SPACE + 1
+LAYER_TAP = SPACE + 2
+
+HOME_ROW_MODS = {
+    'a': KC.LCTL,
+    's': KC.LALT,
+    'd': KC.LGUI,
+    'f': KC.LSFT,
+    'j': KC.RSFT,
+    'k': KC.RGUI,
+    'l': KC.RALT,
+    ';': KC.RCTL,
+}
+
+SUBSTITUTIONS = {
+    'teh': 'the',
+    'adn': 'and',
+    'waht': 'what',
+}
+
+WORDS = (
+    'the of and to in is you that it he was for on are as with his they at be '
+    'this have from or one had by word but not what all were we when your can '
+    'said there use an each which she do how their if will up other about out '
+    'many then them these so some her would make like him into time has look '
+    'two more write go see number no way could people my than first water been '
+    'call who oil its now find long down day did get come made may part teh adn'
+).split()
+
+
+def build_keyboard(chords=()):
+    '''
+    `chords` are additional `(key_index, key_index)` pairs to add combos for.
+    '''
+    modules = [Layers(), HoldTap(), OneShot()]
+    base = []
+    for char in LAYOUT:
+        key = KC[char]
+        if char in HOME_ROW_MODS:
+            key = KC.HT(key, HOME_ROW_MODS[char], prefer_hold=False, tap_time=200)
+        base.append(key)
+    base += [KC.SPC, KC.OS(KC.LSFT), KC.LT(1, KC.TAB)]
+
+    combos = Combos()
+    combos.combos = [
+        Chord((KC.W, KC.E), KC.ESC, timeout=30),
+        Chord((KC.X, KC.C), KC.TAB, timeout=30),
+        Chord((KC.COMM, KC.DOT), KC.ENT, timeout=30),
+    ]
+    combos.combos += [Chord((base[a], base[b]), KC.F13, timeout=30) for a, b in chords]
+    modules.append(combos)
+    modules.append(StringSubstitution(SUBSTITUTIONS))
+
+    numbers = [KC[str(n % 10)] for n in range(1, 11)]
+    numbers += [KC.TRNS] * (len(base) - len(numbers))
+
+    keyboard_test = KeyboardTest(modules, [base, numbers])
+    # The keyboard's state defaults are class attributes, shared by all
+    # instances; don't let keys stuck in a previous run leak into this one.
+    keyboard = keyboard_test.keyboard
+    keyboard.keys_pressed = set()
+    keyboard.axes = set()
+    keyboard._coordkeys_pressed = {}
+    keyboard.active_layers = [0]
+    return keyboard_test
+
+
+def generate_trace(keystrokes, wpm, seed):
+    '''
+    Simulate a typist: press intervals and hold durations are randomized, so
+    that consecutive keys frequently overlap (rolls).
+    '''
+    rng = random.Random(seed)
+    interval = 60_000 / (wpm * 5)
+    events = []
+    released = {}
+    now = 0.0
+
+    def press(key, hold=None):
+        nonlocal now
+        now = max(
+            now + max(10, rng.gauss(interval, interval / 3)),
+            released.get(key, 0) + 5,
+        )
+        if hold is None:
+            hold = max(30, rng.gauss(90, 25))
+        events.append((now, key, True))
+        events.append((now + hold, key, False))
+        released[key] = now + hold
+
+    sentence = 0
+    while len(events) < 2 * keystrokes:
+        if not sentence:
+            press(ONESHOT_SHIFT)
+        word = rng.choice(WORDS)
+        if rng.random() < 0.05:
+            # Numbers are typed while holding the layer-tap key.
+            digits = [rng.randrange(10) for _ in range(rng.randint(1, 4))]
+            hold = (len(digits) + 1) * interval + 50
+            press(LAYER_TAP, hold)
+            for digit in digits:
+                press(digit)
+            now = released[LAYER_TAP]
+        else:
+            for char in word:
+                press(LAYOUT.index(char))
+        sentence = (sentence + 1) % 12
+        if not sentence:
+            press(LAYOUT.index('.'))
+        press(SPACE)
+
+    events.sort(key=lambda e: (e[0], e[2]))
+    return [(int(t), key, pressed) for t, key, pressed in events]
+
+
+class Replay:
+    '''
+    Event driven replay on the simulated clock: the main loop runs once per
+    key event, and in between only as long as there's pending work or a task
+    falls due. All processing time up to the next key event is attributed to
+    the current one.
+    '''
+
+    loop_delay_ms = 1
+
+    def __init__(self, keyboard_test):
+        self.keyboard_test = keyboard_test
+        self.keyboard = keyboard_test.keyboard
+        self.reports = 0
+
+    def _hid_send(self, evt):
+        self.reports += 1
+
+    def run(self, trace, measure):
+        keyboard = self.keyboard
+        pins = self.keyboard_test.pins
+        samples = []
+        start = clock.now
+        self.reports = 0
+
+        with patch.object(AbstractHID, 'hid_send', self._hid_send):
+            for at, key, is_pressed in trace:
+                samples.append(0)
+                self._run_until(start + at, samples, measure)
+                pins[key].value = is_pressed
+                samples[-1] += measure(keyboard._main_loop)
+            self._run_until(clock.now + 10_000, samples, measure)
+
+        return samples
+
+    def _run_until(self, end, samples, measure):
+        keyboard = self.keyboard
+        while True:
+            if keyboard._resume_buffer or keyboard.hid_pending:
+                step = self.loop_delay_ms
+            else:
+                deadline = get_next_deadline()
+                if deadline is None:
+                    break
+                step = max(self.loop_delay_ms, ticks_diff(deadline, clock.ticks_ms()))
+            if clock.now + step > end:
+                break
+            clock.advance(step)
+            if samples:
+                samples[-1] += measure(keyboard._main_loop)
+        if end > clock.now:
+            clock.advance(end - clock.now)
+
+
+def measure_time(func):
+    start = perf_counter_ns()
+    func()
+    return perf_counter_ns() - start
+
+
+def measure_memory(func):
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    func()
+    return tracemalloc.get_traced_memory()[1] - current
+
+
+def percentiles(samples, scale=1):
+    samples = sorted(samples)
+    last = len(samples) - 1
+    return {
+        'mean': sum(samples) / len(samples) / scale,
+        'p50': samples[last * 50 // 100] / scale,
+        'p90': samples[last * 90 // 100] / scale,
+        'p99': samples[last * 99 // 100] / scale,
+        'max': samples[last] / scale,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.keystrokes', description=__doc__.split('\n')[1]
+    )
+    parser.add_argument('--keystrokes', type=int, default=10_000)
+    parser.add_argument('--wpm', type=int, default=150)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace', help='replay a recorded trace from this file')
+    parser.add_argument('--save-trace', help='save the replayed trace to this file')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc')
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        with open(args.trace) as f:
+            trace = [tuple(e) for e in json.load(f)]
+    else:
+        trace = generate_trace(args.keystrokes, args.wpm, args.seed)
+    if args.save_trace:
+        with open(args.save_trace, 'w') as f:
+            json.dump(trace, f)
+
+    replay = Replay(build_keyboard())
+
+    event_ns = replay.run(trace, measure_time)
+    busy_ns = sum(event_ns)
+    result = {
+        'benchmark': 'keystrokes',
+        'python': sys.version.split()[0],
+        'trace': {
+            'source': args.trace or f'generated(seed={args.seed}, wpm={args.wpm})',
+            'events': len(trace),
+            'duration_ms': trace[-1][0] - trace[0][0],
+        },
+        'hid_reports': replay.reports,
+        'busy_ms': busy_ns / 1e6,
+        'events_per_sec': len(trace) / busy_ns * 1e9,
+        'event_us': percentiles(event_ns, 1000),
+    }
+
+    if not args.no_memory:
+        tracemalloc.start()
+        result['event_alloc_bytes'] = percentiles(replay.run(trace, measure_memory))
+        tracemalloc.stop()
+
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
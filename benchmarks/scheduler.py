@@ -0,0 +1,72 @@
+'''
+Compares the scheduler backends under a combos heavy load: replays the typing
+trace of the keystroke benchmark through the same keyboard plus additional
+chords, which start and cancel a timeout per matching combo on every key press.
+
+    python -m benchmarks.scheduler --keystrokes 5000 --chords 60
+'''
+import argparse
+import json
+import random
+import sys
+from itertools import combinations
+
+from benchmarks.keystrokes import (
+    LAYOUT,
+    Replay,
+    build_keyboard,
+    generate_trace,
+    measure_time,
+    percentiles,
+)
+from kmk import scheduler
+from kmk.keys import KC
+
+BACKENDS = ('heap', 'wheel')
+
+
+def run(backend, trace, chords):
+    scheduler.set_backend(backend)
+    KC.clear()
+    replay = Replay(build_keyboard(chords))
+    event_ns = replay.run(trace, measure_time)
+    busy_ns = sum(event_ns)
+    return {
+        'hid_reports': replay.reports,
+        'busy_ms': busy_ns / 1e6,
+        'events_per_sec': len(trace) / busy_ns * 1e9,
+        'event_us': percentiles(event_ns, 1000),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.scheduler', description=__doc__.split('\n')[1]
+    )
+    parser.add_argument('--keystrokes', type=int, default=5_000)
+    parser.add_argument('--wpm', type=int, default=150)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chords', type=int, default=60)
+    parser.add_argument('--backend', choices=BACKENDS, action='append')
+    args = parser.parse_args(argv)
+
+    trace = generate_trace(args.keystrokes, args.wpm, args.seed)
+    pairs = list(combinations(range(len(LAYOUT)), 2))
+    chords = random.Random(args.seed).sample(pairs, args.chords)
+
+    result = {
+        'benchmark': 'scheduler',
+        'python': sys.version.split()[0],
+        'events': len(trace),
+        'chords': args.chords,
+    }
+    for backend in args.backend or BACKENDS:
+        result[backend] = run(backend, trace, chords)
+    scheduler.set_backend('heap')
+
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,7 @@ def bootcfg(
     keyboard: bool = True,
     midi: bool = True,
     mouse: bool = True,
+    mouse_16bit: bool = False,
     nkro: bool = False,
     storage: bool = True,
     usb_id: Optional[tuple[str, str]] = None,
@@ -43,14 +44,28 @@ def bootcfg(
     # configure HID devices
     devices = []
     if keyboard:
-        if nkro:
+        if nkro and boot_device == 1:
+            # BIOS needs a boot keyboard. Keys that don't fit into its 6KRO
+            # reports spill over into the NKRO keyboard.
+            from kmk.hid_reports import nkro_keyboard
+
+            devices.append(usb_hid.Device.KEYBOARD)
+            devices.append(
+                nkro_keyboard.nkro_keyboard(nkro_keyboard.SPILLOVER_REPORT_ID)
+            )
+        elif nkro:
             from kmk.hid_reports import nkro_keyboard
 
             devices.append(nkro_keyboard.NKRO_KEYBOARD)
         else:
             devices.append(usb_hid.Device.KEYBOARD)
     if mouse:
-        devices.append(usb_hid.Device.MOUSE)
+        if mouse_16bit:
+            from kmk.hid_reports import mouse_16bit
+
+            devices.append(mouse_16bit.MOUSE_16BIT)
+        else:
+            devices.append(usb_hid.Device.MOUSE)
     if consumer_control:
         devices.append(usb_hid.Device.CONSUMER_CONTROL)
     if devices:
@@ -36,9 +36,6 @@ class BuzzerType(Extension):
     def during_bootup(self, keyboard):
         return
 
-    def before_matrix_scan(self, keyboard):
-        return
-
     def after_matrix_scan(self, keyboard):
         if self.enable:
             if keyboard.matrix_update or keyboard.secondary_matrix_update:
@@ -50,12 +47,6 @@ class BuzzerType(Extension):
                     self.buzzer.duty_cycle = self.OFF
         return
 
-    def before_hid_send(self, keyboard):
-        return
-
-    def after_hid_send(self, keyboard):
-        return
-
     def on_powersave_enable(self, keyboard):
         self.enable = False
         return
@@ -15,6 +15,7 @@ class LockStatus(Extension):
         self.report = 0
         self.hid = None
         self._report_updated = False
+        self._report_mirrored = False
 
     def __repr__(self):
         return f'LockStatus(report={self.report})'
@@ -26,28 +27,24 @@ class LockStatus(Extension):
         if self.hid is None:
             raise RuntimeError
 
-    def before_matrix_scan(self, sandbox):
-        return
-
-    def after_matrix_scan(self, sandbox):
-        return
-
-    def before_hid_send(self, sandbox):
-        return
-
     def after_hid_send(self, sandbox):
         report = self.hid.get_last_received_report()
         if report is None:
-            self._report_updated = False
+            self._report_updated = self._report_mirrored
         else:
             self.report = report[0]
             self._report_updated = True
-
-    def on_powersave_enable(self, sandbox):
-        return
-
-    def on_powersave_disable(self, sandbox):
-        return
+        self._report_mirrored = False
+
+    def set_report(self, report):
+        '''
+        Mirror the lock status from elsewhere, i.e. the other half of a split
+        keyboard. A change counts as an update until the next HID send.
+        '''
+        if report != self.report:
+            self.report = report
+            self._report_updated = True
+            self._report_mirrored = True
 
     @property
     def report_updated(self):
@@ -50,15 +50,6 @@ class DisplayOLED(Extension):
         self._redraw_forced = True
         return
 
-    def before_matrix_scan(self, keyboard):
-        pass
-
-    def after_matrix_scan(self, sandbox):
-        pass
-
-    def before_hid_send(self, sandbox):
-        pass
-
     def after_hid_send(self, sandbox):
         if self._asleep:
             return
@@ -83,12 +74,6 @@ class DisplayOLED(Extension):
     def on_runtime_disable(self, keyboard):
         pass
 
-    def on_powersave_enable(self, keyboard):
-        pass
-
-    def on_powersave_disable(self, sandbox):
-        pass
-
     def _get_active_scene(self):
         if len(self._scenes) > self._current_scene:
             return self._scenes[self._current_scene]
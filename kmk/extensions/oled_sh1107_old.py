@@ -243,20 +243,6 @@ class Oled(Extension):
             self.updateOLED(sandbox)     
         return
 
-    def after_matrix_scan(self, sandbox):
-        # print("locks: ", self._locks.get_caps_lock())        
-        return
-
-    def before_hid_send(self, sandbox):
-        return
-
-    def after_hid_send(self, sandbox):
-        
-        # self.angle += 1
-        # self.rotate_cube(self.angle)
-        # self.draw_cube(self.splash, 60, 32, 30)
-        return
-
     def on_powersave_enable(self, sandbox):
         self.splash = displayio.Group()        
         gc.collect()
@@ -4,7 +4,7 @@ from math import e, exp, pi, sin
 from kmk.extensions import Extension
 from kmk.handlers.stock import passthrough as handler_passthrough
 from kmk.keys import make_key
-from kmk.scheduler import create_task
+from kmk.scheduler import MissedPeriods, Priority, create_task
 from kmk.utils import Debug, clamp
 
 debug = Debug(__name__)
@@ -229,22 +229,14 @@ class RGB(Extension):
             for n, pixels in enumerate(self.pixels):
                 debug(f'pixels[{n}] = {pixels.__class__}[{len(pixels)}]')
 
-        self._task = create_task(self.animate, period_ms=(1000 // self.refresh_rate))
-
-    def before_matrix_scan(self, sandbox):
-        return
-
-    def after_matrix_scan(self, sandbox):
-        return
-
-    def before_hid_send(self, sandbox):
-        return
-
-    def after_hid_send(self, sandbox):
-        pass
-
-    def on_powersave_enable(self, sandbox):
-        return
+        # Frames that are due while the main loop is busy are dropped.
+        self._task = create_task(
+            self.animate,
+            period_ms=(1000 // self.refresh_rate),
+            category='rgb',
+            missed=MissedPeriods.SKIP,
+            priority=Priority.BACKGROUND,
+        )
 
     def on_powersave_disable(self, sandbox):
         self._do_update()
@@ -162,14 +162,4 @@ class TFT(Extension):
             self.updatetft(sandbox)     
         return
 
-    def after_matrix_scan(self, sandbox):
-        # print("locks: ", self._locks.get_caps_lock())        
-        return
-
-    def before_hid_send(self, sandbox):
-        return
-
-    def after_hid_send(self, sandbox):
-        return
-
     
\ No newline at end of file
@@ -5,7 +5,8 @@ from micropython import const
 from storage import getmount
 
 from kmk.keys import FIRST_KMK_INTERNAL_KEY, ConsumerKey, ModifierKey, MouseKey
-from kmk.utils import Debug, clamp
+from kmk.kmktime import ticks_add, ticks_diff
+from kmk.utils import Debug, RingBuffer, clamp
 
 try:
     from adafruit_ble import BLERadio
@@ -32,6 +33,8 @@ class HIDReportTypes:
     MOUSE = 2
     CONSUMER = 3
     SYSCONTROL = 4
+    # N-key rollover keyboard that 6KRO reports spill over into, see `bootcfg`.
+    KEYBOARD_NKRO = 6
 
 
 class HIDUsage:
@@ -51,24 +54,62 @@ HID_REPORT_SIZES = {
     HIDReportTypes.MOUSE: 4,
     HIDReportTypes.CONSUMER: 2,
     HIDReportTypes.SYSCONTROL: 8,  # TODO find the correct value for this
+    HIDReportTypes.KEYBOARD_NKRO: 16,
 }
+# Mouse with 16-bit axes and horizontal scroll, see `bootcfg`.
+MOUSE_16BIT_REPORT_SIZE = const(9)
+
+# Reported in all key slots if more keys are pressed than fit into the report.
+ERROR_ROLLOVER = const(0x01)
+# The NKRO bitmap covers usage codes up to 0x77.
+NKRO_CODES = const(0x78)
+
+
+class _ReportFrame:
+    '''
+    A queued report. Frames hold a preallocated buffer for every report type,
+    `report` points to the one in use.
+    '''
+
+    def __init__(self, hid):
+        self.buffers = {
+            report[0]: bytearray(len(report))
+            for report in (hid._evt, hid._cc_report, hid._pd_report, hid._spill_report)
+            if report is not None
+        }
+        self.report = None
+        self.retries = 0
+        self.queued_at = 0
+
+
+def _has_code(report, code, start):
+    for idx in range(start, len(report)):
+        if report[idx] == code:
+            return True
+    return False
 
 
 class AbstractHID:
     REPORT_BYTES = 8
 
+    # Size of the output queue, and how often sending a report is retried,
+    # with exponential backoff starting at 1ms, before it's dropped.
+    queue_size = 16
+    send_retries = 5
+
+    # Whether there's an NKRO keyboard endpoint in addition to the 6KRO one.
+    spillover = False
+
     def __init__(self, **kwargs):
 
         self._evt = bytearray(self.REPORT_BYTES)
         self._evt[0] = HIDReportTypes.KEYBOARD
         self._nkro = False
 
-        # bodgy NKRO autodetect
-        try:
-            self.hid_send(self._evt)
+        if not self._probe_keyboard():
             if debug.enabled:
                 debug('use 6KRO')
-        except ValueError:
+        else:
             self.REPORT_BYTES = 17
             HID_REPORT_SIZES[HIDReportTypes.KEYBOARD] = 17
             self._evt = bytearray(self.REPORT_BYTES)
@@ -77,7 +118,10 @@ class AbstractHID:
             if debug.enabled:
                 debug('use NKRO')
 
+        # The last queued keyboard report, and the one before.
         self._prev_evt = bytearray(self.REPORT_BYTES)
+        self._base_evt = bytearray(self.REPORT_BYTES)
+        self._evt_pending = False
 
         # Landmine alert for HIDReportTypes.KEYBOARD: byte index 1 of this view
         # is "reserved" and evidently (mostly?) unused. However, other modes (or
@@ -94,33 +138,140 @@ class AbstractHID:
 
         self._pd_report = bytearray(HID_REPORT_SIZES[HIDReportTypes.MOUSE] + 1)
         self._pd_report[0] = HIDReportTypes.MOUSE
+        self._pd_16bit = False
+        if self._probe_pointer():
+            self._pd_16bit = True
+            self._pd_report = bytearray(MOUSE_16BIT_REPORT_SIZE + 1)
+            self._pd_report[0] = HIDReportTypes.MOUSE
+            if debug.enabled:
+                debug('use 16-bit mouse')
         self._pd_pending = False
 
+        # State of the incremental reports: the keys that are part of the
+        # reports, and reference counts of modifier bits, key codes and mouse
+        # buttons.
+        self._keys = set()
+        self._mod_refs = bytearray(8)
+        self._code_refs = bytearray(256)
+        self._pd_refs = bytearray(8)
+        self._cc_keys = []
+        self._axes_dirty = False
+
+        # 6KRO: the key codes in the slots of the report, and the codes that
+        # didn't fit. Those are reported through the spillover endpoint if
+        # there's one and the host uses the report protocol, and otherwise
+        # as ErrorRollOver.
+        self._slots = bytearray(self.REPORT_BYTES - 3)
+        self._overflow = []
+        self._rollover = False
+        self._spill_report = None
+        self._spill_active = False
+        self._spill_pending = False
+        if self.spillover and not self._nkro:
+            self._spill_report = bytearray(
+                HID_REPORT_SIZES[HIDReportTypes.KEYBOARD_NKRO] + 1
+            )
+            self._spill_report[0] = HIDReportTypes.KEYBOARD_NKRO
+            self._spill_bitmap = bytearray(len(self._spill_report) - 2)
+
+        self._queue = RingBuffer(self.queue_size, lambda: _ReportFrame(self))
+        self._retry_at = None
+        self.reports_sent = 0
+        self.reports_coalesced = 0
+        self.reports_dropped = 0
+        self.send_errors = 0
+        # Time in ms from queueing to sending a report, and queue depth.
+        self.send_latency = 0
+        self.send_latency_max = 0
+        self.queue_depth_max = 0
+
     def __repr__(self):
         return f'{self.__class__.__name__}(REPORT_BYTES={self.REPORT_BYTES})'
 
-    def create_report(self, keys_pressed, axes):
-        self.clear_all()
+    def _probe_keyboard(self):
+        '''
+        Return `True` if the keyboard endpoint expects NKRO reports.
+        '''
+        # bodgy NKRO autodetect: NKRO endpoints reject 6KRO reports because of
+        # their length.
+        try:
+            self.hid_send(self._evt)
+        except ValueError:
+            return True
+        return False
 
-        for key in keys_pressed:
-            if key.code >= FIRST_KMK_INTERNAL_KEY:
-                continue
+    def _probe_pointer(self):
+        '''
+        Return `True` if the mouse endpoint expects 16-bit reports.
+        '''
+        try:
+            self.hid_send(self._pd_report)
+        except ValueError:
+            return True
+        return False
 
-            if isinstance(key, ModifierKey):
-                self.add_modifier(key)
-            elif isinstance(key, ConsumerKey):
-                self.add_cc(key)
-            elif isinstance(key, MouseKey):
-                self.add_pd(key)
-            else:
-                self.add_key(key)
-                if key.has_modifiers:
-                    for mod in key.has_modifiers:
-                        self.add_modifier(mod)
+    @property
+    def boot_protocol(self):
+        '''
+        `True` if the host requested the boot keyboard protocol, i.e. BIOS.
+        '''
+        return False
 
+    def create_report(self, keys_pressed, axes=()):
+        '''
+        Update the reports in place with the keys that have been pressed or
+        released since the last call. Reports that don't change aren't touched,
+        and don't have to be sent again.
+        '''
+        keys = self._keys
+        if keys_pressed != keys:
+            for key in keys.difference(keys_pressed):
+                keys.discard(key)
+                self._remove_report_key(key)
+            for key in keys_pressed.difference(keys):
+                keys.add(key)
+                self._add_report_key(key)
+
+        # Axes are relative: motion is only ever reported once.
+        if self._axes_dirty:
+            self.clear_axis()
         for axis in axes:
             self.move_axis(axis)
 
+        return self
+
+    def _add_report_key(self, key):
+        if key.code >= FIRST_KMK_INTERNAL_KEY:
+            return
+
+        if isinstance(key, ModifierKey):
+            self.add_modifier(key)
+        elif isinstance(key, ConsumerKey):
+            self.add_cc(key)
+        elif isinstance(key, MouseKey):
+            self.add_pd(key)
+        else:
+            self.add_key(key)
+            if key.has_modifiers:
+                for mod in key.has_modifiers:
+                    self.add_modifier(mod)
+
+    def _remove_report_key(self, key):
+        if key.code >= FIRST_KMK_INTERNAL_KEY:
+            return
+
+        if isinstance(key, ModifierKey):
+            self.remove_modifier(key)
+        elif isinstance(key, ConsumerKey):
+            self.remove_cc(key)
+        elif isinstance(key, MouseKey):
+            self.remove_pd(key)
+        else:
+            self.remove_key(key)
+            if key.has_modifiers:
+                for mod in key.has_modifiers:
+                    self.remove_modifier(mod)
+
     def hid_send(self, evt):
         # Don't raise a NotImplementedError so this can serve as our "dummy" HID
         # when MCU/board doesn't define one to use (which should almost always be
@@ -130,24 +281,196 @@ class AbstractHID:
         pass
 
     def send(self):
-        if self._evt != self._prev_evt:
-            self._prev_evt[:] = self._evt
-            self.hid_send(self._evt)
+        '''
+        Queue all reports that changed since the last call and send them.
+        '''
+        self.queue_reports()
+        self.flush()
+        return self
+
+    @property
+    def queued(self):
+        return len(self._queue)
+
+    @property
+    def pending(self):
+        '''
+        `True` if reports are queued, or have to be queued again after the
+        latest state of an endpoint was dropped.
+        '''
+        return bool(
+            self._queue or self._evt_pending or self._cc_pending or self._spill_pending
+        )
+
+    def queue_reports(self):
+        if self._spill_report is not None:
+            # The host may switch between boot and report protocol at any time.
+            if self._spill_active == self.boot_protocol:
+                self._spill_active = not self._spill_active
+                self._update_overflow()
+
+        if self._evt_pending or self._evt != self._prev_evt:
+            self._queue_keyboard_report()
+
+        if self._spill_pending:
+            self._queue_report(self._spill_report)
+            self._spill_pending = False
 
         if self._cc_pending:
-            self.hid_send(self._cc_report)
+            self._queue_report(self._cc_report)
             self._cc_pending = False
 
         if self._pd_pending:
-            self.hid_send(self._pd_report)
+            self._queue_report(self._pd_report)
             self._pd_pending = False
 
-        return self
+    def _queue_keyboard_report(self):
+        evt = self._evt
+        queue = self._queue
+        self._evt_pending = False
+
+        # Merge into the previous keyboard report if it hasn't been sent yet,
+        # and doesn't have to be observed by the host.
+        if queue:
+            frame = queue.peek(-1)
+            if frame.report[0] == evt[0] and self._can_coalesce(
+                self._base_evt, frame.report, evt
+            ):
+                frame.report[:] = evt
+                self._prev_evt[:] = evt
+                self.reports_coalesced += 1
+                return
+
+        self._base_evt[:] = self._prev_evt
+        self._prev_evt[:] = evt
+        self._queue_report(evt)
+
+    def _can_coalesce(self, before, skipped, after):
+        '''
+        A report can be skipped, if it doesn't contain anything that isn't also
+        in the report before or after it (i.e. a tap), and isn't missing
+        anything that is in both of them (i.e. a release and re-press).
+        '''
+        if self._nkro:
+            end = len(skipped)
+        else:
+            end = 2
+        for idx in range(1, end):
+            if skipped[idx] & ~(before[idx] | after[idx]):
+                return False
+            if before[idx] & after[idx] & ~skipped[idx]:
+                return False
+        if self._nkro:
+            return True
+
+        for idx in range(3, len(skipped)):
+            code = skipped[idx]
+            if code and not (_has_code(before, code, 3) or _has_code(after, code, 3)):
+                return False
+            code = before[idx]
+            if code and _has_code(after, code, 3) and not _has_code(skipped, code, 3):
+                return False
+        return True
+
+    def _queue_report(self, report):
+        queue = self._queue
+        if queue.full:
+            self.flush()
+
+        frame = queue.reserve()
+        if frame is None:
+            # The endpoint has been busy for too long: drop the oldest report.
+            self._drop_report(report[0])
+            frame = queue.reserve()
+
+        frame.report = frame.buffers[report[0]]
+        frame.report[:] = report
+        frame.retries = 0
+        frame.queued_at = supervisor.ticks_ms()
+        if len(queue) > self.queue_depth_max:
+            self.queue_depth_max = len(queue)
+
+    def _drop_report(self, superseded_by=None):
+        '''
+        Drop the oldest queued report. If it was the latest state of the
+        keyboard or consumer control endpoint, that state is queued again on
+        the next `send`, unless a report of the same type is about to be queued
+        anyway. Otherwise a dropped release would leave a key stuck.
+        '''
+        queue = self._queue
+        report_type = queue.popleft().report[0]
+        self.reports_dropped += 1
+        if report_type == superseded_by:
+            return
+        for idx in range(len(queue)):
+            if queue.peek(idx).report[0] == report_type:
+                return
+
+        if report_type == self._evt[0]:
+            self._evt_pending = True
+        elif self._spill_report is not None and report_type == self._spill_report[0]:
+            self._spill_pending = True
+        elif report_type == self._cc_report[0]:
+            self._cc_pending = True
+
+    def flush(self):
+        '''
+        Send queued reports, until the endpoint is busy.
+        '''
+        queue = self._queue
+        if not queue:
+            return
+        if (
+            self._retry_at is not None
+            and ticks_diff(self._retry_at, supervisor.ticks_ms()) > 0
+        ):
+            return
+        self._retry_at = None
+
+        while queue:
+            frame = queue.peek()
+            try:
+                self.hid_send(frame.report)
+            except Exception as err:
+                self.send_errors += 1
+                if debug.enabled:
+                    debug('send failed: ', err)
+                # Only a busy endpoint is worth retrying; anything else, like a
+                # missing endpoint, would stall the reports behind this one.
+                if not isinstance(err, OSError):
+                    queue.popleft()
+                    self.reports_dropped += 1
+                    continue
+                if frame.retries >= self.send_retries:
+                    self._drop_report()
+                    continue
+                self._retry_at = ticks_add(supervisor.ticks_ms(), 1 << frame.retries)
+                frame.retries += 1
+                return
+            queue.popleft()
+            self.reports_sent += 1
+            self.send_latency = ticks_diff(supervisor.ticks_ms(), frame.queued_at)
+            if self.send_latency > self.send_latency_max:
+                self.send_latency_max = self.send_latency
+
+    def on_powersave_enable(self):
+        pass
+
+    def on_powersave_disable(self):
+        pass
 
     def clear_all(self):
         for idx, _ in enumerate(self.report_keys):
             self.report_keys[idx] = 0x00
 
+        self._keys.clear()
+        self._clear_refs(self._mod_refs)
+        self._clear_refs(self._code_refs)
+        self._clear_refs(self._slots)
+        self._overflow.clear()
+        self._rollover = False
+        self._update_overflow()
+
         self.remove_cc()
         self.remove_pd()
         self.clear_axis()
@@ -155,95 +478,218 @@ class AbstractHID:
         return self
 
     def clear_non_modifiers(self):
-        for idx, _ in enumerate(self.report_non_mods):
-            self.report_non_mods[idx] = 0x00
+        # Keys that are still pressed are added back on the next report.
+        for key in [
+            key
+            for key in self._keys
+            if not isinstance(key, (ModifierKey, ConsumerKey, MouseKey))
+        ]:
+            self._keys.discard(key)
+            self._remove_report_key(key)
 
         return self
 
-    def add_modifier(self, modifier):
+    def _clear_refs(self, refs):
+        for idx in range(len(refs)):
+            refs[idx] = 0
+
+    def _modifier_mask(self, modifier):
         if isinstance(modifier, ModifierKey):
             if modifier.code == ModifierKey.FAKE_CODE:
+                mask = 0
                 for mod in modifier.has_modifiers:
-                    self.report_mods[0] |= mod
-            else:
-                self.report_mods[0] |= modifier.code
-        else:
-            self.report_mods[0] |= modifier
+                    mask |= mod
+                return mask
+            return modifier.code
+        return modifier
+
+    def add_modifier(self, modifier):
+        # Modifier bits are reference counted: the same modifier may be held by
+        # several keys at once.
+        mask = self._modifier_mask(modifier)
+        refs = self._mod_refs
+        for bit in range(8):
+            if mask & (1 << bit):
+                refs[bit] += 1
+        self.report_mods[0] |= mask
 
         return self
 
     def remove_modifier(self, modifier):
-        if isinstance(modifier, ModifierKey):
-            if modifier.code == ModifierKey.FAKE_CODE:
-                for mod in modifier.has_modifiers:
-                    self.report_mods[0] ^= mod
-            else:
-                self.report_mods[0] ^= modifier.code
-        else:
-            self.report_mods[0] ^= modifier
+        mask = self._modifier_mask(modifier)
+        refs = self._mod_refs
+        for bit in range(8):
+            if mask & (1 << bit) and refs[bit]:
+                refs[bit] -= 1
+                if not refs[bit]:
+                    self.report_mods[0] &= ~(1 << bit)
 
         return self
 
     def add_key(self, key):
+        # Key codes are reference counted as well, different keys may send the
+        # same code, i.e. `KC.N2` and `KC.AT`.
+        code = key.code
+        refs = self._code_refs
+        refs[code] += 1
+        if refs[code] > 1:
+            return
+
         if not self._nkro:
             # Try to find the first empty slot in the key report, and fill it
-            idx = self._evt.find(b'\x00', 3)
+            idx = self._slots.find(b'\x00')
 
-            if idx < len(self._evt):
-                self._evt[idx] = key.code
+            if idx >= 0:
+                self._slots[idx] = code
+                if not self._rollover:
+                    self._evt[idx + 3] = code
             else:
-                # TODO what do we do here?......
-                pass
+                # Keep it until a slot becomes available.
+                self._overflow.append(code)
+                self._update_overflow()
         else:
-            self.report_keys[(key.code >> 3) + 1] |= 1 << (key.code & 0x07)
+            self.report_keys[(code >> 3) + 1] |= 1 << (code & 0x07)
 
     def remove_key(self, key):
+        code = key.code
+        refs = self._code_refs
+        if not refs[code]:
+            return
+        refs[code] -= 1
+        if refs[code]:
+            return
+
         if not self._nkro:
-            code = key.code.to_bytes(1, 'little')
-            idx = self._evt.find(code, 3)
-            self._evt[idx] = 0x00
+            if code in self._overflow:
+                self._overflow.remove(code)
+                self._update_overflow()
+                return
+            idx = self._slots.find(code.to_bytes(1, 'little'))
+            if idx >= 0:
+                if self._overflow:
+                    self._slots[idx] = self._overflow.pop(0)
+                else:
+                    self._slots[idx] = 0x00
+                if not self._rollover:
+                    self._evt[idx + 3] = self._slots[idx]
+                self._update_overflow()
         else:
-            self.report_keys[(key.code >> 3) + 1] &= ~(1 << (key.code & 0x07))
+            self.report_keys[(code >> 3) + 1] &= ~(1 << (code & 0x07))
+
+    def _update_overflow(self):
+        '''
+        Report the 6KRO overflow, either through the spillover endpoint or as
+        ErrorRollOver.
+        '''
+        overflow = self._overflow
+        spill = self._spill_active
+        for code in overflow:
+            if code >= NKRO_CODES:
+                spill = False
+
+        report = self._spill_report
+        if report is not None:
+            # Rebuild the bitmap in place, this runs on every key event while
+            # the report overflows.
+            bitmap = self._spill_bitmap
+            for idx in range(len(bitmap)):
+                bitmap[idx] = 0
+            if spill:
+                for code in overflow:
+                    bitmap[code >> 3] |= 1 << (code & 0x07)
+            for idx in range(len(bitmap)):
+                if report[idx + 2] != bitmap[idx]:
+                    report[idx + 2] = bitmap[idx]
+                    self._spill_pending = True
+
+        rollover = bool(overflow) and not spill
+        if rollover != self._rollover:
+            self._rollover = rollover
+            if rollover:
+                for idx in range(3, len(self._evt)):
+                    self._evt[idx] = ERROR_ROLLOVER
+            else:
+                self._evt[3:] = self._slots
 
     def add_cc(self, cc):
-        # Add (or write over) consumer control report. There can only be one CC
-        # active at any time.
-        memoryview(self._cc_report)[1:3] = cc.code.to_bytes(2, 'little')
-        self._cc_pending = True
-
-    def remove_cc(self):
-        # Remove consumer control report.
-        report = memoryview(self._cc_report)[1:3]
-        if report != b'\x00\x00':
-            report[:] = b'\x00\x00'
+        # There can only be one CC active at any time: the last one pressed.
+        self._cc_keys.append(cc)
+        self._set_cc(cc.code)
+
+    def remove_cc(self, cc=None):
+        # Remove consumer control report, or fall back to the previous CC
+        # that's still pressed.
+        if cc is None:
+            self._cc_keys.clear()
+        elif cc in self._cc_keys:
+            self._cc_keys.remove(cc)
+        self._set_cc(self._cc_keys[-1].code if self._cc_keys else 0)
+
+    def _set_cc(self, code):
+        report = self._cc_report
+        if report[1] | (report[2] << 8) != code:
+            report[1] = code & 0xFF
+            report[2] = code >> 8
             self._cc_pending = True
 
     def add_pd(self, key):
-        self._pd_report[1] |= key.code
-        self._pd_pending = True
-
-    def remove_pd(self):
-        if self._pd_report[1]:
+        refs = self._pd_refs
+        for bit in range(8):
+            if key.code & (1 << bit):
+                refs[bit] += 1
+        if key.code & ~self._pd_report[1]:
+            self._pd_report[1] |= key.code
             self._pd_pending = True
-            self._pd_report[1] = 0x00
+
+    def remove_pd(self, key=None):
+        if key is None:
+            self._clear_refs(self._pd_refs)
+            if self._pd_report[1]:
+                self._pd_pending = True
+                self._pd_report[1] = 0x00
+            return
+
+        refs = self._pd_refs
+        for bit in range(8):
+            if key.code & (1 << bit) and refs[bit]:
+                refs[bit] -= 1
+                if not refs[bit]:
+                    self._pd_report[1] &= ~(1 << bit)
+                    self._pd_pending = True
 
     def move_axis(self, axis):
-        delta = clamp(axis.delta, -127, 127)
+        report = self._pd_report
+        if self._pd_16bit:
+            delta = clamp(axis.delta, -32767, 32767)
+            idx = 2 * axis.code + 2
+            report[idx] = 0xFF & delta
+            report[idx + 1] = 0xFF & (delta >> 8)
+        elif axis.code + 2 < len(report):
+            delta = clamp(axis.delta, -127, 127)
+            report[axis.code + 2] = 0xFF & delta
+        else:
+            # Axis isn't supported by the 8-bit mouse: discard, nothing to send.
+            axis.delta = 0
+            return
         axis.delta -= delta
-        self._pd_report[axis.code + 2] = 0xFF & delta
         self._pd_pending = True
+        self._axes_dirty = True
 
     def clear_axis(self):
         for idx in range(2, len(self._pd_report)):
             self._pd_report[idx] = 0x00
+        self._axes_dirty = False
 
     def has_key(self, key):
         if isinstance(key, ModifierKey):
             return bool(self.report_mods[0] & key.code)
         else:
             if not self._nkro:
-                code = key.code.to_bytes(1, 'little')
-                return self.report_non_mods.find(code) > 0
+                if self._rollover:
+                    return False
+                if self._spill_active and key.code in self._overflow:
+                    return True
+                return self._slots.find(key.code.to_bytes(1, 'little')) >= 0
             else:
                 part = self.report_keys[(key.code >> 3) + 1]
                 return bool(part & (1 << (key.code & 0x07)))
@@ -256,6 +702,7 @@ class USBHID(AbstractHID):
     def __init__(self, **kwargs):
 
         self.devices = {}
+        keyboards = []
 
         for device in usb_hid.devices:
             us = device.usage
@@ -264,14 +711,34 @@ class USBHID(AbstractHID):
             if up == HIDUsagePage.CONSUMER and us == HIDUsage.CONSUMER:
                 self.devices[HIDReportTypes.CONSUMER] = device
             elif up == HIDUsagePage.KEYBOARD and us == HIDUsage.KEYBOARD:
-                self.devices[HIDReportTypes.KEYBOARD] = device
+                keyboards.append(device)
             elif up == HIDUsagePage.MOUSE and us == HIDUsage.MOUSE:
                 self.devices[HIDReportTypes.MOUSE] = device
             elif up == HIDUsagePage.SYSCONTROL and us == HIDUsage.SYSCONTROL:
                 self.devices[HIDReportTypes.SYSCONTROL] = device
 
+        if keyboards:
+            self.devices[HIDReportTypes.KEYBOARD] = keyboards[0]
+        if len(keyboards) > 1:
+            # `bootcfg` sets up the boot keyboard first, and the NKRO keyboard
+            # to spill over into second.
+            self.devices[HIDReportTypes.KEYBOARD_NKRO] = keyboards[1]
+            self.spillover = True
+
         super().__init__(**kwargs)
 
+    def _probe_pointer(self):
+        if HIDReportTypes.MOUSE not in self.devices:
+            return False
+        return super()._probe_pointer()
+
+    @property
+    def boot_protocol(self):
+        # Not available before CircuitPython 8.
+        if not hasattr(usb_hid, 'get_boot_device'):
+            return False
+        return usb_hid.get_boot_device() == 1
+
     def hid_send(self, evt):
         if not supervisor.runtime.usb_connected:
             return
@@ -279,9 +746,8 @@ class USBHID(AbstractHID):
         # int, can be looked up in HIDReportTypes
         reporting_device_const = evt[0]
 
-        return self.devices[reporting_device_const].send_report(
-            evt[1 : HID_REPORT_SIZES[reporting_device_const] + 1]
-        )
+        # Reports are allocated with the size of the endpoint's reports.
+        return self.devices[reporting_device_const].send_report(evt[1:])
 
 
 class BLEHID(AbstractHID):
@@ -289,15 +755,34 @@ class BLEHID(AbstractHID):
     # Hardcoded in CPy
     MAX_CONNECTIONS = const(2)
 
-    def __init__(self, ble_name=str(getmount('/').label), **kwargs):
-        super().__init__(**kwargs)
-
+    # Connection profiles: connection interval in ms, and for how long reports
+    # are collected before they're sent together in one connection event.
+    # 'default' leaves the connection interval to the host and doesn't batch.
+    PROFILES = {
+        'default': (None, 0),
+        'gaming': (7.5, 0),
+        'balanced': (15, 5),
+        'battery': (60, 30),
+    }
+    POWERSAVE_PROFILE = 'battery'
+
+    def __init__(
+        self, ble_name=str(getmount('/').label), ble_profile='default', **kwargs
+    ):
         self.ble_name = ble_name
         self.ble = BLERadio()
         self.ble.name = self.ble_name
         self.hid = HIDService()
         self.hid.protocol_mode = 0  # Boot protocol
 
+        self.profile = None
+        self._batch_time = 0
+        self._last_flush = None
+        self._tuned_connections = []
+        self.set_profile(ble_profile)
+
+        super().__init__(**kwargs)
+
         # Security-wise this is not right. While you're away someone turns
         # on your keyboard and they can pair with it nice and clean and then
         # listen to keystrokes.
@@ -339,6 +824,74 @@ class BLEHID(AbstractHID):
 
         return result
 
+    def _probe_pointer(self):
+        # The mouse of `HIDService` has a fixed 8-bit report.
+        return False
+
+    def set_profile(self, profile):
+        '''
+        Select one of the connection `PROFILES` by name.
+        '''
+        if profile not in self.PROFILES:
+            raise ValueError(f'unknown BLE profile {profile}')
+        self._selected_profile = profile
+        self._use_profile(profile)
+
+    def _use_profile(self, profile):
+        if profile == self.profile:
+            return
+        self.profile = profile
+        self._batch_time = self.PROFILES[profile][1]
+        self._tuned_connections.clear()
+        if debug.enabled:
+            debug('BLE profile ', profile)
+
+    def _tune_connections(self):
+        # Hosts have to pair for HID, the split connection doesn't: don't touch
+        # the latter. Every connection is only asked once, hosts may choose a
+        # different interval.
+        interval = self.PROFILES[self.profile][0]
+        if interval is None:
+            return
+        connections = self.ble.connections
+        tuned = self._tuned_connections
+        if len(tuned) > len(connections):
+            self._tuned_connections = tuned = [c for c in tuned if c.connected]
+        for connection in connections:
+            if connection in tuned or not connection.paired:
+                continue
+            try:
+                connection.connection_interval = interval
+            except Exception as err:
+                if debug.enabled:
+                    debug('connection_interval: ', err)
+            tuned.append(connection)
+
+    def on_powersave_enable(self):
+        # Only if a profile has been opted into.
+        if self._selected_profile != 'default':
+            self._use_profile(self.POWERSAVE_PROFILE)
+
+    def on_powersave_disable(self):
+        self._use_profile(self._selected_profile)
+
+    def flush(self):
+        if not self.queued:
+            return
+        # Batch notifications: after sending, reports are collected for the
+        # batch time and then sent together.
+        now = supervisor.ticks_ms()
+        if (
+            self._batch_time
+            and self._last_flush is not None
+            and ticks_diff(now, self._last_flush) < self._batch_time
+        ):
+            return
+        self._last_flush = now
+        if self.ble.connected:
+            self._tune_connections()
+        super().flush()
+
     def hid_send(self, evt):
         if not self.ble.connected:
             return
@@ -1,4 +1,8 @@
 import usb_hid
+from micropython import const
+
+# Report id of the NKRO keyboard next to a boot keyboard, see `bootcfg`.
+SPILLOVER_REPORT_ID = const(0x06)
 
 report_descriptor = bytes(
     (
@@ -67,11 +71,18 @@ report_descriptor = bytes(
     )
 )
 
-NKRO_KEYBOARD = usb_hid.Device(
-    report_descriptor=report_descriptor,
-    usage_page=0x01,
-    usage=0x06,
-    report_ids=(0x01,),
-    in_report_lengths=(16,),
-    out_report_lengths=(1,),
-)
+
+def nkro_keyboard(report_id=0x01):
+    descriptor = bytearray(report_descriptor)
+    descriptor[7] = report_id  # Report ID
+    return usb_hid.Device(
+        report_descriptor=bytes(descriptor),
+        usage_page=0x01,
+        usage=0x06,
+        report_ids=(report_id,),
+        in_report_lengths=(16,),
+        out_report_lengths=(1,),
+    )
+
+
+NKRO_KEYBOARD = nkro_keyboard()
@@ -5,6 +5,8 @@ except ImportError:
 
 from micropython import const
 
+from array import array
+
 import kmk.handlers.stock as handlers
 from kmk.consts import UnicodeMode
 from kmk.key_validators import key_seq_sleep_validator, unicode_mode_key_validator
@@ -35,15 +37,27 @@ debug = Debug(__name__)
 
 
 class Axis:
+    # Motion is accumulated in fixed point with this many sub-counts per count,
+    # so that slow, fractional motion adds up instead of being truncated.
+    SUBCOUNTS = const(256)
+
     def __init__(self, code: int) -> None:
         self.code = code
         self.delta = 0
+        self._subcounts = 0
 
     def __repr__(self) -> str:
         return f'Axis(code={self.code}, delta={self.delta})'
 
-    def move(self, keyboard: Keyboard, delta: int):
-        self.delta += delta
+    def move(self, keyboard: Keyboard, delta: [int, float]):
+        subcounts = self._subcounts + int(delta * self.SUBCOUNTS)
+        if subcounts >= 0:
+            counts = subcounts // self.SUBCOUNTS
+        else:
+            counts = -(-subcounts // self.SUBCOUNTS)
+        self._subcounts = subcounts - counts * self.SUBCOUNTS
+
+        self.delta += counts
         if self.delta:
             keyboard.axes.add(self)
             keyboard.hid_pending = True
@@ -55,373 +69,285 @@ class AX:
     W = Axis(2)
     X = Axis(0)
     Y = Axis(1)
+    # Horizontal scroll, only reported by the 16-bit mouse, see `bootcfg`.
+    P = Axis(3)
 
 
-def maybe_make_key(
-    code: Optional[int],
-    names: Tuple[str, ...],
-    *args,
-    **kwargs,
-) -> Callable[[str], Key]:
-    def closure(candidate):
-        if candidate in names:
-            return make_key(code=code, names=names, *args, **kwargs)
+def _make_code_key(code: int, names: Tuple[str, ...]) -> Key:
+    return make_key(code=code, names=names)
 
-    return closure
 
+def _make_mod_key(code: int, names: Tuple[str, ...]) -> Key:
+    return make_key(code=code, names=names, type=KeyType.MODIFIER)
 
-def maybe_make_argumented_key(
-    validator=lambda *validator_args, **validator_kwargs: object(),
-    names: Tuple[str, ...] = tuple(),  # NOQA
-    *constructor_args,
-    **constructor_kwargs,
-) -> Callable[[str], Key]:
-    def closure(candidate):
-        if candidate in names:
-            return make_argumented_key(
-                validator, names, *constructor_args, **constructor_kwargs
-            )
 
-    return closure
+def _make_shifted_key(code: int, names: Tuple[str, ...]) -> Key:
+    return make_key(code=code, names=names, has_modifiers={KC.LSFT.code})
 
 
-def maybe_make_no_key(candidate: str) -> Optional[Key]:
+def _make_no_key(names: Tuple[str, ...]) -> Key:
     # NO and TRNS are functionally identical in how they (don't) mutate
     # the state, but are tracked semantically separately, so create
     # two keys with the exact same functionality
-    keys = (
-        ('NO', 'XXXXXXX'),
-        ('TRANSPARENT', 'TRNS'),
+    return make_key(
+        names=names,
+        on_press=handlers.passthrough,
+        on_release=handlers.passthrough,
     )
 
-    for names in keys:
-        if candidate in names:
-            return make_key(
-                names=names,
-                on_press=handlers.passthrough,
-                on_release=handlers.passthrough,
-            )
 
+def _make_firmware_key(handler: Callable, names: Tuple[str, ...]) -> Key:
+    return make_key(names=names, on_press=handler)
 
-def maybe_make_alpha_key(candidate: str) -> Optional[Key]:
-    if len(candidate) != 1:
-        return
 
-    candidate_upper = candidate.upper()
-    if candidate_upper in ALL_ALPHAS:
-        return make_key(
-            code=4 + ALL_ALPHAS.index(candidate_upper),
-            names=(candidate_upper, candidate.lower()),
-        )
-
-
-def maybe_make_numeric_key(candidate: str) -> Optional[Key]:
-    if candidate in ALL_NUMBERS or candidate in ALL_NUMBER_ALIASES:
-        try:
-            offset = ALL_NUMBERS.index(candidate)
-        except ValueError:
-            offset = ALL_NUMBER_ALIASES.index(candidate)
-
-        return make_key(
-            code=30 + offset,
-            names=(ALL_NUMBERS[offset], ALL_NUMBER_ALIASES[offset]),
-        )
-
-
-def maybe_make_mod_key(candidate: str) -> Optional[Key]:
-    # MEH = LCTL | LALT | LSFT
-    # HYPR = LCTL | LALT | LSFT | LGUI
-    mods = (
-        (0x01, ('LEFT_CONTROL', 'LCTRL', 'LCTL')),
-        (0x02, ('LEFT_SHIFT', 'LSHIFT', 'LSFT')),
-        (0x04, ('LEFT_ALT', 'LALT', 'LOPT')),
-        (0x08, ('LEFT_SUPER', 'LGUI', 'LCMD', 'LWIN')),
-        (0x10, ('RIGHT_CONTROL', 'RCTRL', 'RCTL')),
-        (0x20, ('RIGHT_SHIFT', 'RSHIFT', 'RSFT')),
-        (0x40, ('RIGHT_ALT', 'RALT', 'ROPT')),
-        (0x80, ('RIGHT_SUPER', 'RGUI', 'RCMD', 'RWIN')),
-        (0x07, ('MEH',)),
-        (0x0F, ('HYPER', 'HYPR')),
+def _make_unicode_mode_key(mode: int, names: Tuple[str, ...]) -> Key:
+    return make_key(
+        names=names,
+        on_press=handlers.uc_mode_pressed,
+        meta=UnicodeModeKeyMeta(mode),
     )
 
-    for code, names in mods:
-        if candidate in names:
-            return make_key(code=code, names=names, type=KeyType.MODIFIER)
-
-
-def maybe_make_more_ascii(candidate: str) -> Optional[Key]:
-    codes = (
-        (40, ('ENTER', 'ENT', '\n')),
-        (41, ('ESCAPE', 'ESC')),
-        (42, ('BACKSPACE', 'BSPACE', 'BSPC', 'BKSP')),
-        (43, ('TAB', '\t')),
-        (44, ('SPACE', 'SPC', ' ')),
-        (45, ('MINUS', 'MINS', '-')),
-        (46, ('EQUAL', 'EQL', '=')),
-        (47, ('LBRACKET', 'LBRC', '[')),
-        (48, ('RBRACKET', 'RBRC', ']')),
-        (49, ('BACKSLASH', 'BSLASH', 'BSLS', '\\')),
-        (51, ('SEMICOLON', 'SCOLON', 'SCLN', ';')),
-        (52, ('QUOTE', 'QUOT', "'")),
-        (53, ('GRAVE', 'GRV', 'ZKHK', '`')),
-        (54, ('COMMA', 'COMM', ',')),
-        (55, ('DOT', '.')),
-        (56, ('SLASH', 'SLSH', '/')),
-    )
-
-    for code, names in codes:
-        if candidate in names:
-            return make_key(code=code, names=names)
-
-
-def maybe_make_fn_key(candidate: str) -> Optional[Key]:
-    codes = (
-        (58, ('F1',)),
-        (59, ('F2',)),
-        (60, ('F3',)),
-        (61, ('F4',)),
-        (62, ('F5',)),
-        (63, ('F6',)),
-        (64, ('F7',)),
-        (65, ('F8',)),
-        (66, ('F9',)),
-        (67, ('F10',)),
-        (68, ('F11',)),
-        (69, ('F12',)),
-        (104, ('F13',)),
-        (105, ('F14',)),
-        (106, ('F15',)),
-        (107, ('F16',)),
-        (108, ('F17',)),
-        (109, ('F18',)),
-        (110, ('F19',)),
-        (111, ('F20',)),
-        (112, ('F21',)),
-        (113, ('F22',)),
-        (114, ('F23',)),
-        (115, ('F24',)),
-    )
 
-    for code, names in codes:
-        if candidate in names:
-            return make_key(code=code, names=names)
-
-
-def maybe_make_navlock_key(candidate: str) -> Optional[Key]:
-    codes = (
-        (57, ('CAPS_LOCK', 'CAPSLOCK', 'CLCK', 'CAPS')),
-        # FIXME: Investigate whether this key actually works, and
-        #        uncomment when/if it does.
-        # (130, ('LOCKING_CAPS', 'LCAP')),
-        (70, ('PRINT_SCREEN', 'PSCREEN', 'PSCR')),
-        (71, ('SCROLL_LOCK', 'SCROLLLOCK', 'SLCK')),
-        # FIXME: Investigate whether this key actually works, and
-        #        uncomment when/if it does.
-        # (132, ('LOCKING_SCROLL', 'LSCRL')),
-        (72, ('PAUSE', 'PAUS', 'BRK')),
-        (73, ('INSERT', 'INS')),
-        (74, ('HOME',)),
-        (75, ('PGUP',)),
-        (76, ('DELETE', 'DEL')),
-        (77, ('END',)),
-        (78, ('PGDOWN', 'PGDN')),
-        (79, ('RIGHT', 'RGHT')),
-        (80, ('LEFT',)),
-        (81, ('DOWN',)),
-        (82, ('UP',)),
-    )
-
-    for code, names in codes:
-        if candidate in names:
-            return make_key(code=code, names=names)
-
-
-def maybe_make_numpad_key(candidate: str) -> Optional[Key]:
-    codes = (
-        (83, ('NUM_LOCK', 'NUMLOCK', 'NLCK')),
-        (84, ('KP_SLASH', 'NUMPAD_SLASH', 'PSLS')),
-        (85, ('KP_ASTERISK', 'NUMPAD_ASTERISK', 'PAST')),
-        (86, ('KP_MINUS', 'NUMPAD_MINUS', 'PMNS')),
-        (87, ('KP_PLUS', 'NUMPAD_PLUS', 'PPLS')),
-        (88, ('KP_ENTER', 'NUMPAD_ENTER', 'PENT')),
-        (89, ('KP_1', 'P1', 'NUMPAD_1')),
-        (90, ('KP_2', 'P2', 'NUMPAD_2')),
-        (91, ('KP_3', 'P3', 'NUMPAD_3')),
-        (92, ('KP_4', 'P4', 'NUMPAD_4')),
-        (93, ('KP_5', 'P5', 'NUMPAD_5')),
-        (94, ('KP_6', 'P6', 'NUMPAD_6')),
-        (95, ('KP_7', 'P7', 'NUMPAD_7')),
-        (96, ('KP_8', 'P8', 'NUMPAD_8')),
-        (97, ('KP_9', 'P9', 'NUMPAD_9')),
-        (98, ('KP_0', 'P0', 'NUMPAD_0')),
-        (99, ('KP_DOT', 'PDOT', 'NUMPAD_DOT')),
-        (103, ('KP_EQUAL', 'PEQL', 'NUMPAD_EQUAL')),
-        (133, ('KP_COMMA', 'PCMM', 'NUMPAD_COMMA')),
-        (134, ('KP_EQUAL_AS400', 'NUMPAD_EQUAL_AS400')),
-    )
-
-    for code, names in codes:
-        if candidate in names:
-            return make_key(code=code, names=names)
-
-
-def maybe_make_shifted_key(candidate: str) -> Optional[Key]:
-    codes = (
-        (30, ('EXCLAIM', 'EXLM', '!')),
-        (31, ('AT', '@')),
-        (32, ('HASH', 'POUND', '#')),
-        (33, ('DOLLAR', 'DLR', '$')),
-        (34, ('PERCENT', 'PERC', '%')),
-        (35, ('CIRCUMFLEX', 'CIRC', '^')),
-        (36, ('AMPERSAND', 'AMPR', '&')),
-        (37, ('ASTERISK', 'ASTR', '*')),
-        (38, ('LEFT_PAREN', 'LPRN', '(')),
-        (39, ('RIGHT_PAREN', 'RPRN', ')')),
-        (45, ('UNDERSCORE', 'UNDS', '_')),
-        (46, ('PLUS', '+')),
-        (47, ('LEFT_CURLY_BRACE', 'LCBR', '{')),
-        (48, ('RIGHT_CURLY_BRACE', 'RCBR', '}')),
-        (49, ('PIPE', '|')),
-        (51, ('COLON', 'COLN', ':')),
-        (52, ('DOUBLE_QUOTE', 'DQUO', 'DQT', '"')),
-        (53, ('TILDE', 'TILD', '~')),
-        (54, ('LEFT_ANGLE_BRACKET', 'LABK', '<')),
-        (55, ('RIGHT_ANGLE_BRACKET', 'RABK', '>')),
-        (56, ('QUESTION', 'QUES', '?')),
-    )
+def _make_handler_key(
+    on_press: Callable, on_release: Callable, names: Tuple[str, ...]
+) -> Key:
+    return make_key(names=names, on_press=on_press, on_release=on_release)
 
-    for code, names in codes:
-        if candidate in names:
-            return make_key(code=code, names=names, has_modifiers={KC.LSFT.code})
-
-
-def maybe_make_international_key(candidate: str) -> Optional[Key]:
-    codes = (
-        (50, ('NONUS_HASH', 'NUHS')),
-        (100, ('NONUS_BSLASH', 'NUBS')),
-        (101, ('APP', 'APPLICATION', 'SEL', 'WINMENU')),
-        (135, ('INT1', 'RO')),
-        (136, ('INT2', 'KANA')),
-        (137, ('INT3', 'JYEN')),
-        (138, ('INT4', 'HENK')),
-        (139, ('INT5', 'MHEN')),
-        (140, ('INT6',)),
-        (141, ('INT7',)),
-        (142, ('INT8',)),
-        (143, ('INT9',)),
-        (144, ('LANG1', 'HAEN')),
-        (145, ('LANG2', 'HAEJ')),
-        (146, ('LANG3',)),
-        (147, ('LANG4',)),
-        (148, ('LANG5',)),
-        (149, ('LANG6',)),
-        (150, ('LANG7',)),
-        (151, ('LANG8',)),
-        (152, ('LANG9',)),
-    )
 
-    for code, names in codes:
-        if candidate in names:
-            return make_key(code=code, names=names)
+def _make_argumented_key(
+    validator: Callable, on_press: Callable, names: Tuple[str, ...]
+) -> Key:
+    return make_argumented_key(validator, names, on_press=on_press)
 
 
-def maybe_make_unicode_key(candidate: str) -> Optional[Key]:
-    keys = (
+# Definitions of all built-in keys, grouped by key factory. The last item of
+# every entry are the names of the key, all items are passed on to the
+# factory. Keys are created on first use only. If a name is defined more than
+# once, the first definition wins.
+KEY_DEFINITIONS = (
+    (
+        _make_no_key,
         (
-            ('UC_MODE_NOOP', 'UC_DISABLE'),
-            handlers.uc_mode_pressed,
-            UnicodeModeKeyMeta(UnicodeMode.NOOP),
+            (('NO', 'XXXXXXX'),),
+            (('TRANSPARENT', 'TRNS'),),
         ),
+    ),
+    (
+        _make_code_key,
+        tuple((4 + i, (c, c.lower())) for i, c in enumerate(ALL_ALPHAS)),
+    ),
+    (
+        _make_code_key,
+        tuple((30 + i, (c, ALL_NUMBER_ALIASES[i])) for i, c in enumerate(ALL_NUMBERS)),
+    ),
+    (
+        _make_firmware_key,
         (
-            ('UC_MODE_LINUX', 'UC_MODE_IBUS'),
-            handlers.uc_mode_pressed,
-            UnicodeModeKeyMeta(UnicodeMode.IBUS),
+            (handlers.ble_refresh, ('BLE_REFRESH',)),
+            (handlers.ble_disconnect, ('BLE_DISCONNECT',)),
+            (handlers.bootloader, ('BOOTLOADER',)),
+            (handlers.debug_pressed, ('DEBUG', 'DBG')),
+            (handlers.hid_switch, ('HID_SWITCH', 'HID')),
+            (handlers.reload, ('RELOAD', 'RLD')),
+            (handlers.reset, ('RESET',)),
+            (handlers.any_pressed, ('ANY',)),
         ),
+    ),
+    (
+        _make_handler_key,
         (
-            ('UC_MODE_MACOS', 'UC_MODE_OSX', 'US_MODE_RALT'),
-            handlers.uc_mode_pressed,
-            UnicodeModeKeyMeta(UnicodeMode.RALT),
+            (handlers.bkdl_pressed, handlers.bkdl_released, ('BKDL',)),
+            (handlers.gesc_pressed, handlers.gesc_released, ('GESC', 'GRAVE_ESC')),
         ),
+    ),
+    (
+        _make_argumented_key,
         (
-            ('UC_MODE_WINC',),
-            handlers.uc_mode_pressed,
-            UnicodeModeKeyMeta(UnicodeMode.WINC),
+            # A dummy key to trigger a sleep_ms call in a sequence of other keys
+            # in a simple sequence macro.
+            (
+                key_seq_sleep_validator,
+                handlers.sleep_pressed,
+                ('MACRO_SLEEP_MS', 'SLEEP_IN_SEQ'),
+            ),
+            (unicode_mode_key_validator, handlers.uc_mode_pressed, ('UC_MODE',)),
         ),
-    )
-
-    for names, handler, meta in keys:
-        if candidate in names:
-            return make_key(names=names, on_press=handler, meta=meta)
-
-    if candidate in ('UC_MODE',):
-        return make_argumented_key(
-            names=('UC_MODE',),
-            validator=unicode_mode_key_validator,
-            on_press=handlers.uc_mode_pressed,
-        )
-
-
-def maybe_make_firmware_key(candidate: str) -> Optional[Key]:
-    keys = (
-        ((('BLE_REFRESH',), handlers.ble_refresh)),
-        ((('BLE_DISCONNECT',), handlers.ble_disconnect)),
-        ((('BOOTLOADER',), handlers.bootloader)),
-        ((('DEBUG', 'DBG'), handlers.debug_pressed)),
-        ((('HID_SWITCH', 'HID'), handlers.hid_switch)),
-        ((('RELOAD', 'RLD'), handlers.reload)),
-        ((('RESET',), handlers.reset)),
-        ((('ANY',), handlers.any_pressed)),
-    )
-
-    for names, handler in keys:
-        if candidate in names:
-            return make_key(names=names, on_press=handler)
-
-
-KEY_GENERATORS = (
-    maybe_make_no_key,
-    maybe_make_alpha_key,
-    maybe_make_numeric_key,
-    maybe_make_firmware_key,
-    maybe_make_key(
-        None,
-        ('BKDL',),
-        on_press=handlers.bkdl_pressed,
-        on_release=handlers.bkdl_released,
     ),
-    maybe_make_key(
-        None,
-        ('GESC', 'GRAVE_ESC'),
-        on_press=handlers.gesc_pressed,
-        on_release=handlers.gesc_released,
+    (
+        _make_mod_key,
+        (
+            (0x01, ('LEFT_CONTROL', 'LCTRL', 'LCTL')),
+            (0x02, ('LEFT_SHIFT', 'LSHIFT', 'LSFT')),
+            (0x04, ('LEFT_ALT', 'LALT', 'LOPT')),
+            (0x08, ('LEFT_SUPER', 'LGUI', 'LCMD', 'LWIN')),
+            (0x10, ('RIGHT_CONTROL', 'RCTRL', 'RCTL')),
+            (0x20, ('RIGHT_SHIFT', 'RSHIFT', 'RSFT')),
+            (0x40, ('RIGHT_ALT', 'RALT', 'ROPT')),
+            (0x80, ('RIGHT_SUPER', 'RGUI', 'RCMD', 'RWIN')),
+            # MEH = LCTL | LALT | LSFT
+            (0x07, ('MEH',)),
+            # HYPR = LCTL | LALT | LSFT | LGUI
+            (0x0F, ('HYPER', 'HYPR')),
+        ),
     ),
-    # A dummy key to trigger a sleep_ms call in a sequence of other keys in a
-    # simple sequence macro.
-    maybe_make_argumented_key(
-        key_seq_sleep_validator,
-        ('MACRO_SLEEP_MS', 'SLEEP_IN_SEQ'),
-        on_press=handlers.sleep_pressed,
+    (
+        _make_code_key,
+        (
+            # More ASCII standard keys
+            (40, ('ENTER', 'ENT', '\n')),
+            (41, ('ESCAPE', 'ESC')),
+            (42, ('BACKSPACE', 'BSPACE', 'BSPC', 'BKSP')),
+            (43, ('TAB', '\t')),
+            (44, ('SPACE', 'SPC', ' ')),
+            (45, ('MINUS', 'MINS', '-')),
+            (46, ('EQUAL', 'EQL', '=')),
+            (47, ('LBRACKET', 'LBRC', '[')),
+            (48, ('RBRACKET', 'RBRC', ']')),
+            (49, ('BACKSLASH', 'BSLASH', 'BSLS', '\\')),
+            (51, ('SEMICOLON', 'SCOLON', 'SCLN', ';')),
+            (52, ('QUOTE', 'QUOT', "'")),
+            (53, ('GRAVE', 'GRV', 'ZKHK', '`')),
+            (54, ('COMMA', 'COMM', ',')),
+            (55, ('DOT', '.')),
+            (56, ('SLASH', 'SLSH', '/')),
+            # Function Keys
+            (58, ('F1',)),
+            (59, ('F2',)),
+            (60, ('F3',)),
+            (61, ('F4',)),
+            (62, ('F5',)),
+            (63, ('F6',)),
+            (64, ('F7',)),
+            (65, ('F8',)),
+            (66, ('F9',)),
+            (67, ('F10',)),
+            (68, ('F11',)),
+            (69, ('F12',)),
+            (104, ('F13',)),
+            (105, ('F14',)),
+            (106, ('F15',)),
+            (107, ('F16',)),
+            (108, ('F17',)),
+            (109, ('F18',)),
+            (110, ('F19',)),
+            (111, ('F20',)),
+            (112, ('F21',)),
+            (113, ('F22',)),
+            (114, ('F23',)),
+            (115, ('F24',)),
+            # Lock Keys, Navigation, etc.
+            (57, ('CAPS_LOCK', 'CAPSLOCK', 'CLCK', 'CAPS')),
+            # FIXME: Investigate whether this key actually works, and
+            #        uncomment when/if it does.
+            # (130, ('LOCKING_CAPS', 'LCAP')),
+            (70, ('PRINT_SCREEN', 'PSCREEN', 'PSCR')),
+            (71, ('SCROLL_LOCK', 'SCROLLLOCK', 'SLCK')),
+            # FIXME: Investigate whether this key actually works, and
+            #        uncomment when/if it does.
+            # (132, ('LOCKING_SCROLL', 'LSCRL')),
+            (72, ('PAUSE', 'PAUS', 'BRK')),
+            (73, ('INSERT', 'INS')),
+            (74, ('HOME',)),
+            (75, ('PGUP',)),
+            (76, ('DELETE', 'DEL')),
+            (77, ('END',)),
+            (78, ('PGDOWN', 'PGDN')),
+            (79, ('RIGHT', 'RGHT')),
+            (80, ('LEFT',)),
+            (81, ('DOWN',)),
+            (82, ('UP',)),
+            # Numpad
+            # FIXME: Investigate whether this key actually works, and
+            #        uncomment when/if it does.
+            # (131, ('LOCKING_NUM', 'LNUM')),
+            (83, ('NUM_LOCK', 'NUMLOCK', 'NLCK')),
+            (84, ('KP_SLASH', 'NUMPAD_SLASH', 'PSLS')),
+            (85, ('KP_ASTERISK', 'NUMPAD_ASTERISK', 'PAST')),
+            (86, ('KP_MINUS', 'NUMPAD_MINUS', 'PMNS')),
+            (87, ('KP_PLUS', 'NUMPAD_PLUS', 'PPLS')),
+            (88, ('KP_ENTER', 'NUMPAD_ENTER', 'PENT')),
+            (89, ('KP_1', 'P1', 'NUMPAD_1')),
+            (90, ('KP_2', 'P2', 'NUMPAD_2')),
+            (91, ('KP_3', 'P3', 'NUMPAD_3')),
+            (92, ('KP_4', 'P4', 'NUMPAD_4')),
+            (93, ('KP_5', 'P5', 'NUMPAD_5')),
+            (94, ('KP_6', 'P6', 'NUMPAD_6')),
+            (95, ('KP_7', 'P7', 'NUMPAD_7')),
+            (96, ('KP_8', 'P8', 'NUMPAD_8')),
+            (97, ('KP_9', 'P9', 'NUMPAD_9')),
+            (98, ('KP_0', 'P0', 'NUMPAD_0')),
+            (99, ('KP_DOT', 'PDOT', 'NUMPAD_DOT')),
+            (103, ('KP_EQUAL', 'PEQL', 'NUMPAD_EQUAL')),
+            (133, ('KP_COMMA', 'PCMM', 'NUMPAD_COMMA')),
+            (134, ('KP_EQUAL_AS400', 'NUMPAD_EQUAL_AS400')),
+        ),
     ),
-    maybe_make_mod_key,
-    # More ASCII standard keys
-    maybe_make_more_ascii,
-    # Function Keys
-    maybe_make_fn_key,
-    # Lock Keys, Navigation, etc.
-    maybe_make_navlock_key,
-    # Numpad
-    # FIXME: Investigate whether this key actually works, and
-    #        uncomment when/if it does.
-    # maybe_make_key(131, ('LOCKING_NUM', 'LNUM')),
-    maybe_make_numpad_key,
     # Making life better for folks on tiny keyboards especially: exposes
     # the 'shifted' keys as raw keys. Under the hood we're still
     # sending Shift+(whatever key is normally pressed) to get these, so
     # for example `KC_AT` will hold shift and press 2.
-    maybe_make_shifted_key,
+    (
+        _make_shifted_key,
+        (
+            (30, ('EXCLAIM', 'EXLM', '!')),
+            (31, ('AT', '@')),
+            (32, ('HASH', 'POUND', '#')),
+            (33, ('DOLLAR', 'DLR', '$')),
+            (34, ('PERCENT', 'PERC', '%')),
+            (35, ('CIRCUMFLEX', 'CIRC', '^')),
+            (36, ('AMPERSAND', 'AMPR', '&')),
+            (37, ('ASTERISK', 'ASTR', '*')),
+            (38, ('LEFT_PAREN', 'LPRN', '(')),
+            (39, ('RIGHT_PAREN', 'RPRN', ')')),
+            (45, ('UNDERSCORE', 'UNDS', '_')),
+            (46, ('PLUS', '+')),
+            (47, ('LEFT_CURLY_BRACE', 'LCBR', '{')),
+            (48, ('RIGHT_CURLY_BRACE', 'RCBR', '}')),
+            (49, ('PIPE', '|')),
+            (51, ('COLON', 'COLN', ':')),
+            (52, ('DOUBLE_QUOTE', 'DQUO', 'DQT', '"')),
+            (53, ('TILDE', 'TILD', '~')),
+            (54, ('LEFT_ANGLE_BRACKET', 'LABK', '<')),
+            (55, ('RIGHT_ANGLE_BRACKET', 'RABK', '>')),
+            (56, ('QUESTION', 'QUES', '?')),
+        ),
+    ),
     # International
-    maybe_make_international_key,
-    maybe_make_unicode_key,
+    (
+        _make_code_key,
+        (
+            (50, ('NONUS_HASH', 'NUHS')),
+            (100, ('NONUS_BSLASH', 'NUBS')),
+            (101, ('APP', 'APPLICATION', 'SEL', 'WINMENU')),
+            (135, ('INT1', 'RO')),
+            (136, ('INT2', 'KANA')),
+            (137, ('INT3', 'JYEN')),
+            (138, ('INT4', 'HENK')),
+            (139, ('INT5', 'MHEN')),
+            (140, ('INT6',)),
+            (141, ('INT7',)),
+            (142, ('INT8',)),
+            (143, ('INT9',)),
+            (144, ('LANG1', 'HAEN')),
+            (145, ('LANG2', 'HAEJ')),
+            (146, ('LANG3',)),
+            (147, ('LANG4',)),
+            (148, ('LANG5',)),
+            (149, ('LANG6',)),
+            (150, ('LANG7',)),
+            (151, ('LANG8',)),
+            (152, ('LANG9',)),
+        ),
+    ),
+    (
+        _make_unicode_mode_key,
+        (
+            (UnicodeMode.NOOP, ('UC_MODE_NOOP', 'UC_DISABLE')),
+            (UnicodeMode.IBUS, ('UC_MODE_LINUX', 'UC_MODE_IBUS')),
+            (UnicodeMode.RALT, ('UC_MODE_MACOS', 'UC_MODE_OSX', 'US_MODE_RALT')),
+            (UnicodeMode.WINC, ('UC_MODE_WINC',)),
+        ),
+    ),
 )
 
 
@@ -431,25 +357,42 @@ class KeyAttrDict:
     # reasonably small partitions. The partition size is chosen from the magic
     # values of CPs hash allocation sizes.
     # (https://github.com/adafruit/circuitpython/blob/main/py/map.c, 2023-02)
+    # Names are distributed over the partitions by hash, and the number of
+    # partitions is doubled whenever one of them is full.
     __partition_size = 37
     __cache = [{}]
+    # All built-in key names in sorted order, and in a parallel array the
+    # position of their definition in KEY_DEFINITIONS as `group << 8 | index`,
+    # searched by bisection. Built on the first cache miss.
+    __names = None
+    __positions = None
 
     def __iter__(self):
         for partition in self.__cache:
             for name in partition:
                 yield name
 
+    def __partition(self, name: str) -> dict:
+        cache = self.__cache
+        return cache[hash(name) % len(cache)]
+
+    def __grow(self) -> None:
+        cache = self.__cache
+        size = len(cache)
+        cache.extend({} for _ in range(size))
+        size *= 2
+        # Entries of partition `i` either stay, or move to partition `i + size/2`.
+        for idx in range(size // 2):
+            partition = cache[idx]
+            for name in [name for name in partition if hash(name) % size != idx]:
+                cache[idx + size // 2][name] = partition.pop(name)
+
     def __setitem__(self, name: str, key: Key):
-        # Overwrite existing reference.
-        for partition in self.__cache:
-            if name in partition:
-                partition[name] = key
-                return key
-
-        # Insert new reference.
-        if len(self.__cache[-1]) >= self.__partition_size:
-            self.__cache.append({})
-        self.__cache[-1][name] = key
+        partition = self.__partition(name)
+        if name not in partition and len(partition) >= self.__partition_size:
+            self.__grow()
+            partition = self.__partition(name)
+        partition[name] = key
         return key
 
     def __getattr__(self, name: str):
@@ -465,21 +408,55 @@ class KeyAttrDict:
         self.__cache.clear()
         self.__cache.append({})
 
-    def __getitem__(self, name: str):
-        for partition in self.__cache:
-            if name in partition:
-                return partition[name]
+    def __build_index(self) -> None:
+        names = []
+        positions = array('H')
+        for group, (_, definitions) in enumerate(KEY_DEFINITIONS):
+            for index, definition in enumerate(definitions):
+                for name in definition[-1]:
+                    names.append(name)
+                    positions.append(group << 8 | index)
+
+        # The sort is stable: the first definition of a name comes first.
+        order = sorted(range(len(names)), key=names.__getitem__)
+        KeyAttrDict.__names = [names[idx] for idx in order]
+        KeyAttrDict.__positions = array('H', (positions[idx] for idx in order))
+
+    def __find(self, name: str) -> int:
+        '''
+        Return the position of the definition of a built-in key, or -1.
+        '''
+        if self.__names is None:
+            self.__build_index()
+        names = self.__names
+
+        lo = 0
+        hi = len(names)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if names[mid] < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(names) and names[lo] == name:
+            return self.__positions[lo]
+        return -1
 
-        for func in KEY_GENERATORS:
-            maybe_key = func(name)
-            if maybe_key:
-                break
+    def __getitem__(self, name: str):
+        partition = self.__partition(name)
+        if name in partition:
+            return partition[name]
 
-        if not maybe_key:
+        position = self.__find(name)
+        if position < 0:
             if debug.enabled:
                 debug(f'Invalid key: {name}')
             return KC.NO
 
+        factory, definitions = KEY_DEFINITIONS[position >> 8]
+        definition = definitions[position & 0xFF]
+        maybe_key = factory(*definition)
+
         if debug.enabled:
             debug(f'{name}: {maybe_key}')
 
@@ -491,7 +468,46 @@ class KeyAttrDict:
 KC = KeyAttrDict()
 
 
+class _HandlerChain:
+    '''
+    A press or release handler with attached before/after handlers, compiled
+    into a single callable. Keys without attached handlers call their handler
+    directly.
+    '''
+
+    def __init__(self, handler: Callable[[object, Key, Keyboard, ...], None]):
+        self.handler = handler
+        self.before = []
+        self.after = []
+
+    def __call__(self, key: Key, keyboard: Keyboard, KC, coord_int: Optional[int]):
+        for fn in self.before:
+            if not fn(key, keyboard, KC, coord_int):
+                return
+
+        self.handler(key, keyboard, KC, coord_int)
+
+        for fn in self.after:
+            fn(key, keyboard, KC, coord_int)
+
+
+def _unchained(handler):
+    if isinstance(handler, _HandlerChain):
+        return handler.handler
+    return handler
+
+
 class Key:
+    # Defaults shared by all keys. Instances only store what differs, which
+    # keeps the memory footprint of large keymaps down. (`__slots__` is
+    # ignored by CircuitPython.)
+    has_modifiers = None
+    no_press = False
+    no_release = False
+    meta = object()
+    _handle_press = staticmethod(handlers.default_pressed)
+    _handle_release = staticmethod(handlers.default_released)
+
     def __init__(
         self,
         code: int,
@@ -504,17 +520,21 @@ class Key:
         on_release: Callable[
             [object, Key, Keyboard, ...], None
         ] = handlers.default_released,
-        meta: object = object(),
+        meta: object = None,
     ):
         self.code = code
-        self.has_modifiers = has_modifiers
-        # cast to bool() in case we get a None value
-        self.no_press = bool(no_press)
-        self.no_release = bool(no_release)
-
-        self._handle_press = on_press
-        self._handle_release = on_release
-        self.meta = meta
+        if has_modifiers is not None:
+            self.has_modifiers = has_modifiers
+        if no_press:
+            self.no_press = True
+        if no_release:
+            self.no_release = True
+        if on_press is not handlers.default_pressed:
+            self._handle_press = on_press
+        if on_release is not handlers.default_released:
+            self._handle_release = on_release
+        if meta is not None and meta is not Key.meta:
+            self.meta = meta
 
     def __call__(
         self, no_press: Optional[bool] = None, no_release: Optional[bool] = None
@@ -527,8 +547,8 @@ class Key:
             has_modifiers=self.has_modifiers,
             no_press=no_press,
             no_release=no_release,
-            on_press=self._handle_press,
-            on_release=self._handle_release,
+            on_press=_unchained(self._handle_press),
+            on_release=_unchained(self._handle_release),
             meta=self.meta,
         )
 
@@ -536,29 +556,11 @@ class Key:
         return f'Key(code={self.code}, has_modifiers={self.has_modifiers})'
 
     def on_press(self, keyboard: Keyboard, coord_int: Optional[int] = None) -> None:
-        if hasattr(self, '_pre_press_handlers'):
-            for fn in self._pre_press_handlers:
-                if not fn(self, keyboard, KC, coord_int):
-                    return
-
         self._handle_press(self, keyboard, KC, coord_int)
 
-        if hasattr(self, '_post_press_handlers'):
-            for fn in self._post_press_handlers:
-                fn(self, keyboard, KC, coord_int)
-
     def on_release(self, keyboard: Keyboard, coord_int: Optional[int] = None) -> None:
-        if hasattr(self, '_pre_release_handlers'):
-            for fn in self._pre_release_handlers:
-                if not fn(self, keyboard, KC, coord_int):
-                    return
-
         self._handle_release(self, keyboard, KC, coord_int)
 
-        if hasattr(self, '_post_release_handlers'):
-            for fn in self._post_release_handlers:
-                fn(self, keyboard, KC, coord_int)
-
     def clone(self) -> Key:
         '''
         Return a shallow clone of the current key without any pre/post press/release
@@ -571,11 +573,21 @@ class Key:
             has_modifiers=self.has_modifiers,
             no_press=self.no_press,
             no_release=self.no_release,
-            on_press=self._handle_press,
-            on_release=self._handle_release,
+            on_press=_unchained(self._handle_press),
+            on_release=_unchained(self._handle_release),
             meta=self.meta,
         )
 
+    def _press_chain(self) -> _HandlerChain:
+        if not isinstance(self._handle_press, _HandlerChain):
+            self._handle_press = _HandlerChain(self._handle_press)
+        return self._handle_press
+
+    def _release_chain(self) -> _HandlerChain:
+        if not isinstance(self._handle_release, _HandlerChain):
+            self._handle_release = _HandlerChain(self._handle_release)
+        return self._handle_release
+
     def before_press_handler(self, fn: Callable[[Key, Keyboard, ...], bool]) -> None:
         '''
         Attach a callback to be run prior to the on_press handler for this key.
@@ -596,9 +608,7 @@ class Key:
         calls of this method will be executed before those provided by later calls.
         '''
 
-        if not hasattr(self, '_pre_press_handlers'):
-            self._pre_press_handlers = []
-        self._pre_press_handlers.append(fn)
+        self._press_chain().before.append(fn)
 
     def after_press_handler(self, fn: Callable[[Key, Keyboard, ...], bool]) -> None:
         '''
@@ -619,9 +629,7 @@ class Key:
         calls of this method will be executed before those provided by later calls.
         '''
 
-        if not hasattr(self, '_post_press_handlers'):
-            self._post_press_handlers = []
-        self._post_press_handlers.append(fn)
+        self._press_chain().after.append(fn)
 
     def before_release_handler(self, fn: Callable[[Key, Keyboard, ...], bool]) -> None:
         '''
@@ -643,9 +651,7 @@ class Key:
         calls of this method will be executed before those provided by later calls.
         '''
 
-        if not hasattr(self, '_pre_release_handlers'):
-            self._pre_release_handlers = []
-        self._pre_release_handlers.append(fn)
+        self._release_chain().before.append(fn)
 
     def after_release_handler(self, fn: Callable[[Key, Keyboard, ...], bool]) -> None:
         '''
@@ -666,9 +672,7 @@ class Key:
         calls of this method will be executed before those provided by later calls.
         '''
 
-        if not hasattr(self, '_post_release_handlers'):
-            self._post_release_handlers = []
-        self._post_release_handlers.append(fn)
+        self._release_chain().after.append(fn)
 
 
 class ModifierKey(Key):
@@ -703,8 +707,8 @@ class ModifierKey(Key):
             has_modifiers=modifiers,
             no_press=no_press,
             no_release=no_release,
-            on_press=modified_key._handle_press,
-            on_release=modified_key._handle_release,
+            on_press=_unchained(modified_key._handle_press),
+            on_release=_unchained(modified_key._handle_release),
             meta=modified_key.meta,
         )
 
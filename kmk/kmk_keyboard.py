@@ -3,23 +3,75 @@ try:
 except ImportError:
     pass
 
-from collections import namedtuple
+from supervisor import ticks_ms
+
+from array import array
 from keypad import Event as KeyEvent
+from time import sleep
 
 from kmk.consts import UnicodeMode
+from kmk.extensions import Extension
 from kmk.hid import BLEHID, USBHID, AbstractHID, HIDModes
 from kmk.keys import KC, Key
+from kmk.kmktime import ticks_add, ticks_diff
 from kmk.modules import Module
 from kmk.scanners.keypad import MatrixScanner
-from kmk.scheduler import Task, cancel_task, create_task, get_due_task
-from kmk.utils import Debug
+from kmk.scheduler import (
+    Priority,
+    Task,
+    Timer,
+    cancel_task,
+    create_task,
+    get_next_deadline,
+    pop_due_task,
+)
+from kmk.utils import Debug, RingBuffer
 
 debug = Debug('kmk.keyboard')
 
-KeyBufferFrame = namedtuple(
-    'KeyBufferFrame', ('key', 'is_pressed', 'int_coord', 'index')
+# Module and extension hooks that are called from the main loop.
+_HOOKS = (
+    'before_matrix_scan',
+    'after_matrix_scan',
+    'before_hid_send',
+    'after_hid_send',
+    'on_powersave_enable',
+    'on_powersave_disable',
 )
 
+# Marks key cache entries that have yet to be resolved.
+_UNRESOLVED = object()
+
+
+class KeyBufferFrame:
+    '''
+    A deferred key event. Frames are preallocated and reused by the resume
+    buffer.
+    '''
+
+    key = None
+    is_pressed = False
+    int_coord = None
+    index = 0
+
+
+class _TapRelease:
+    '''
+    Releases a tapped key on the next cycle. Instances are pooled and reused
+    by `KMKKeyboard.tap_key`.
+    '''
+
+    def __init__(self, keyboard):
+        self.keyboard = keyboard
+        self.key = None
+        self.timer = Timer(self.release, 'tap_key', Priority.INPUT)
+
+    def release(self):
+        key = self.key
+        self.key = None
+        self.keyboard._tap_pool.append(self)
+        self.keyboard.remove_key(key)
+
 
 def debug_error(module, message: str, error: Exception):
     if debug.enabled:
@@ -47,6 +99,20 @@ class KMKKeyboard:
 
     unicode_mode = UnicodeMode.NOOP
 
+    # Matrix event batching: handle up to `max_events_per_cycle` queued events
+    # per main loop cycle, but stop early after `event_time_budget` ms (0 for
+    # no limit). The default of 1 handles a single event per cycle.
+    max_events_per_cycle = 1
+    event_time_budget = 0
+    event_queue_size = 32
+    resume_buffer_size = 32
+
+    # Idle mode: while there's nothing to do, sleep for up to `max_idle_time`
+    # ms between main loop cycles, or until the next scheduled task is due. The
+    # loop wakes up on input from scanners that can signal pending events, and
+    # from modules that report pending input. 0 disables idling.
+    max_idle_time = 0
+
     modules = []
     extensions = []
     sandbox = Sandbox()
@@ -63,14 +129,29 @@ class KMKKeyboard:
     hid_pending = False
     matrix_update = None
     secondary_matrix_update = None
-    matrix_update_queue = []
+    # Further updates from the secondary source, i.e. the other half of a split
+    # keyboard. In batching mode, one of them is handed over as
+    # `secondary_matrix_update` per scan round.
+    secondary_matrix_updates = None
+    matrix_update_queue = None
+    _queue_overflows = 0
     _trigger_powersave_enable = False
     _trigger_powersave_disable = False
     i2c_deinit_count = 0
     _go_args = None
     _processing_timeouts = False
-    _resume_buffer = []
-    _resume_buffer_x = []
+    _resume_buffer = None
+    _tap_pool = None
+    _coord_index = None
+    _coord_index_mapping = None
+    _key_cache = None
+    _key_cache_layers = None
+    _hooks = None
+    _input_modules = ()
+    _hooked_modules = None
+    _hooked_extensions = None
+    _hooked_module_count = 0
+    _hooked_extension_count = 0
 
     # this should almost always be PREpended to, replaces
     # former use of reversed_active_layers which had pointless
@@ -92,29 +173,116 @@ class KMKKeyboard:
             if self.axes:
                 debug('axes=', self.axes)
 
-        self._hid_helper.create_report(self.keys_pressed, self.axes)
-        try:
-            self._hid_helper.send()
-        except Exception as err:
-            debug_error(self._hid_helper, 'send', err)
+        # Reports are queued and sent right away; they're only held back and
+        # merged while the endpoint is busy.
+        self._hid_helper.create_report(self.keys_pressed, self.axes).send()
 
         self.hid_pending = False
 
         for axis in self.axes:
             axis.move(self, 0)
 
+    def _scan_matrix(self) -> None:
+        '''
+        Scan for matrix events and queue them for processing. In batching mode
+        every scanner, as well as the secondary source, is drained until the
+        event queue is full. Modules get to see each update through
+        `after_matrix_scan`.
+        '''
+        queue = self.matrix_update_queue
+        secondary = self.secondary_matrix_updates
+
+        while True:
+            if secondary and self.secondary_matrix_update is None:
+                self.secondary_matrix_update = secondary.popleft()
+
+            # While there's no room for a full round of updates, leave events
+            # with the scanners and the secondary source instead of dropping
+            # them: a dropped release would leave a key stuck.
+            room = self.event_queue_size - len(queue) >= 2
+            if room:
+                for matrix in self.matrix:
+                    update = matrix.scan_for_changes()
+                    if update:
+                        self.matrix_update = update
+                        break
+            self.sandbox.matrix_update = self.matrix_update
+            self.sandbox.secondary_matrix_update = self.secondary_matrix_update
+
+            self.after_matrix_scan()
+
+            if not room or not (self.matrix_update or self.secondary_matrix_update):
+                break
+
+            if self.secondary_matrix_update:
+                queue.append(self.secondary_matrix_update)
+                self.secondary_matrix_update = None
+
+            if self.matrix_update:
+                queue.append(self.matrix_update)
+                self.matrix_update = None
+
+            # Stop while there's still room for a full round of updates.
+            if self.max_events_per_cycle <= 1 or self.event_queue_size - len(queue) < 2:
+                break
+
+        if queue.overflows != self._queue_overflows:
+            self._queue_overflows = queue.overflows
+            if debug.enabled:
+                debug('matrix_update_queue overflows=', queue.overflows)
+
+    def _handle_matrix_events(self) -> None:
+        queue = self.matrix_update_queue
+        if not queue:
+            return
+
+        # only handle one key per cycle, unless batching is enabled.
+        self._handle_matrix_report(queue.popleft())
+
+        if self.max_events_per_cycle <= 1:
+            return
+
+        start = ticks_ms()
+        for _ in range(self.max_events_per_cycle - 1):
+            if not queue:
+                break
+            if (
+                self.event_time_budget
+                and ticks_diff(ticks_ms(), start) >= self.event_time_budget
+            ):
+                break
+
+            # Each event has to be observable by the host, just as if it had
+            # been handled in a cycle of its own.
+            self._process_resume_buffer()
+            if self.hid_pending:
+                self._send_hid()
+
+            self._handle_matrix_report(queue.popleft())
+
     def _handle_matrix_report(self, kevent: KeyEvent) -> None:
         if kevent is not None:
             self._on_matrix_changed(kevent)
 
-    def _find_key_in_map(self, int_coord: int) -> Key:
-        try:
-            idx = self.coord_mapping.index(int_coord)
-        except ValueError:
-            if debug.enabled:
-                debug('no such int_coord: ', int_coord)
+    def _init_coord_index(self) -> None:
+        '''
+        Build the inverse of `coord_mapping`, such that the keymap index of a
+        coordinate is a simple array lookup instead of a linear search.
+        '''
+        coord_mapping = self.coord_mapping
+        index = array('h', [-1] * (max(coord_mapping) + 1))
+        for idx, int_coord in enumerate(coord_mapping):
+            # Keep the first occurrence, like `tuple.index` would.
+            if index[int_coord] < 0:
+                index[int_coord] = idx
 
-            return None
+        self._coord_index = index
+        self._coord_index_mapping = coord_mapping
+        self._key_cache = [_UNRESOLVED] * len(coord_mapping)
+        self._key_cache_layers = None
+
+    def _resolve_key(self, idx: int) -> Key:
+        trns = KC.TRNS
 
         for layer in self.active_layers:
             try:
@@ -124,11 +292,48 @@ class KMKKeyboard:
                 if debug.enabled:
                     debug('keymap IndexError: idx=', idx, ' layer=', layer)
 
-            if not key or key == KC.TRNS:
+            if not key or key == trns:
                 continue
 
             return key
 
+    def _find_key_in_map(self, int_coord: int) -> Key:
+        # The inverse coord_mapping is (re-)built if the mapping is replaced,
+        # i.e. on first use, or by split keyboards during bootup.
+        if self._coord_index_mapping is not self.coord_mapping:
+            self._init_coord_index()
+
+        try:
+            idx = self._coord_index[int_coord]
+        except IndexError:
+            idx = -1
+
+        if idx < 0:
+            if debug.enabled:
+                debug('no such int_coord: ', int_coord)
+
+            return None
+
+        # Resolved keys are cached per coordinate for the current layer stack.
+        key_cache = self._key_cache
+        if self._key_cache_layers != self.active_layers:
+            for i in range(len(key_cache)):
+                key_cache[i] = _UNRESOLVED
+            self._key_cache_layers = self.active_layers.copy()
+
+        key = key_cache[idx]
+        if key is _UNRESOLVED:
+            key = key_cache[idx] = self._resolve_key(idx)
+
+        return key
+
+    def invalidate_key_cache(self) -> None:
+        '''
+        Drop all cached key resolutions. Required after modifying the keymap
+        at runtime.
+        '''
+        self._key_cache_layers = None
+
     def _on_matrix_changed(self, kevent: KeyEvent) -> None:
         int_coord = kevent.key_number
         is_pressed = kevent.pressed
@@ -157,41 +362,36 @@ class KMKKeyboard:
         Resume the processing of buffered, delayed, deferred, etc. key events
         emitted by modules.
 
-        We use a copy of the `_resume_buffer` as a working buffer. The working
-        buffer holds all key events in the correct order for processing. If
-        during processing new events are pushed to the `_resume_buffer`, they
-        are prepended to the working buffer (which may not be emptied), in
-        order to preserve key event order.
-        We also double-buffer `_resume_buffer` with `_resume_buffer_x`, only
-        copying the reference to hopefully safe some time on allocations.
+        If during processing new events are pushed to the `_resume_buffer`,
+        they are moved in front of the remaining events, in order to preserve
+        key event order.
         '''
-
-        buffer, self._resume_buffer = self._resume_buffer, self._resume_buffer_x
+        buffer = self._resume_buffer
 
         while buffer:
-            ksf = buffer.pop(0)
+            # Frames are reused: copy the content before anything else happens.
+            ksf = buffer.popleft()
             key = ksf.key
+            is_pressed = ksf.is_pressed
+            int_coord = ksf.int_coord
+            index = ksf.index
+            ksf.key = None
+            remaining = len(buffer)
 
             # Handle any unaccounted-for layer shifts by looking up the key resolution again.
-            if ksf.int_coord is not None:
-                key = self._find_key_in_map(ksf.int_coord)
+            if int_coord is not None:
+                key = self._find_key_in_map(int_coord)
 
             # Resume the processing of the key event and update the HID report
             # when applicable.
-            self.pre_process_key(key, ksf.is_pressed, ksf.int_coord, ksf.index)
+            self.pre_process_key(key, is_pressed, int_coord, index)
 
             if self.hid_pending:
                 self._send_hid()
-                self.hid_pending = False
 
-            # Any newly buffered key events must be prepended to the working
+            # Any newly buffered key events must be prepended to the remaining
             # buffer.
-            if self._resume_buffer:
-                self._resume_buffer.extend(buffer)
-                buffer.clear()
-                buffer, self._resume_buffer = self._resume_buffer, buffer
-
-        self._resume_buffer_x = buffer
+            buffer.rotate(len(buffer) - remaining)
 
     @property
     def debug_enabled(self) -> bool:
@@ -248,10 +448,15 @@ class KMKKeyboard:
         reprocess: Optional[bool] = False,
     ) -> None:
         index = self.modules.index(module) + (0 if reprocess else 1)
-        ksf = KeyBufferFrame(
-            key=key, is_pressed=is_pressed, int_coord=int_coord, index=index
-        )
-        self._resume_buffer.append(ksf)
+        ksf = self._resume_buffer.reserve()
+        if ksf is None:
+            if debug.enabled:
+                debug('resume buffer overflow: ', key)
+            return
+        ksf.key = key
+        ksf.is_pressed = is_pressed
+        ksf.int_coord = int_coord
+        ksf.index = index
 
     def remove_key(self, keycode: Key) -> None:
         self.keys_pressed.discard(keycode)
@@ -264,17 +469,59 @@ class KMKKeyboard:
     def tap_key(self, keycode: Key) -> None:
         self.add_key(keycode)
         # On the next cycle, we'll remove the key.
-        self.set_timeout(0, lambda: self.remove_key(keycode))
+        if self._tap_pool is None:
+            self._tap_pool = []
+        tap = self._tap_pool.pop() if self._tap_pool else _TapRelease(self)
+        tap.key = keycode
+        tap.timer.start()
 
     def set_timeout(self, after_ticks: int, callback: Callable[[None], None]) -> [Task]:
         return create_task(callback, after_ms=after_ticks)
 
-    def cancel_timeout(self, timeout_key: int) -> None:
+    def cancel_timeout(self, timeout_key: [Task, Timer]) -> None:
         cancel_task(timeout_key)
 
     def _process_timeouts(self) -> None:
-        for task in get_due_task():
+        task = pop_due_task()
+        while task:
             task()
+            task = pop_due_task()
+
+    def _idle(self) -> None:
+        '''
+        Wait for the earliest of: pending input, the next scheduled task, or
+        the end of the maximum idle period.
+        '''
+        if (
+            self.hid_pending
+            or self._resume_buffer
+            or self.matrix_update_queue
+            or self._hid_helper.pending
+            or self._input_pending()
+        ):
+            return
+
+        deadline = ticks_add(ticks_ms(), self.max_idle_time)
+        next_task = get_next_deadline()
+        if next_task is not None and ticks_diff(next_task, deadline) < 0:
+            deadline = next_task
+
+        while ticks_diff(deadline, ticks_ms()) > 0:
+            for matrix in self.matrix:
+                if matrix.events_pending:
+                    return
+            if self._input_pending():
+                return
+            sleep(0.001)
+
+    def _input_pending(self) -> bool:
+        for module in self._input_modules:
+            try:
+                if module.input_pending(self):
+                    return True
+            except Exception as err:
+                debug_error(module, 'input_pending', err)
+        return False
 
     def _init_sanity_check(self) -> None:
         '''
@@ -309,6 +556,8 @@ class KMKKeyboard:
                 cm.extend(m.coord_mapping)
             self.coord_mapping = tuple(cm)
 
+        self._init_coord_index()
+
     def _init_hid(self) -> None:
         if self.hid_type == HIDModes.NOOP:
             self._hid_helper = AbstractHID
@@ -320,6 +569,8 @@ class KMKKeyboard:
             self._hid_helper = AbstractHID
         self._hid_helper = self._hid_helper(**self._go_args)
         self._hid_send_enabled = True
+        # Start from a clean slate on the host as well.
+        self._hid_helper.send()
 
         if debug.enabled:
             debug('hid=', self._hid_helper)
@@ -365,95 +616,82 @@ class KMKKeyboard:
         if debug.enabled:
             debug('modules=', [_.__class__.__name__ for _ in self.modules])
 
-        for idx, ext in enumerate(self.extensions):
+        extensions = []
+        for ext in self.extensions:
             try:
                 ext.during_bootup(self)
+                extensions.append(ext)
             except Exception as err:
                 debug_error(ext, 'during_bootup', err)
-                self.extensions[idx] = None
 
-        self.modules[:] = [_ for _ in self.modules if _]
+        self.extensions = extensions
 
         if debug.enabled:
             debug('extensions=', [_.__class__.__name__ for _ in self.extensions])
 
-    def before_matrix_scan(self) -> None:
-        for module in self.modules:
-            try:
-                module.before_matrix_scan(self)
-            except Exception as err:
-                debug_error(module, 'before_matrix_scan', err)
+        self._init_hooks()
 
-        for ext in self.extensions:
-            try:
-                ext.before_matrix_scan(self.sandbox)
-            except Exception as err:
-                debug_error(ext, 'before_matrix_scan', err)
+    def _init_hooks(self) -> None:
+        '''
+        Compile one dispatch list per hook, holding only the modules and
+        extensions that actually override that hook. The lists are rebuilt
+        whenever modules or extensions are added or removed, or the lists are
+        replaced. Replacing an item in place requires calling this directly.
+        '''
+        self._hooked_modules = self.modules
+        self._hooked_extensions = self.extensions
+        self._hooked_module_count = len(self.modules)
+        self._hooked_extension_count = len(self.extensions)
+
+        hooks = {}
+        for hook in _HOOKS:
+            dispatch = []
+            for module in self.modules:
+                if getattr(type(module), hook, None) is not getattr(Module, hook):
+                    dispatch.append((module, getattr(module, hook), self))
+            for ext in self.extensions:
+                if getattr(type(ext), hook, None) is not getattr(Extension, hook):
+                    dispatch.append((ext, getattr(ext, hook), self.sandbox))
+            hooks[hook] = dispatch
+        self._hooks = hooks
+
+        self._input_modules = [
+            module
+            for module in self.modules
+            if getattr(type(module), 'input_pending', None)
+            is not Module.input_pending
+        ]
 
-    def after_matrix_scan(self) -> None:
-        for module in self.modules:
-            try:
-                module.after_matrix_scan(self)
-            except Exception as err:
-                debug_error(module, 'after_matrix_scan', err)
+        if debug.enabled:
+            for hook, dispatch in hooks.items():
+                debug(hook, '=', [_[0].__class__.__name__ for _ in dispatch])
 
-        for ext in self.extensions:
+    def _dispatch_hook(self, hook: str) -> None:
+        for obj, method, arg in self._hooks[hook]:
             try:
-                ext.after_matrix_scan(self.sandbox)
+                method(arg)
             except Exception as err:
-                debug_error(ext, 'after_matrix_scan', err)
+                debug_error(obj, hook, err)
 
-    def before_hid_send(self) -> None:
-        for module in self.modules:
-            try:
-                module.before_hid_send(self)
-            except Exception as err:
-                debug_error(module, 'before_hid_send', err)
+    def before_matrix_scan(self) -> None:
+        self._dispatch_hook('before_matrix_scan')
 
-        for ext in self.extensions:
-            try:
-                ext.before_hid_send(self.sandbox)
-            except Exception as err:
-                debug_error(ext, 'before_hid_send', err)
+    def after_matrix_scan(self) -> None:
+        self._dispatch_hook('after_matrix_scan')
 
-    def after_hid_send(self) -> None:
-        for module in self.modules:
-            try:
-                module.after_hid_send(self)
-            except Exception as err:
-                debug_error(module, 'after_hid_send', err)
+    def before_hid_send(self) -> None:
+        self._dispatch_hook('before_hid_send')
 
-        for ext in self.extensions:
-            try:
-                ext.after_hid_send(self.sandbox)
-            except Exception as err:
-                debug_error(ext, 'after_hid_send', err)
+    def after_hid_send(self) -> None:
+        self._dispatch_hook('after_hid_send')
 
     def powersave_enable(self) -> None:
-        for module in self.modules:
-            try:
-                module.on_powersave_enable(self)
-            except Exception as err:
-                debug_error(module, 'powersave_enable', err)
-
-        for ext in self.extensions:
-            try:
-                ext.on_powersave_enable(self.sandbox)
-            except Exception as err:
-                debug_error(ext, 'powersave_enable', err)
+        self._hid_helper.on_powersave_enable()
+        self._dispatch_hook('on_powersave_enable')
 
     def powersave_disable(self) -> None:
-        for module in self.modules:
-            try:
-                module.on_powersave_disable(self)
-            except Exception as err:
-                debug_error(module, 'powersave_disable', err)
-
-        for ext in self.extensions:
-            try:
-                ext.on_powersave_disable(self.sandbox)
-            except Exception as err:
-                debug_error(ext, 'powersave_disable', err)
+        self._hid_helper.on_powersave_disable()
+        self._dispatch_hook('on_powersave_disable')
 
     def deinit(self) -> None:
         for module in self.modules:
@@ -492,6 +730,11 @@ class KMKKeyboard:
             debug('Initialising ', self)
             debug('unicode_mode=', self.unicode_mode)
 
+        self.matrix_update_queue = RingBuffer(self.event_queue_size)
+        self._resume_buffer = RingBuffer(
+            self.resume_buffer_size, KeyBufferFrame, grow=True
+        )
+
         self._init_hid()
         self._init_matrix()
         self._init_coord_mapping()
@@ -504,33 +747,24 @@ class KMKKeyboard:
             debug('mem_info used:', gc.mem_alloc(), ' free:', gc.mem_free())
 
     def _main_loop(self) -> None:
+        # Cheap change detection: same lists, same lengths.
+        if (
+            self.modules is not self._hooked_modules
+            or self.extensions is not self._hooked_extensions
+            or len(self.modules) != self._hooked_module_count
+            or len(self.extensions) != self._hooked_extension_count
+        ):
+            self._init_hooks()
+
         self.sandbox.active_layers = self.active_layers.copy()
 
         self.before_matrix_scan()
 
         self._process_resume_buffer()
 
-        for matrix in self.matrix:
-            update = matrix.scan_for_changes()
-            if update:
-                self.matrix_update = update
-                break
-        self.sandbox.matrix_update = self.matrix_update
-        self.sandbox.secondary_matrix_update = self.secondary_matrix_update
-
-        self.after_matrix_scan()
-
-        if self.secondary_matrix_update:
-            self.matrix_update_queue.append(self.secondary_matrix_update)
-            self.secondary_matrix_update = None
+        self._scan_matrix()
 
-        if self.matrix_update:
-            self.matrix_update_queue.append(self.matrix_update)
-            self.matrix_update = None
-
-        # only handle one key per cycle.
-        if self.matrix_update_queue:
-            self._handle_matrix_report(self.matrix_update_queue.pop(0))
+        self._handle_matrix_events()
 
         self.before_hid_send()
 
@@ -542,6 +776,10 @@ class KMKKeyboard:
         if self.hid_pending:
             self._send_hid()
 
+        if self._hid_send_enabled:
+            # Also queues states again that have been dropped.
+            self._hid_helper.send()
+
         self.after_hid_send()
 
         if self._trigger_powersave_enable:
@@ -549,3 +787,6 @@ class KMKKeyboard:
 
         if self._trigger_powersave_disable:
             self.powersave_disable()
+
+        if self.max_idle_time:
+            self._idle()
@@ -10,7 +10,9 @@ class Module:
     consistant manner.
     '''
 
-    # The below methods should be implemented by subclasses
+    # The below methods should be implemented by subclasses. Hooks that aren't
+    # overridden are never called by the keyboard, so there's no need for
+    # empty stubs.
 
     def during_bootup(self, keyboard):
         raise NotImplementedError
@@ -19,28 +21,36 @@ class Module:
         '''
         Return value will be injected as an extra matrix update
         '''
-        raise NotImplementedError
+        return
 
     def after_matrix_scan(self, keyboard):
         '''
         Return value will be replace matrix update if supplied
         '''
-        raise NotImplementedError
+        return
 
     def process_key(self, keyboard, key, is_pressed, int_coord):
         return key
 
+    def input_pending(self, keyboard):
+        '''
+        Whether there's input waiting that is read in `before_matrix_scan`.
+        Modules that have to poll their input should always report `True`,
+        which prevents the keyboard from idling.
+        '''
+        return False
+
     def before_hid_send(self, keyboard):
-        raise NotImplementedError
+        return
 
     def after_hid_send(self, keyboard):
-        raise NotImplementedError
+        return
 
     def on_powersave_enable(self, keyboard):
-        raise NotImplementedError
+        return
 
     def on_powersave_disable(self, keyboard):
-        raise NotImplementedError
+        return
 
     def deinit(self, keyboard):
         pass
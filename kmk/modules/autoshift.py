@@ -1,6 +1,6 @@
 from kmk.keys import KC, Key
 from kmk.modules import Module
-from kmk.scheduler import cancel_task, create_task
+from kmk.scheduler import Priority, Timer
 from kmk.utils import Debug
 
 debug = Debug(__name__)
@@ -15,13 +15,7 @@ class Autoshift(Module):
         self._key = None
 
     def during_bootup(self, keyboard):
-        self._task = create_task(lambda: self._shift(keyboard), after_ms=-1)
-
-    def before_matrix_scan(self, keyboard):
-        pass
-
-    def after_matrix_scan(self, keyboard):
-        pass
+        self._task = Timer(lambda: self._shift(keyboard), 'autoshift', Priority.INPUT)
 
     def process_key(self, keyboard, key, is_pressed, int_coord):
         # Unshift on any key event
@@ -45,10 +39,10 @@ class Autoshift(Module):
             and key.code
             and KC.A.code <= key.code <= KC.Z.code
         ):
-            create_task(self._task, after_ms=self.tap_time)
+            self._task.start(self.tap_time)
             self._key = key
         else:
-            cancel_task(self._task)
+            self._task.cancel()
             keyboard.resume_process_key(self, self._key, True)
             if key is self._key:
                 keyboard.resume_process_key(self, self._key, False)
@@ -56,18 +50,6 @@ class Autoshift(Module):
                 keyboard.resume_process_key(self, key, True)
             self._key = None
 
-    def before_hid_send(self, keyboard):
-        pass
-
-    def after_hid_send(self, keyboard):
-        pass
-
-    def on_powersave_enable(self, keyboard):
-        pass
-
-    def on_powersave_disable(self, keyboard):
-        pass
-
     def _shift(self, keyboard):
         if debug.enabled:
             debug('activate')
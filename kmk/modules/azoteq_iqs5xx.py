@@ -162,12 +162,6 @@ class Touchpad(Module):
             self.OLD_RIGHT_BUTTON = self.RIGHT_BUTTON; # remember button status for next polling cycle
 
 
-    def after_matrix_scan(self, keyboard):
-        return
-
-    def before_hid_send(self, keyboard):
-        return
-
     def after_hid_send(self, keyboard):
         if self._click:
             if self.LEFT_BUTTON:
@@ -176,12 +170,6 @@ class Touchpad(Module):
                 keyboard.pre_process_key(KC.MB_RMB, is_pressed=False)   
         return
 
-    def on_powersave_enable(self, keyboard):
-        return
-
-    def on_powersave_disable(self, keyboard):
-        return
-
         
 
 
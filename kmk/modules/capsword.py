@@ -1,5 +1,6 @@
 from kmk.keys import FIRST_KMK_INTERNAL_KEY, KC, ModifierKey, make_key
 from kmk.modules import Module
+from kmk.scheduler import Priority, Timer
 
 
 class CapsWord(Module):
@@ -13,7 +14,7 @@ class CapsWord(Module):
             KC.BSPC,
             KC.UNDS,
         ]
-        self._timeout_key = False
+        self._timeout_key = Timer(self.process_timeout, 'capsword', Priority.INPUT)
         self._cw_active = False
         self.timeout = timeout
         make_key(
@@ -27,9 +28,6 @@ class CapsWord(Module):
     def during_bootup(self, keyboard):
         return
 
-    def before_matrix_scan(self, keyboard):
-        return
-
     def process_key(self, keyboard, key, is_pressed, int_coord):
         if self._cw_active and key != KC.CW:
             continue_cw = False
@@ -55,37 +53,17 @@ class CapsWord(Module):
 
         return key
 
-    def before_hid_send(self, keyboard):
-        return
-
-    def after_hid_send(self, keyboard):
-        return
-
-    def on_powersave_enable(self, keyboard):
-        return
-
-    def on_powersave_disable(self, keyboard):
-        return
-
-    def after_matrix_scan(self, keyboard):
-        return
-
     def process_timeout(self):
         self._cw_active = False
-        self._timeout_key = False
+        self._timeout_key.cancel()
 
     def request_timeout(self, keyboard):
         if self._cw_active:
             if self.timeout:
-                self._timeout_key = keyboard.set_timeout(
-                    self.timeout, lambda: self.process_timeout()
-                )
+                self._timeout_key.start(self.timeout)
 
     def discard_timeout(self, keyboard):
-        if self._timeout_key:
-            if self.timeout:
-                keyboard.cancel_timeout(self._timeout_key)
-            self._timeout_key = False
+        self._timeout_key.cancel()
 
     def cw_pressed(self, key, keyboard, *args, **kwargs):
         # enables/disables capsword
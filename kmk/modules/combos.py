@@ -8,6 +8,7 @@ import kmk.handlers.stock as handlers
 from kmk.keys import Key, make_key
 from kmk.kmk_keyboard import KMKKeyboard
 from kmk.modules import Module
+from kmk.scheduler import Priority, Timer
 from kmk.utils import Debug
 
 debug = Debug(__name__)
@@ -26,6 +27,7 @@ class Combo:
     timeout = 50
     _remaining = []
     _timeout = None
+    _timeout_reset = False
     _state = _ComboState.IDLE
     _match_coord = False
 
@@ -115,24 +117,6 @@ class Combos(Module):
     def during_bootup(self, keyboard):
         self.reset(keyboard)
 
-    def before_matrix_scan(self, keyboard):
-        return
-
-    def after_matrix_scan(self, keyboard):
-        return
-
-    def before_hid_send(self, keyboard):
-        return
-
-    def after_hid_send(self, keyboard):
-        return
-
-    def on_powersave_enable(self, keyboard):
-        return
-
-    def on_powersave_disable(self, keyboard):
-        return
-
     def process_key(self, keyboard, key: Key, is_pressed, int_coord):
         if is_pressed:
             return self.on_press(keyboard, key, int_coord)
@@ -153,11 +137,7 @@ class Combos(Module):
             if combo.matches(key, int_coord):
                 continue
             combo._state = _ComboState.IDLE
-            if combo._timeout:
-                keyboard.cancel_timeout(combo._timeout)
-            combo._timeout = keyboard.set_timeout(
-                combo.timeout, lambda c=combo: self.reset_combo(keyboard, c)
-            )
+            self.start_timeout(keyboard, combo, reset=True)
 
         match_count = self.count_matching()
 
@@ -175,8 +155,7 @@ class Combos(Module):
                 combo = first_match
                 self.activate(keyboard, combo)
                 if combo._timeout:
-                    keyboard.cancel_timeout(combo._timeout)
-                    combo._timeout = None
+                    combo._timeout.cancel()
                 self._key_buffer = []
                 self.reset(keyboard)
 
@@ -184,14 +163,10 @@ class Combos(Module):
             for combo in self.combos:
                 if combo._state != _ComboState.MATCHING:
                     continue
-                if combo._timeout:
-                    if combo.per_key_timeout:
-                        keyboard.cancel_timeout(combo._timeout)
-                    else:
+                if combo._timeout and combo._timeout.active:
+                    if not combo.per_key_timeout:
                         continue
-                combo._timeout = keyboard.set_timeout(
-                    combo.timeout, lambda c=combo: self.on_timeout(keyboard, c)
-                )
+                self.start_timeout(keyboard, combo, reset=False)
         else:
             # There's no matching combo: send and reset key buffer
             if self._key_buffer:
@@ -232,7 +207,8 @@ class Combos(Module):
 
                 # Combo matches, but first key released before timeout.
                 elif not any(combo._remaining) and self.count_matching() == 1:
-                    keyboard.cancel_timeout(combo._timeout)
+                    if combo._timeout:
+                        combo._timeout.cancel()
                     self.activate(keyboard, combo)
                     self._key_buffer = []
                     keyboard._send_hid()
@@ -279,11 +255,25 @@ class Combos(Module):
 
         return key
 
+    def start_timeout(self, keyboard, combo, reset):
+        # Every combo has one timer, that is either about to reset the combo,
+        # or to resolve a matching combo.
+        if combo._timeout is None:
+            combo._timeout = Timer(
+                lambda: self._on_timer(keyboard, combo), 'combos', Priority.INPUT
+            )
+        combo._timeout_reset = reset
+        combo._timeout.start(combo.timeout)
+
+    def _on_timer(self, keyboard, combo):
+        if combo._timeout_reset:
+            self.reset_combo(keyboard, combo)
+        else:
+            self.on_timeout(keyboard, combo)
+
     def on_timeout(self, keyboard, combo):
         # If combo reaches timeout and has no remaining keys, activate it;
         # else, drop it from the match list.
-        combo._timeout = None
-
         if not any(combo._remaining):
             self.activate(keyboard, combo)
             # check if the last buffered key event was a 'release'
@@ -318,8 +308,7 @@ class Combos(Module):
     def reset_combo(self, keyboard, combo):
         combo.reset()
         if combo._timeout is not None:
-            keyboard.cancel_timeout(combo._timeout)
-            combo._timeout = None
+            combo._timeout.cancel()
         combo._state = _ComboState.RESET
 
     def reset(self, keyboard):
@@ -226,12 +226,6 @@ class DynamicSequences(Module):
     def during_bootup(self, keyboard):
         return
 
-    def before_matrix_scan(self, keyboard):
-        return
-
-    def after_matrix_scan(self, keyboard):
-        return
-
     def before_hid_send(self, keyboard):
 
         if not self.status:
@@ -248,12 +242,3 @@ class DynamicSequences(Module):
             or self.status == SequenceStatus.SET_INTERVAL
         ):
             self.config_mode(keyboard)
-
-    def after_hid_send(self, keyboard):
-        return
-
-    def on_powersave_enable(self, keyboard):
-        return
-
-    def on_powersave_disable(self, keyboard):
-        return
@@ -84,21 +84,6 @@ class Easypoint(Module):
             AX.X.move(keyboard, x)
             AX.Y.move(keyboard, y)
 
-    def after_matrix_scan(self, keyboard):
-        return
-
-    def before_hid_send(self, keyboard):
-        return
-
-    def after_hid_send(self, keyboard):
-        return
-
-    def on_powersave_enable(self, keyboard):
-        return
-
-    def on_powersave_disable(self, keyboard):
-        return
-
     def _read_raw_state(self):
         '''Read data from AS5013'''
         x, y = self._i2c_rdwr([X], length=2)
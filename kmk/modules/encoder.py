@@ -128,6 +128,16 @@ class GPIOEncoder(BaseEncoder):
         self._state = (self.pin_a.get_value(), self.pin_b.get_value())
         self._start_state = self._state
 
+    def changed(self):
+        '''
+        Whether the pins differ from the last decoded state.
+        '''
+        if (self.pin_a.get_value(), self.pin_b.get_value()) != self._state:
+            return True
+        if self.pin_button:
+            return self.pin_button.get_value() != self._button_state
+        return False
+
     def button_event(self):
         if self.pin_button:
             new_button_state = self.pin_button.get_value()
@@ -267,6 +277,14 @@ class EncoderHandler(Module):
                     print(e)
         return
 
+    def input_pending(self, keyboard):
+        # GPIO encoders are decoded in software: wake up on every edge. I2C
+        # encoders count steps themselves and are read on the next cycle.
+        for encoder in self.encoders:
+            if isinstance(encoder, GPIOEncoder) and encoder.changed():
+                return True
+        return False
+
     def on_move_do(self, keyboard, encoder_id, state):
         if self.map:
             layer_id = keyboard.active_layers[0]
@@ -292,21 +310,3 @@ class EncoderHandler(Module):
             encoder.update_state()
 
         return keyboard
-
-    def after_matrix_scan(self, keyboard):
-        '''
-        Return value will be replace matrix update if supplied
-        '''
-        return
-
-    def before_hid_send(self, keyboard):
-        return
-
-    def after_hid_send(self, keyboard):
-        return
-
-    def on_powersave_enable(self, keyboard):
-        return
-
-    def on_powersave_disable(self, keyboard):
-        return
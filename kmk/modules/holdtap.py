@@ -2,6 +2,7 @@ from micropython import const
 
 from kmk.keys import KC, make_argumented_key
 from kmk.modules import Module
+from kmk.scheduler import Priority, Timer
 from kmk.utils import Debug
 
 debug = Debug(__name__)
@@ -23,11 +24,30 @@ class HoldTapRepeat:
 
 
 class HoldTapKeyState:
-    def __init__(self, timeout_key, *args, **kwargs):
-        self.timeout_key = timeout_key
+    '''
+    State of a pressed holdtap key. There's one state per key, that is reused,
+    timer included, for every press of that key.
+    '''
+
+    def __init__(self, holdtap, key, keyboard):
+        self.holdtap = holdtap
+        self.key = key
+        self.keyboard = keyboard
+        self.timeout_key = Timer(self.on_timeout, 'holdtap', Priority.INPUT)
+
+    def reset(self, *args, **kwargs):
         self.args = args
         self.kwargs = kwargs
         self.activated = ActivationType.PRESSED
+        self.repeat = False
+
+    def on_timeout(self):
+        if self.repeat:
+            self.holdtap.key_states.pop(self.key)
+        else:
+            self.holdtap.on_tap_time_expired(
+                self.key, self.keyboard, *self.args, **self.kwargs
+            )
 
 
 class HoldTapKeyMeta:
@@ -54,6 +74,7 @@ class HoldTap(Module):
     def __init__(self):
         self.key_buffer = []
         self.key_states = {}
+        self._states = {}
         if KC.get('HT') == KC.NO:
             make_argumented_key(
                 validator=HoldTapKeyMeta,
@@ -65,12 +86,6 @@ class HoldTap(Module):
     def during_bootup(self, keyboard):
         return
 
-    def before_matrix_scan(self, keyboard):
-        return
-
-    def after_matrix_scan(self, keyboard):
-        return
-
     def process_key(self, keyboard, key, is_pressed, int_coord):
         '''Handle holdtap being interrupted by another key press/release.'''
         current_key = key
@@ -117,18 +132,6 @@ class HoldTap(Module):
 
         return current_key
 
-    def before_hid_send(self, keyboard):
-        return
-
-    def after_hid_send(self, keyboard):
-        return
-
-    def on_powersave_enable(self, keyboard):
-        return
-
-    def on_powersave_disable(self, keyboard):
-        return
-
     def ht_pressed(self, key, keyboard, *args, **kwargs):
         '''Unless in repeat mode, do nothing yet, action resolves when key is released, timer expires or other key is pressed.'''
         if key in self.key_states:
@@ -148,11 +151,12 @@ class HoldTap(Module):
             tap_time = self.tap_time
         else:
             tap_time = key.meta.tap_time
-        timeout_key = keyboard.set_timeout(
-            tap_time,
-            lambda: self.on_tap_time_expired(key, keyboard, *args, **kwargs),
-        )
-        self.key_states[key] = HoldTapKeyState(timeout_key, *args, **kwargs)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = HoldTapKeyState(self, key, keyboard)
+        state.reset(*args, **kwargs)
+        state.timeout_key.start(tap_time)
+        self.key_states[key] = state
         return keyboard
 
     def ht_released(self, key, keyboard, *args, **kwargs):
@@ -190,9 +194,8 @@ class HoldTap(Module):
                 tap_time = self.tap_time
             else:
                 tap_time = key.meta.tap_time
-            state.timeout_key = keyboard.set_timeout(
-                tap_time, lambda: self.key_states.pop(key)
-            )
+            state.repeat = True
+            state.timeout_key.start(tap_time)
         else:
             del self.key_states[key]
 
@@ -82,9 +82,6 @@ class MouseKeys(Module):
     def during_bootup(self, keyboard):
         self._timer = PeriodicTimer(self.acc_interval)
 
-    def before_matrix_scan(self, keyboard):
-        return
-
     def after_matrix_scan(self, keyboard):
         if not self._timer.tick():
             return
@@ -106,18 +103,6 @@ class MouseKeys(Module):
         if self._mw_down_activated:
             AX.W.move(keyboard, -1)
 
-    def before_hid_send(self, keyboard):
-        return
-
-    def after_hid_send(self, keyboard):
-        return
-
-    def on_powersave_enable(self, keyboard):
-        return
-
-    def on_powersave_disable(self, keyboard):
-        return
-
     def _mw_up_press(self, key, keyboard, *args, **kwargs):
         self._mw_up_activated = True
 
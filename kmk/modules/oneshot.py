@@ -35,15 +35,11 @@ class OneShot(HoldTap):
             if (isinstance(current_key.meta, OneShotKeyMeta)) or (
                 isinstance(current_key.meta, LayerKeyMeta)
             ):
-                keyboard.cancel_timeout(state.timeout_key)
                 if key.meta.tap_time is None:
                     tap_time = self.tap_time
                 else:
                     tap_time = key.meta.tap_time
-                state.timeout_key = keyboard.set_timeout(
-                    tap_time,
-                    lambda k=key: self.on_tap_time_expired(k, keyboard),
-                )
+                state.timeout_key.start(tap_time)
                 continue
 
             if state.activated == ActivationType.PRESSED and is_pressed:
@@ -95,10 +95,14 @@ class ScrollHandler(TrackballHandler):
 
     def handle(self, keyboard, trackball, x, y, switch, state):
         if self.scroll_direction == ScrollDirection.REVERSE:
+            x = -x
             y = -y
 
         if y != 0:
             AX.W.move(keyboard, y)
+        if x != 0:
+            # Horizontal scrolling needs the 16-bit mouse.
+            AX.P.move(keyboard, x)
 
         if switch == 1:  # Button changed state
             keyboard.pre_process_key(KC.MB_LMB, is_pressed=state)
@@ -204,21 +208,6 @@ class Trackball(Module):
 
         self.current_handler.handle(keyboard, self, x, y, switch, state)
 
-    def after_matrix_scan(self, keyboard):
-        return
-
-    def before_hid_send(self, keyboard):
-        return
-
-    def after_hid_send(self, keyboard):
-        return
-
-    def on_powersave_enable(self, keyboard):
-        return
-
-    def on_powersave_disable(self, keyboard):
-        return
-
     def set_rgbw(self, r, g, b, w):
         '''Set all LED brightness as RGBW.'''
         self._i2c_rdwr([_REG_LED_RED, r, g, b, w])
@@ -45,16 +45,10 @@ class Power(Module):
     def during_bootup(self, keyboard):
         self._i2c_scan()
 
-    def before_matrix_scan(self, keyboard):
-        return
-
     def after_matrix_scan(self, keyboard):
         if keyboard.matrix_update or keyboard.secondary_matrix_update:
             self.psave_time_reset()
 
-    def before_hid_send(self, keyboard):
-        return
-
     def after_hid_send(self, keyboard):
         if self.enable:
             self.psleep()
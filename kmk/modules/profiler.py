@@ -0,0 +1,182 @@
+'''Records main loop latencies per phase, module and extension'''
+from micropython import const
+
+from array import array
+from time import monotonic_ns
+
+from kmk.extensions import Extension
+from kmk.keys import make_key
+from kmk.modules import Module
+from kmk.scheduler import MissedPeriods, Priority, create_task, dump_stats, reset_stats
+
+_BINS = const(16)
+
+# Main loop phases: (keyboard method, histogram name)
+_PHASES = (
+    ('_main_loop', 'main_loop'),
+    ('_process_resume_buffer', 'resume_buffer'),
+    ('_scan_matrix', 'matrix_scan'),
+    ('_handle_matrix_events', 'matrix_events'),
+    ('_send_hid', 'send_hid'),
+    ('_process_timeouts', 'timeouts'),
+    ('_idle', 'idle'),
+)
+
+_HOOKS = (
+    'before_matrix_scan',
+    'after_matrix_scan',
+    'before_hid_send',
+    'after_hid_send',
+    'on_powersave_enable',
+    'on_powersave_disable',
+)
+
+
+class Histogram:
+    '''
+    Log2 histogram of durations in microseconds: bin `i` counts durations in
+    the range [2^i, 2^(i+1)), the last bin counts everything above.
+    '''
+
+    def __init__(self, name, budget):
+        self.name = name
+        self.budget = budget
+        self.bins = array('L', [0] * _BINS)
+        self.count = 0
+        self.max = 0
+        self.overruns = 0
+
+    def record(self, us):
+        self.count += 1
+        if us > self.max:
+            self.max = us
+        if us > self.budget:
+            self.overruns += 1
+        idx = 0
+        while us > 1 and idx < _BINS - 1:
+            us >>= 1
+            idx += 1
+        self.bins[idx] += 1
+
+    def percentile(self, p):
+        '''Upper bound of the bin containing the `p`th percentile.'''
+        threshold = self.count * p // 100
+        acc = 0
+        for idx, n in enumerate(self.bins):
+            acc += n
+            if acc > threshold:
+                return 1 << (idx + 1)
+        return 1 << _BINS
+
+    def reset(self):
+        for idx in range(_BINS):
+            self.bins[idx] = 0
+        self.count = 0
+        self.max = 0
+        self.overruns = 0
+
+
+class Profiler(Module):
+    '''
+    Instruments the main loop phases and the hooks of all modules and
+    extensions with timing histograms. Nothing is instrumented unless this
+    module is loaded.
+    '''
+
+    def __init__(self, budget=1000, dump_period=0):
+        self.budget = budget
+        self.dump_period = dump_period
+        self.histograms = []
+
+        make_key(names=('PROFILER_DUMP', 'PRF_DMP'), on_press=self._dump_pressed)
+        make_key(names=('PROFILER_RESET', 'PRF_RST'), on_press=self._reset_pressed)
+
+    def during_bootup(self, keyboard):
+        for method, name in _PHASES:
+            setattr(keyboard, method, self._wrap(name, getattr(keyboard, method), 0))
+
+        for module in keyboard.modules:
+            if module is self:
+                continue
+            self._instrument(module, Module)
+            module.process_key = self._wrap(
+                module.__class__.__name__ + '.process_key', module.process_key, 4
+            )
+
+        for ext in keyboard.extensions:
+            self._instrument(ext, Extension)
+
+        if self.dump_period:
+            create_task(
+                self.dump,
+                period_ms=self.dump_period,
+                category='profiler',
+                missed=MissedPeriods.SKIP,
+                priority=Priority.BACKGROUND,
+            )
+
+    def _instrument(self, obj, base):
+        for hook in _HOOKS:
+            if getattr(type(obj), hook, None) is getattr(base, hook):
+                continue
+            name = obj.__class__.__name__ + '.' + hook
+            setattr(obj, hook, self._wrap(name, getattr(obj, hook), 1))
+
+    def _wrap(self, name, func, nargs):
+        # Wrappers are specialized by argument count to avoid allocating
+        # argument tuples on every call.
+        hist = Histogram(name, self.budget)
+        self.histograms.append(hist)
+
+        if nargs == 0:
+
+            def timed():
+                start = monotonic_ns()
+                ret = func()
+                hist.record((monotonic_ns() - start) // 1000)
+                return ret
+
+        elif nargs == 1:
+
+            def timed(arg):
+                start = monotonic_ns()
+                ret = func(arg)
+                hist.record((monotonic_ns() - start) // 1000)
+                return ret
+
+        else:
+
+            def timed(keyboard, key, is_pressed, int_coord):
+                start = monotonic_ns()
+                ret = func(keyboard, key, is_pressed, int_coord)
+                hist.record((monotonic_ns() - start) // 1000)
+                return ret
+
+        return timed
+
+    def dump(self):
+        print('profiler: name count max_us p50_us p99_us overruns')
+        for hist in self.histograms:
+            if not hist.count:
+                continue
+            print(
+                'profiler:',
+                hist.name,
+                hist.count,
+                hist.max,
+                hist.percentile(50),
+                hist.percentile(99),
+                hist.overruns,
+            )
+        dump_stats()
+
+    def reset(self):
+        for hist in self.histograms:
+            hist.reset()
+        reset_stats()
+
+    def _dump_pressed(self, key, keyboard, *args, **kwargs):
+        self.dump()
+
+    def _reset_pressed(self, key, keyboard, *args, **kwargs):
+        self.reset()
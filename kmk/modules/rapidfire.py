@@ -2,6 +2,7 @@ from random import randint
 
 from kmk.keys import make_argumented_key
 from kmk.modules import Module
+from kmk.scheduler import Priority, Timer
 
 
 class RapidFireMeta:
@@ -28,6 +29,7 @@ class RapidFire(Module):
     _waiting_keys = []
 
     def __init__(self):
+        self._timers = {}
         make_argumented_key(
             validator=RapidFireMeta,
             names=('RF',),
@@ -48,9 +50,18 @@ class RapidFire(Module):
             self._waiting_keys.remove(key)
         if key.meta.toggle and key not in self._toggled_keys:
             self._toggled_keys.append(key)
-        self._active_keys[key] = keyboard.set_timeout(
-            self._get_repeat(key), lambda: self._on_timer_timeout(key, keyboard)
-        )
+        self._active_keys[key] = self._timer(key, keyboard).start(self._get_repeat(key))
+
+    def _timer(self, key, keyboard):
+        # One timer per key, reused for every repetition.
+        timer = self._timers.get(key)
+        if timer is None:
+            timer = self._timers[key] = Timer(
+                lambda: self._on_timer_timeout(key, keyboard),
+                'rapidfire',
+                Priority.INPUT,
+            )
+        return timer
 
     def _rf_pressed(self, key, keyboard, *args, **kwargs):
         if key in self._toggled_keys:
@@ -60,9 +71,7 @@ class RapidFire(Module):
         if key.meta.timeout > 0:
             keyboard.tap_key(key.meta.kc)
             self._waiting_keys.append(key)
-            self._active_keys[key] = keyboard.set_timeout(
-                key.meta.timeout, lambda: self._on_timer_timeout(key, keyboard)
-            )
+            self._active_keys[key] = self._timer(key, keyboard).start(key.meta.timeout)
         else:
             self._on_timer_timeout(key, keyboard)
 
@@ -83,21 +92,3 @@ class RapidFire(Module):
 
     def during_bootup(self, keyboard):
         return
-
-    def before_matrix_scan(self, keyboard):
-        return
-
-    def before_hid_send(self, keyboard):
-        return
-
-    def after_hid_send(self, keyboard):
-        return
-
-    def on_powersave_enable(self, keyboard):
-        return
-
-    def on_powersave_disable(self, keyboard):
-        return
-
-    def after_matrix_scan(self, keyboard):
-        return
@@ -7,8 +7,181 @@ from keypad import Event as KeyEvent
 from storage import getmount
 
 from kmk.hid import HIDModes
-from kmk.kmktime import check_deadline
+from kmk.kmktime import check_deadline, ticks_add, ticks_diff
 from kmk.modules import Module
+from kmk.utils import Debug, RingBuffer, clamp
+
+debug = Debug(__name__)
+
+# Wire format of a UART frame:
+# header, kind, sequence number, payload length, payload, CRC-8 of everything
+# after the header. Key events are two payload bytes each: key number, pressed.
+# A digest is the first key number, the number of keys and a bitmap of the keys
+# that are pressed. A state update is the state version followed by the slots
+# that changed: slot, value length, value.
+_HEADER = const(0xB2)
+_FRAME_OVERHEAD = const(5)
+_FRAME_EVENTS = const(1)
+_FRAME_DIGEST = const(2)
+_FRAME_STATE = const(3)
+_MAX_EVENTS = const(16)
+_MAX_PAYLOAD = const(2 * _MAX_EVENTS)
+_RX_BUFFER_SIZE = const(128)
+_STATE_VERSION = const(1)
+_STATE_SLOTS = const(4)
+_MAX_STATE_VALUE = const(8)
+# BLE connection states and timings, durations in ms, scan slice in s.
+_BLE_IDLE = const(0)
+_BLE_SCANNING = const(1)
+_BLE_ADVERTISING = const(2)
+_BLE_CONNECTED = const(3)
+_BLE_SCAN_SLICE = 0.02
+_BLE_CONNECT_TIMEOUT = const(1)
+_BLE_ATTEMPT = const(5000)
+_BLE_BACKOFF_MIN = const(100)
+_BLE_BACKOFF_MAX = const(5000)
+# Mirrors `kmk.extensions.rgb.AnimationModes`.
+_RGB_STATIC = const(1)
+_RGB_STATIC_STANDBY = const(2)
+_RGB_BREATHING = const(3)
+_RGB_RAINBOW = const(4)
+_RGB_BREATHING_RAINBOW = const(5)
+_RGB_SWIRL = const(7)
+_RGB_USER = const(8)
+
+
+def _rgb_animates(mode):
+    # Which of hue and value the animation of a mode changes on every frame.
+    hue = mode in (_RGB_RAINBOW, _RGB_BREATHING_RAINBOW, _RGB_SWIRL, _RGB_USER)
+    val = mode in (_RGB_BREATHING, _RGB_BREATHING_RAINBOW, _RGB_USER)
+    return hue, val
+
+
+def _crc8_table():
+    # CRC-8, polynomial 0x07
+    table = bytearray(256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07 if crc & 0x80 else crc << 1) & 0xFF
+        table[i] = crc
+    return table
+
+
+_CRC8 = _crc8_table()
+
+
+def crc8(data, crc=0):
+    for byte in data:
+        crc = _CRC8[crc ^ byte]
+    return crc
+
+
+class FrameDecoder:
+    '''
+    Reassembles frames from a byte stream. Received bytes are read straight
+    into a preallocated ring buffer; after a successful `decode`, `kind`, `seq`
+    and `payload[:length]` describe the frame.
+
+    Counters: `frames` decoded, `corrupt` frames that failed the CRC check,
+    `lost` frames according to gaps in the sequence numbers, `skipped` bytes
+    while resynchronizing and `overflows`, bytes dropped for lack of space.
+    '''
+
+    def __init__(self, size=_RX_BUFFER_SIZE):
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._size = size
+        self._head = 0
+        self._count = 0
+        self._next_seq = None
+        self.payload = bytearray(_MAX_PAYLOAD)
+        self.kind = 0
+        self.seq = 0
+        self.length = 0
+        self.frames = 0
+        self.corrupt = 0
+        self.lost = 0
+        self.skipped = 0
+        self.overflows = 0
+
+    def readfrom(self, uart) -> int:
+        '''
+        Read as many waiting bytes from `uart` as fit into the contiguous free
+        space of the buffer, without blocking and without intermediate copies.
+        '''
+        waiting = uart.in_waiting
+        if not waiting:
+            return 0
+        if self._count >= self._size:
+            self._skip(1)
+            self.overflows += 1
+        tail = (self._head + self._count) % self._size
+        end = self._head if tail < self._head else self._size
+        n = uart.readinto(self._view[tail : min(end, tail + waiting)])
+        if n:
+            self._count += n
+            return n
+        return 0
+
+    def _at(self, index):
+        return self._buffer[(self._head + index) % self._size]
+
+    def _skip(self, n):
+        self._head = (self._head + n) % self._size
+        self._count -= n
+
+    def decode(self) -> bool:
+        '''
+        Decode the next complete frame, skipping garbage. Return `False` if
+        there's no complete frame yet.
+        '''
+        while self._count:
+            if self._at(0) != _HEADER:
+                self._skip(1)
+                self.skipped += 1
+                continue
+            if self._count < _FRAME_OVERHEAD - 1:
+                return False
+            length = self._at(3)
+            if length > _MAX_PAYLOAD:
+                self._skip(1)
+                self.skipped += 1
+                continue
+            if self._count < _FRAME_OVERHEAD + length:
+                return False
+            crc = 0
+            for i in range(1, 4 + length):
+                crc = _CRC8[crc ^ self._at(i)]
+            if crc != self._at(4 + length):
+                # Not a frame after all; resynchronize on the next header.
+                self._skip(1)
+                self.corrupt += 1
+                continue
+            self.kind = self._at(1)
+            self.seq = self._at(2)
+            self.length = length
+            for i in range(length):
+                self.payload[i] = self._at(4 + i)
+            self._skip(_FRAME_OVERHEAD + length)
+            self.frames += 1
+            if self._next_seq is not None:
+                self.lost += (self.seq - self._next_seq) & 0xFF
+            self._next_seq = (self.seq + 1) & 0xFF
+            return True
+        return False
+
+
+class SplitState:
+    '''
+    Slots of the state the target shares with the other half, see
+    `Split.subscribe`.
+    '''
+
+    LAYERS = const(0)
+    LOCKS = const(1)
+    RGB = const(2)
+    USER = const(3)
 
 
 class SplitSide:
@@ -37,10 +210,32 @@ class Split(Module):
         data_pin2=None,
         uart_flip=True,
         use_pio=False,
+        digest_interval=1000,
         debug_enabled=False,
     ):
         self._is_target = True
-        self._uart_buffer = []
+        self._uart_buffer = RingBuffer(_MAX_EVENTS, grow=True)
+        self._tx_events = bytearray(_MAX_PAYLOAD)
+        self._tx_count = 0
+        self._tx_frame = bytearray(_FRAME_OVERHEAD + _MAX_PAYLOAD)
+        self._tx_seq = 0
+        self._decoder = FrameDecoder()
+        self.digest_interval = digest_interval
+        self.digest_repairs = 0
+        self._digest = bytearray(_MAX_PAYLOAD)
+        self._digest_count = 0
+        self._digest_last = ticks_ms()
+        self._remote_digest = bytearray(_MAX_PAYLOAD)
+        self._remote_digest_pending = False
+        self.state = [None] * _STATE_SLOTS
+        self._subscribers = [[] for _ in range(_STATE_SLOTS)]
+        self._tx_state = bytearray(_MAX_PAYLOAD)
+        self._state_sent = [bytearray(_MAX_STATE_VALUE) for _ in range(_STATE_SLOTS)]
+        self._state_length = [-1] * _STATE_SLOTS
+        self._state_last = ticks_ms()
+        self._user_state = None
+        self._locks = None
+        self._rgb = None
         self.split_flip = split_flip
         self.split_side = split_side
         self.split_type = split_type
@@ -53,7 +248,6 @@ class Split(Module):
         self._uart = None
         self._uart_interval = uart_interval
         self._debug_enabled = debug_enabled
-        self.uart_header = bytearray([0xB2])  # Any non-zero byte should work
 
         if self.split_type == SplitType.BLE:
             try:
@@ -69,12 +263,12 @@ class Split(Module):
             except ImportError:
                 print('BLE Import error')
                 return  # BLE isn't supported on this platform
-            self._ble_last_scan = ticks_ms() - 5000
-            self._connection_count = 0
-            self._split_connected = False
+            self._ble_state = _BLE_IDLE
+            self._ble_deadline = ticks_ms()
+            self._ble_backoff = _BLE_BACKOFF_MIN
+            self._ble_known = ()
             self._uart_connection = None
-            self._advertisment = None  # Seems to not be used anywhere
-            self._advertising = False
+            self.peer_address = None
             self._psave_enable = False
 
         if self._use_pio:
@@ -83,6 +277,9 @@ class Split(Module):
             self.PIO_UART = PIO_UART
 
     def during_bootup(self, keyboard):
+        # In batching mode, the keyboard picks up further received events.
+        keyboard.secondary_matrix_updates = self._uart_buffer
+
         # Set up name for target side detection and BLE advertisment
         name = str(getmount('/').label)
         if self.split_type == SplitType.BLE:
@@ -164,17 +361,45 @@ class Split(Module):
                 matrix.offset = offset
                 offset += matrix.key_count
 
+        # The digest covers the keys of this half. BLE splits send bare key
+        # events without framing, and no digests.
+        count = sum(matrix.key_count for matrix in keyboard.matrix)
+        if self.split_type == SplitType.UART and count <= 8 * (_MAX_PAYLOAD - 2):
+            self._digest[0] = keyboard.matrix[0].offset
+            self._digest[1] = self._digest_count = count
+
+        # Extensions are recognized by their interface; importing them would
+        # pull in their hardware dependencies.
+        for ext in keyboard.extensions:
+            if hasattr(ext, 'get_caps_lock'):
+                self._locks = ext
+            elif hasattr(ext, 'animation_mode') and hasattr(ext, 'hue'):
+                self._rgb = ext
+
     def before_matrix_scan(self, keyboard):
         if self.split_type == SplitType.BLE:
-            self._check_all_connections(keyboard)
+            self._ble_step(keyboard)
             self._receive_ble(keyboard)
         elif self.split_type == SplitType.UART:
             if self._is_target or self.data_pin2:
                 self._receive_uart(keyboard)
+                if self._remote_digest_pending:
+                    self._check_digest(keyboard)
         elif self.split_type == SplitType.ONEWIRE:
             pass  # Protocol needs written
         return
 
+    def input_pending(self, keyboard):
+        if self._uart_buffer:
+            return True
+        if self._uart is None:
+            return False
+        if self.split_type == SplitType.BLE:
+            return self._uart.in_waiting >= 2
+        if self.split_type == SplitType.UART and (self._is_target or self.data_pin2):
+            return self._uart.in_waiting > 0
+        return False
+
     def after_matrix_scan(self, keyboard):
         if keyboard.matrix_update:
             if self.split_type == SplitType.UART:
@@ -195,10 +420,30 @@ class Split(Module):
         if not self._is_target:
             keyboard.hid_pending = False
 
+        # All key events of a cycle go out in a single frame.
+        if self._tx_count:
+            self._flush_uart()
+
+        if (
+            self.split_type == SplitType.UART
+            and self.digest_interval
+            and self._digest_count
+            and self._uart is not None
+            and (not self._is_target or self.data_pin2)
+            and not check_deadline(ticks_ms(), self._digest_last, self.digest_interval)
+        ):
+            self._send_digest()
+
         return
 
     def after_hid_send(self, keyboard):
-        return
+        if (
+            self.split_type == SplitType.UART
+            and self._is_target
+            and self.data_pin2
+            and self._uart is not None
+        ):
+            self._send_state(keyboard)
 
     def on_powersave_enable(self, keyboard):
         if self.split_type == SplitType.BLE:
@@ -212,109 +457,143 @@ class Split(Module):
                 self._uart_connection.connection_interval = 11.25
                 self._psave_enable = False
 
-    def _check_all_connections(self, keyboard):
-        '''Validates the correct number of BLE connections'''
-        self._previous_connection_count = self._connection_count
-        self._connection_count = len(self._ble.connections)
-        if self._is_target:
-            if self._advertising or not self._check_if_split_connected():
-                self._target_advertise()
-            elif self._connection_count < 2 and keyboard.hid_type == HIDModes.BLE:
+    def _ble_step(self, keyboard):
+        '''
+        Advance the BLE connection state machine by one step. No step blocks
+        for longer than a scan slice or, once a peer has been found, the
+        connection timeout.
+        '''
+        state = self._ble_state
+        now = ticks_ms()
+
+        if state == _BLE_CONNECTED:
+            connection = self._uart_connection
+            if connection is None or not connection.connected:
+                if self._debug_enabled:
+                    print('Split disconnected')
+                self._ble_retry()
+            elif (
+                self._is_target
+                and keyboard.hid_type == HIDModes.BLE
+                and len(self._ble.connections) < 2
+            ):
                 keyboard._hid_helper.start_advertising()
+            return
 
-        elif not self._is_target and self._connection_count < 1:
-            self._initiator_scan()
-
-    def _check_if_split_connected(self):
-        # I'm looking for a way how to recognize which connection is on and which one off
-        # For now, I found that service name relation to having other CP device
-        if self._connection_count == 0:
-            return False
-        if self._connection_count == 2:
-            self._split_connected = True
-            return True
-
-        # Polling this takes some time so I check only if connection_count changed
-        if self._previous_connection_count == self._connection_count:
-            return self._split_connected
-
-        bleio_connection = self._ble.connections[0]._bleio_connection
-        connection_services = bleio_connection.discover_remote_services()
-        for service in connection_services:
-            if str(service.uuid).startswith("UUID('adaf0001"):
-                self._split_connected = True
-                return True
-        return False
-
-    def _initiator_scan(self):
-        '''Scans for target device'''
-        self._uart = None
-        self._uart_connection = None
-        # See if any existing connections are providing UARTService.
-        self._connection_count = len(self._ble.connections)
-        if self._connection_count > 0 and not self._uart:
-            for connection in self._ble.connections:
-                if self.UARTService in connection:
-                    self._uart_connection = connection
-                    self._uart_connection.connection_interval = 11.25
-                    self._uart = self._uart_connection[self.UARTService]
-                    break
-
-        if not self._uart:
-            if self._debug_enabled:
-                print('Scanning')
-            self._ble.stop_scan()
-            for adv in self._ble.start_scan(
-                self.ProvideServicesAdvertisement, timeout=20
-            ):
+        if state == _BLE_IDLE:
+            if ticks_diff(now, self._ble_deadline) < 0:
+                # Let the host find the keyboard while the split is waiting.
+                if self._is_target and keyboard.hid_type == HIDModes.BLE:
+                    keyboard._hid_helper.start_advertising()
+                return
+            if self._is_target:
+                self._ble_advertise()
+            elif self._ble_reuse():
+                return
+            else:
                 if self._debug_enabled:
                     print('Scanning')
-                if self.UARTService in adv.services and adv.rssi > -70:
-                    self._uart_connection = self._ble.connect(adv)
-                    self._uart_connection.connection_interval = 11.25
-                    self._uart = self._uart_connection[self.UARTService]
-                    self._ble.stop_scan()
-                    if self._debug_enabled:
-                        print('Scan complete')
-                    break
-        self._ble.stop_scan()
-
-    def _target_advertise(self):
-        '''Advertises the target for the initiator to find'''
-        # Give previous advertising some time to complete
-        if self._advertising:
-            if self._check_if_split_connected():
+                self._ble_state = _BLE_SCANNING
+            self._ble_deadline = ticks_add(now, _BLE_ATTEMPT)
+            return
+
+        attempt_over = ticks_diff(now, self._ble_deadline) >= 0
+        if state == _BLE_ADVERTISING:
+            # The split advertisement is the only one running, so a new
+            # connection that isn't bonded, like a reconnecting HID host, is
+            # the other half. No need for service discovery.
+            for connection in self._ble.connections:
+                if connection not in self._ble_known and not connection.paired:
+                    self._ble.stop_advertising()
+                    self._ble_connected(connection)
+                    return
+            if attempt_over:
                 if self._debug_enabled:
-                    print('Advertising complete')
+                    print('Advertising not answered')
                 self._ble.stop_advertising()
-                self._advertising = False
-                return
-
-            if not self.ble_rescan_timer():
-                return
+                self._ble_retry()
+        elif state == _BLE_SCANNING:
+            self._ble_scan()
+            if self._ble_state == _BLE_SCANNING and attempt_over:
+                self._ble_retry()
 
-            if self._debug_enabled:
-                print('Advertising not answered')
-
-        self._ble.stop_advertising()
+    def _ble_advertise(self):
         if self._debug_enabled:
             print('Advertising')
+        self._ble.stop_advertising()
         # Uart must not change on this connection if reconnecting
         if not self._uart:
             self._uart = self.UARTService()
-        advertisement = self.ProvideServicesAdvertisement(self._uart)
-
-        self._ble.start_advertising(advertisement)
-        self._advertising = True
-        self.ble_time_reset()
+        self._ble_known = self._ble.connections
+        self._ble.start_advertising(self.ProvideServicesAdvertisement(self._uart))
+        self._ble_state = _BLE_ADVERTISING
+
+    def _ble_reuse(self):
+        '''
+        Pick up an existing connection to the other half, e.g. after a soft
+        reload. The other half doesn't advertise while it's connected, and
+        wouldn't be found by scanning.
+        '''
+        for connection in self._ble.connections:
+            if connection.connected and self.UARTService in connection:
+                self._uart = connection[self.UARTService]
+                if self._debug_enabled:
+                    print('Reusing connection')
+                self._ble_connected(connection)
+                return True
+        return False
 
-    def ble_rescan_timer(self):
-        '''If true, the rescan timer is up'''
-        return not bool(check_deadline(ticks_ms(), self._ble_last_scan, 5000))
+    def _ble_scan(self):
+        '''
+        Scan for a single slice. Once the other half has been seen, only its
+        address is accepted, regardless of the signal strength.
+        '''
+        peer = None
+        for adv in self._ble.start_scan(
+            self.ProvideServicesAdvertisement, timeout=_BLE_SCAN_SLICE
+        ):
+            if self.UARTService not in adv.services:
+                continue
+            if self.peer_address is None:
+                if adv.rssi > -70:
+                    peer = adv
+                    break
+            elif adv.address == self.peer_address:
+                peer = adv
+                break
+        self._ble.stop_scan()
+        if peer is None:
+            return
 
-    def ble_time_reset(self):
-        '''Resets the rescan timer'''
-        self._ble_last_scan = ticks_ms()
+        try:
+            connection = self._ble.connect(peer, timeout=_BLE_CONNECT_TIMEOUT)
+            self._uart = connection[self.UARTService]
+        except Exception as err:
+            if self._debug_enabled:
+                print('Connection failed:', err)
+            self._ble_retry()
+            return
+        self.peer_address = peer.address
+        if self._debug_enabled:
+            print('Scan complete')
+        self._ble_connected(connection)
+
+    def _ble_connected(self, connection):
+        connection.connection_interval = 11.25
+        self._psave_enable = False
+        self._uart_connection = connection
+        self._ble_known = ()
+        self._ble_state = _BLE_CONNECTED
+        self._ble_backoff = _BLE_BACKOFF_MIN
+
+    def _ble_retry(self):
+        # Back off exponentially until the next attempt.
+        self._uart_connection = None
+        if not self._is_target:
+            self._uart = None
+        self._ble_state = _BLE_IDLE
+        self._ble_deadline = ticks_add(ticks_ms(), self._ble_backoff)
+        self._ble_backoff = min(2 * self._ble_backoff, _BLE_BACKOFF_MAX)
 
     def _serialize_update(self, update):
         buffer = bytearray(2)
@@ -343,42 +622,240 @@ class Split(Module):
                 self._uart = None
 
     def _receive_ble(self, keyboard):
-        if self._uart is not None and self._uart.in_waiting > 0 or self._uart_buffer:
+        if self._uart is not None:
             while self._uart.in_waiting >= 2:
                 update = self._deserialize_update(self._uart.read(2))
                 self._uart_buffer.append(update)
-            if self._uart_buffer:
-                keyboard.secondary_matrix_update = self._uart_buffer.pop(0)
-
-    def _checksum(self, update):
-        checksum = bytes([sum(update) & 0xFF])
+        self._queue_updates(keyboard)
 
-        return checksum
+    def _queue_updates(self, keyboard):
+        '''
+        Hand the next received event over as the `secondary_matrix_update` of
+        this cycle, so that modules see every event in `after_matrix_scan`. In
+        batching mode the keyboard picks up the rest of the buffer itself.
+        '''
+        if self._uart_buffer and keyboard.secondary_matrix_update is None:
+            keyboard.secondary_matrix_update = self._uart_buffer.popleft()
 
     def _send_uart(self, update):
         # Change offsets depending on where the data is going to match the correct
         # matrix location of the receiever
+        if self._uart is None:
+            return
+        if self._tx_count >= _MAX_EVENTS:
+            self._flush_uart()
+        events = self._tx_events
+        events[2 * self._tx_count] = update.key_number
+        events[2 * self._tx_count + 1] = update.pressed
+        self._tx_count += 1
+
+        if self._digest_count:
+            index = update.key_number - self._digest[0]
+            if 0 <= index < self._digest_count:
+                mask = 1 << (index & 7)
+                if update.pressed:
+                    self._digest[2 + (index >> 3)] |= mask
+                else:
+                    self._digest[2 + (index >> 3)] &= ~mask
+
+    def _flush_uart(self):
+        self._send_frame(_FRAME_EVENTS, self._tx_events, 2 * self._tx_count)
+        self._tx_count = 0
+
+    def _send_digest(self):
+        self._send_frame(_FRAME_DIGEST, self._digest, 2 + (self._digest_count + 7) // 8)
+        self._digest_last = ticks_ms()
+
+    def subscribe(self, slot, callback):
+        '''
+        Call `callback(value)` on the receiving half whenever `slot` of the
+        shared state changes. `value` is the raw bytes of the slot.
+        '''
+        self._subscribers[slot].append(callback)
+
+    def set_user_state(self, value):
+        '''
+        Share up to 8 bytes of user defined state with the other half.
+        '''
+        if len(value) > _MAX_STATE_VALUE:
+            raise ValueError('user state too long')
+        self._user_state = bytes(value)
+
+    def _encode_state(self, keyboard, slot, payload, offset):
+        '''
+        Write the current value of a state slot to `payload` at `offset` and
+        return its length, or -1 if there's nothing to share.
+        '''
+        if slot == SplitState.LAYERS:
+            layers = keyboard.active_layers
+            count = min(len(layers), _MAX_STATE_VALUE)
+            for i in range(count):
+                payload[offset + i] = layers[i]
+            return count
+        if slot == SplitState.LOCKS:
+            if self._locks is None:
+                return -1
+            payload[offset] = self._locks.report
+            return 1
+        if slot == SplitState.RGB:
+            rgb = self._rgb
+            if rgb is None:
+                return -1
+            mode = rgb.animation_mode
+            # Standby only means that the static color has been drawn.
+            if mode == _RGB_STATIC_STANDBY:
+                mode = _RGB_STATIC
+            payload[offset] = mode
+            payload[offset + 1] = clamp(rgb.sat, 0, 255)
+            payload[offset + 2] = clamp(int(rgb.animation_speed), 0, 255)
+            count = 3
+            # Hue and value are only shared when they're settings, not the
+            # output of the running animation.
+            hue, val = _rgb_animates(mode)
+            if not hue:
+                payload[offset + count] = clamp(rgb.hue, 0, 255)
+                count += 1
+            if not val:
+                payload[offset + count] = clamp(rgb.val, 0, 255)
+                count += 1
+            return count
+        user = self._user_state
+        if user is None:
+            return -1
+        payload[offset : offset + len(user)] = user
+        return len(user)
+
+    def _state_changed(self, slot, payload, offset, count):
+        sent = self._state_sent[slot]
+        changed = self._state_length[slot] != count
+        for i in range(count):
+            if sent[i] != payload[offset + i]:
+                sent[i] = payload[offset + i]
+                changed = True
+        self._state_length[slot] = count
+        return changed
+
+    def _send_state(self, keyboard):
+        # Resend everything now and then, in case the other half missed an
+        # update or started later.
+        if self.digest_interval and not check_deadline(
+            ticks_ms(), self._state_last, self.digest_interval
+        ):
+            for slot in range(_STATE_SLOTS):
+                self._state_length[slot] = -1
+            self._state_last = ticks_ms()
+
+        payload = self._tx_state
+        payload[0] = _STATE_VERSION
+        length = 1
+        for slot in range(_STATE_SLOTS):
+            count = self._encode_state(keyboard, slot, payload, length + 2)
+            if count < 0 or not self._state_changed(slot, payload, length + 2, count):
+                continue
+            payload[length] = slot
+            payload[length + 1] = count
+            length += 2 + count
+        if length > 1:
+            self._send_frame(_FRAME_STATE, payload, length)
+
+    def _receive_state(self, keyboard, frame):
+        payload = frame.payload
+        if payload[0] != _STATE_VERSION:
+            if debug.enabled:
+                debug('state version mismatch: ', payload[0])
+            return
+        i = 1
+        while i + 1 < frame.length:
+            slot = payload[i]
+            value = bytes(payload[i + 2 : i + 2 + payload[i + 1]])
+            i += 2 + len(value)
+            if slot >= _STATE_SLOTS or value == self.state[slot]:
+                continue
+            self.state[slot] = value
+            self._apply_state(keyboard, slot, value)
+            for callback in self._subscribers[slot]:
+                callback(value)
+
+    def _apply_state(self, keyboard, slot, value):
+        if slot == SplitState.LAYERS:
+            keyboard.active_layers[:] = value
+        elif slot == SplitState.LOCKS:
+            if self._locks is not None:
+                self._locks.set_report(value[0])
+        elif slot == SplitState.RGB:
+            rgb = self._rgb
+            if rgb is not None:
+                rgb.animation_mode, rgb.sat, rgb.animation_speed = value[:3]
+                hue, val = _rgb_animates(value[0])
+                if not hue:
+                    rgb.hue = value[3]
+                if not val:
+                    rgb.val = value[-1]
+
+    def _send_frame(self, kind, payload, length):
+        frame = self._tx_frame
+        frame[0] = _HEADER
+        frame[1] = kind
+        frame[2] = self._tx_seq
+        frame[3] = length
+        frame[4 : 4 + length] = payload[:length]
+        frame[4 + length] = crc8(memoryview(frame)[1 : 4 + length])
+        self._tx_seq = (self._tx_seq + 1) & 0xFF
         if self._uart is not None:
-            update = self._serialize_update(update)
-            self._uart.write(self.uart_header)
-            self._uart.write(update)
-            self._uart.write(self._checksum(update))
+            self._uart.write(memoryview(frame)[: _FRAME_OVERHEAD + length])
 
     def _receive_uart(self, keyboard):
-        if self._uart is not None and self._uart.in_waiting > 0 or self._uart_buffer:
-            if self._uart.in_waiting >= 60:
-                # This is a dirty hack to prevent crashes in unrealistic cases
-                import microcontroller
-
-                microcontroller.reset()
-
-            while self._uart.in_waiting >= 4:
-                # Check the header
-                if self._uart.read(1) == self.uart_header:
-                    update = self._uart.read(2)
-
-                    # check the checksum
-                    if self._checksum(update) == self._uart.read(1):
-                        self._uart_buffer.append(self._deserialize_update(update))
-            if self._uart_buffer:
-                keyboard.secondary_matrix_update = self._uart_buffer.pop(0)
+        uart = self._uart
+        if uart is None:
+            return
+        decoder = self._decoder
+        # Consume whatever is waiting, a buffer full at a time.
+        while decoder.readfrom(uart):
+            while decoder.decode():
+                self._receive_frame(keyboard, decoder)
+        self._queue_updates(keyboard)
+
+    def _receive_frame(self, keyboard, frame):
+        if frame.kind == _FRAME_EVENTS:
+            payload = frame.payload
+            for i in range(0, frame.length, 2):
+                self._uart_buffer.append(
+                    KeyEvent(key_number=payload[i], pressed=payload[i + 1])
+                )
+            # Any digest received earlier is outdated now.
+            self._remote_digest_pending = False
+        elif frame.kind == _FRAME_DIGEST:
+            self._remote_digest[: frame.length] = frame.payload[: frame.length]
+            self._remote_digest_pending = True
+        elif frame.kind == _FRAME_STATE:
+            self._receive_state(keyboard, frame)
+
+    def _check_digest(self, keyboard):
+        '''
+        Compare the last digest from the other half against the keys the
+        keyboard considers pressed, and make up for lost events. Only once all
+        received events have been handled, otherwise they'd be missing from
+        the comparison.
+        '''
+        if (
+            self._uart_buffer
+            or keyboard.secondary_matrix_update is not None
+            or keyboard.matrix_update_queue
+            or keyboard._resume_buffer
+        ):
+            return
+        self._remote_digest_pending = False
+
+        digest = self._remote_digest
+        first = digest[0]
+        pressed = keyboard._coordkeys_pressed
+        for index in range(digest[1]):
+            is_pressed = bool(digest[2 + (index >> 3)] & (1 << (index & 7)))
+            if is_pressed != (first + index in pressed):
+                if debug.enabled:
+                    debug('digest repair: ', first + index, ' pressed=', is_pressed)
+                self._uart_buffer.append(
+                    KeyEvent(key_number=first + index, pressed=is_pressed)
+                )
+                self.digest_repairs += 1
+        self._queue_updates(keyboard)
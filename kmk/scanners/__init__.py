@@ -33,6 +33,15 @@ class Scanner:
     def key_count(self):
         raise NotImplementedError
 
+    @property
+    def events_pending(self):
+        '''
+        Whether there are key events waiting to be scanned. Scanners that can't
+        tell without scanning always report `True`, which prevents the keyboard
+        from idling.
+        '''
+        return True
+
     def scan_for_changes(self):
         '''
         Scan for key events and return a key report if an event exists.
@@ -15,6 +15,10 @@ class RotaryioEncoder(Scanner):
     def key_count(self):
         return 2
 
+    @property
+    def events_pending(self):
+        return bool(self._queue) or self.encoder.position != self.position
+
     def scan_for_changes(self):
         position = self.encoder.position
 
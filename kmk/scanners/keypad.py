@@ -15,6 +15,10 @@ class KeypadScanner(Scanner):
     def key_count(self):
         return self.keypad.key_count
 
+    @property
+    def events_pending(self):
+        return len(self.keypad.events) > 0
+
     def scan_for_changes(self):
         '''
         Scan for key events and return a key report if an event exists.
@@ -3,10 +3,12 @@ Here we're abusing _asyncios TaskQueue to implement a very simple priority
 queue task scheduler.
 Despite documentation, Circuitpython doesn't usually ship with a min-heap
 module; it does however implement a pairing-heap for `TaskQueue` in native code.
+Optionally, `kmk.timer_wheel` can be used instead, see `set_backend`.
+There's one queue per task priority class.
 '''
 
 try:
-    from typing import Callable
+    from typing import Callable, Optional
 except ImportError:
     pass
 
@@ -16,19 +18,215 @@ from _asyncio import Task, TaskQueue
 
 from kmk.kmktime import ticks_add, ticks_diff
 
-_task_queue = TaskQueue()
+
+class Priority:
+    '''
+    Due tasks run in order of their priority class, then of their deadlines.
+    INPUT is for timeouts that decide what keys do, like hold-tap and combos.
+    BACKGROUND is for cosmetics like animations, which only get to run as long
+    as the current main loop cycle is within `background_budget`.
+    '''
+
+    INPUT = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+# Time in ms a main loop cycle may have spent processing due tasks, before
+# background tasks are deferred to the next cycle. 0 disables the budget.
+background_budget = 5
+
+_queues = [TaskQueue(), TaskQueue(), TaskQueue()]
+_task_queue = _queues[Priority.NORMAL]
+
+
+def set_backend(backend: str) -> None:
+    '''
+    Select the task queue: 'heap' for the native pairing heap (default), or
+    'wheel' for a timer wheel with O(1) insert and cancel. Tasks created before
+    switching are dropped, so do this at boot, before the keyboard and its
+    modules are created.
+    '''
+    global Task, _task_queue
+    if backend == 'heap':
+        import _asyncio as queue
+
+        cls = queue.TaskQueue
+    elif backend == 'wheel':
+        import kmk.timer_wheel as queue
+
+        cls = queue.TimerWheel
+    else:
+        raise ValueError('unknown scheduler backend ' + backend)
+    Task = queue.Task
+    for priority in range(len(_queues)):
+        _queues[priority] = cls()
+    _task_queue = _queues[Priority.NORMAL]
+
+
+class TaskStats:
+    '''
+    Timing statistics of one task category: how many tasks ran, how late they
+    ran in ms (`now - deadline`), and how often a periodic task was so late
+    that its next period was already due when it finished.
+    '''
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.runs = 0
+        self.late_total = 0
+        self.late_max = 0
+        self.overruns = 0
+
+    @property
+    def late_mean(self) -> float:
+        return self.late_total / self.runs if self.runs else 0
+
+
+_stats = {}
+_due = 0
+_due_max = 0
+
+
+def get_stats(category: Optional[str] = None) -> [TaskStats, dict]:
+    '''
+    Return the statistics of a task category, created on first use, or a dict
+    of all categories. Tasks created by `create_task` without a period count as
+    'task', periodic tasks default to 'periodic' and timers to 'timer'.
+    '''
+    if category is None:
+        return _stats
+    try:
+        return _stats[category]
+    except KeyError:
+        stats = _stats[category] = TaskStats()
+        return stats
+
+
+def get_due_max() -> int:
+    '''
+    Return the largest number of tasks that were due at once.
+    '''
+    return _due_max
+
+
+def reset_stats() -> None:
+    global _due_max
+    _due_max = 0
+    for stats in _stats.values():
+        stats.reset()
+
+
+def dump_stats() -> None:
+    '''
+    Print the statistics of all task categories to the serial console.
+    '''
+    print('scheduler: category runs late_max_ms late_mean_ms overruns')
+    for category, stats in _stats.items():
+        if stats.runs:
+            print(
+                'scheduler:',
+                category,
+                stats.runs,
+                stats.late_max,
+                stats.late_mean,
+                stats.overruns,
+            )
+    print('scheduler: due_max', _due_max)
+
+
+_task_stats = get_stats('task')
+
+
+class MissedPeriods:
+    '''
+    What a periodic task does about periods that were missed because the main
+    loop was busy:
+    CATCH_UP runs once for every missed period, back to back.
+    SKIP drops the missed periods and runs on the next period boundary.
+    COALESCE is SKIP, but the task is called with the number of elapsed periods.
+    '''
+
+    CATCH_UP = 0
+    SKIP = 1
+    COALESCE = 2
 
 
 class PeriodicTaskMeta:
-    def __init__(self, func: Callable[[None], None], period: int) -> None:
-        self._task = Task(self.call)
+    def __init__(
+        self,
+        func: Callable[[None], None],
+        period: int,
+        category: str = 'periodic',
+        missed: int = MissedPeriods.CATCH_UP,
+        priority: int = Priority.NORMAL,
+    ) -> None:
+        self._task = Task(self)
         self._coro = func
         self.period = period
+        self.missed = missed
+        self.priority = priority
+        self.task_stats = get_stats(category)
+
+    def __call__(self) -> None:
+        period = self.period
+        deadline = self._task.ph_key
+        if self.missed == MissedPeriods.COALESCE:
+            self._coro(ticks_diff(ticks_ms(), deadline) // period + 1)
+        else:
+            self._coro()
+        after_ms = ticks_add(deadline, period)
+        late = ticks_diff(ticks_ms(), after_ms)
+        if late >= 0:
+            self.task_stats.overruns += 1
+            if self.missed != MissedPeriods.CATCH_UP:
+                # Stay on the original period boundaries, so there's no drift.
+                after_ms = ticks_add(after_ms, (late // period + 1) * period)
+        _queues[self.priority].push_sorted(self._task, after_ms)
+
+
+class Timer:
+    '''
+    A reusable one-shot task: allocate once, then `start` and `cancel` it as
+    often as needed, without allocating a new task every time.
+    '''
+
+    def __init__(
+        self,
+        func: Callable[[None], None],
+        category: str = 'timer',
+        priority: int = Priority.NORMAL,
+    ) -> None:
+        self._task = Task(self)
+        self._func = func
+        self.active = False
+        self.priority = priority
+        self.task_stats = get_stats(category)
+
+    def __call__(self) -> None:
+        self.active = False
+        self._func()
+
+    def start(self, after_ms: int = 0) -> 'Timer':
+        '''
+        (Re-)start the timer, replacing any pending timeout.
+        '''
+        queue = _queues[self.priority]
+        if self.active:
+            queue.remove(self._task)
+        self.active = True
+        if after_ms > 0:
+            queue.push_sorted(self._task, ticks_add(ticks_ms(), after_ms))
+        else:
+            queue.push_head(self._task)
+        return self
 
-    def call(self) -> None:
-        self._coro()
-        after_ms = ticks_add(self._task.ph_key, self.period)
-        _task_queue.push_sorted(self._task, after_ms)
+    def cancel(self) -> None:
+        if self.active:
+            _queues[self.priority].remove(self._task)
+            self.active = False
 
 
 def create_task(
@@ -36,33 +234,111 @@ def create_task(
     *,
     after_ms: int = 0,
     period_ms: int = 0,
+    category: str = 'periodic',
+    missed: int = MissedPeriods.CATCH_UP,
+    priority: int = Priority.NORMAL,
 ) -> [Task, PeriodicTaskMeta]:
-    if isinstance(func, (Task, PeriodicTaskMeta)):
+    '''
+    Schedule `func`. `category`, `missed` and `priority` apply to periodic
+    tasks only, other tasks always have normal priority.
+    '''
+    queue = _task_queue
+    if isinstance(func, PeriodicTaskMeta):
+        r = func
+        t = r._task
+        queue = _queues[r.priority]
+    elif isinstance(func, Task):
         t = r = func
     elif period_ms:
-        r = PeriodicTaskMeta(func, period_ms)
+        r = PeriodicTaskMeta(func, period_ms, category, missed, priority)
         t = r._task
+        queue = _queues[priority]
     else:
         t = r = Task(func)
 
     if after_ms > 0:
-        _task_queue.push_sorted(t, ticks_add(ticks_ms(), after_ms))
+        queue.push_sorted(t, ticks_add(ticks_ms(), after_ms))
     elif after_ms == 0:
-        _task_queue.push_head(t)
+        queue.push_head(t)
 
     return r
 
 
+def _record(t: Task, now: int) -> Callable:
+    global _due
+    _due += 1
+    func = t.coro
+    stats = getattr(func, 'task_stats', _task_stats)
+    late = ticks_diff(now, t.ph_key)
+    stats.runs += 1
+    stats.late_total += late
+    if late > stats.late_max:
+        stats.late_max = late
+    return func
+
+
+def _end_pass() -> None:
+    global _due, _due_max, _pass_start
+    if _due > _due_max:
+        _due_max = _due
+    _due = 0
+    _pass_start = None
+
+
+_pass_start = None
+
+
+def pop_due_task() -> Optional[Callable]:
+    '''
+    Return the next task that's due, or `None` at the end of a main loop cycle.
+    '''
+    global _pass_start
+    now = ticks_ms()
+    if _pass_start is None:
+        _pass_start = now
+    for priority in range(Priority.BACKGROUND + 1):
+        queue = _queues[priority]
+        t = queue.peek()
+        if not t or ticks_diff(t.ph_key, now) > 0:
+            continue
+        if (
+            priority == Priority.BACKGROUND
+            and background_budget
+            and ticks_diff(now, _pass_start) >= background_budget
+        ):
+            break
+        queue.pop_head()
+        return _record(t, now)
+    _end_pass()
+    return None
+
+
 def get_due_task() -> [Callable, None]:
     while True:
-        t = _task_queue.peek()
-        if not t or ticks_diff(t.ph_key, ticks_ms()) > 0:
+        func = pop_due_task()
+        if func is None:
             break
-        _task_queue.pop_head()
-        yield t.coro
+        yield func
+
+
+def get_next_deadline() -> Optional[int]:
+    '''
+    Return the `ticks_ms` deadline of the next scheduled task, or `None` if
+    there's nothing scheduled.
+    '''
+    deadline = None
+    for queue in _queues:
+        t = queue.peek()
+        if t and (deadline is None or ticks_diff(t.ph_key, deadline) < 0):
+            deadline = t.ph_key
+    return deadline
 
 
-def cancel_task(t: [Task, PeriodicTaskMeta]) -> None:
+def cancel_task(t: [Task, PeriodicTaskMeta, Timer]) -> None:
+    if isinstance(t, Timer):
+        t.cancel()
+        return
     if isinstance(t, PeriodicTaskMeta):
-        t = t._task
+        _queues[t.priority].remove(t._task)
+        return
     _task_queue.remove(t)
@@ -0,0 +1,207 @@
+'''
+A hierarchical timer wheel with the same interface as `_asyncio.TaskQueue`,
+as an alternative backend for `kmk.scheduler`.
+
+Level 0 has one slot per millisecond for the next 256ms, level 1 one bucket
+per 256ms for the next ~16s, and everything further out goes into a single
+overflow list. Every slot is a doubly linked list of tasks, which makes
+inserting and removing a task O(1). Tasks on the upper levels are moved down
+whenever the wheel turns past a bucket boundary. Like the heap, tasks are
+popped in order of their deadline, and tasks with the same deadline in the
+order they were pushed.
+'''
+
+from micropython import const
+from supervisor import ticks_ms
+
+from kmk.kmktime import ticks_add, ticks_diff
+
+_SLOT_BITS = const(8)
+_SLOTS = const(1 << _SLOT_BITS)
+_SLOT_MASK = const(_SLOTS - 1)
+_BUCKETS = const(64)
+_BUCKET_MASK = const(_BUCKETS - 1)
+_SPAN = const(_SLOTS * _BUCKETS)
+_OVERFLOW = const(_SLOTS + _BUCKETS)
+
+
+class Task:
+    def __init__(self, coro):
+        self.coro = coro
+        self.ph_key = 0
+        self.seq = 0
+        self.prev = None
+        self.next = None
+        self.slot = -1
+
+
+def _before(a: Task, b: Task) -> bool:
+    diff = ticks_diff(a.ph_key, b.ph_key)
+    return diff < 0 or (diff == 0 and ticks_diff(a.seq, b.seq) < 0)
+
+
+def _earliest(t: Task, best: Task) -> Task:
+    while t:
+        if best is None or _before(t, best):
+            best = t
+        t = t.next
+    return best
+
+
+class TimerWheel:
+    def __init__(self):
+        self._head = [None] * (_OVERFLOW + 1)
+        self._tail = [None] * (_OVERFLOW + 1)
+        self._cursor = ticks_ms()
+        self._count = 0
+        self._seq = 0
+        self._level0 = 0
+        # Cached earliest task, `None` if unknown.
+        self._next = None
+
+    def peek(self) -> Task:
+        if not self._count:
+            return None
+        if self._next is None:
+            self._next = self._find_next()
+        return self._next
+
+    def push_sorted(self, t: Task, key: int) -> None:
+        if t.slot >= 0:
+            self.remove(t)
+        t.ph_key = key
+        t.seq = self._seq = ticks_add(self._seq, 1)
+        if not self._count:
+            # Don't turn an idle wheel through all the time it's been idle.
+            self._cursor = ticks_ms()
+        else:
+            self._catch_up()
+        self._insert(t)
+        self._count += 1
+        if self._count == 1:
+            self._next = t
+        elif self._next is not None and _before(t, self._next):
+            self._next = t
+
+    def push_head(self, t: Task) -> None:
+        self.push_sorted(t, ticks_ms())
+
+    def pop_head(self) -> Task:
+        t = self.peek()
+        slot = t.slot
+        self.remove(t)
+        if self._count:
+            # Tasks due at the same time share a slot, and none of them can
+            # be on the upper levels before the next bucket.
+            if slot < _SLOTS and ticks_diff(t.ph_key, self._bucket_end()) < 0:
+                n = _earliest(self._head[slot], None)
+                if n is not None and n.ph_key == t.ph_key:
+                    self._next = n
+            self._advance(t.ph_key)
+        return t
+
+    def remove(self, t: Task) -> None:
+        slot = t.slot
+        if slot < 0:
+            return
+        if t.prev:
+            t.prev.next = t.next
+        else:
+            self._head[slot] = t.next
+        if t.next:
+            t.next.prev = t.prev
+        else:
+            self._tail[slot] = t.prev
+        t.prev = t.next = None
+        t.slot = -1
+        self._count -= 1
+        if slot < _SLOTS:
+            self._level0 -= 1
+        if t is self._next:
+            self._next = None
+
+    def _insert(self, t: Task) -> None:
+        delta = ticks_diff(t.ph_key, self._cursor)
+        if delta < _SLOTS:
+            # Overdue tasks go into the current slot.
+            slot = (t.ph_key if delta > 0 else self._cursor) & _SLOT_MASK
+            self._level0 += 1
+        elif delta < _SPAN:
+            slot = _SLOTS + ((t.ph_key >> _SLOT_BITS) & _BUCKET_MASK)
+        else:
+            slot = _OVERFLOW
+        t.slot = slot
+        t.next = None
+        t.prev = self._tail[slot]
+        if t.prev:
+            t.prev.next = t
+        else:
+            self._head[slot] = t
+        self._tail[slot] = t
+
+    def _rehash(self, slot: int) -> None:
+        t = self._head[slot]
+        self._head[slot] = self._tail[slot] = None
+        while t:
+            n = t.next
+            self._insert(t)
+            t = n
+
+    def _catch_up(self) -> None:
+        # The cursor only moves when tasks are popped. Bring it up to the
+        # current time, or the earliest deadline if that's earlier, so that new
+        # tasks are placed relative to now and not to a stale cursor.
+        target = ticks_ms()
+        t = self.peek()
+        if ticks_diff(t.ph_key, target) < 0:
+            target = t.ph_key
+        if ticks_diff(target, self._cursor) > 0:
+            self._advance(target)
+
+    def _advance(self, deadline: int) -> None:
+        # Turn the wheel up to the given deadline. Nothing is due earlier, so
+        # all level 0 slots in between are empty.
+        cursor = self._cursor
+        if ticks_diff(deadline, cursor) >= _SPAN:
+            # Jump instead of turning through every bucket in between: there's
+            # nothing on level 0, and everything else is placed anew.
+            self._cursor = deadline
+            for slot in range(_SLOTS, _OVERFLOW + 1):
+                self._rehash(slot)
+            return
+        while True:
+            delta = ticks_diff(deadline, cursor)
+            step = _SLOTS - (cursor & _SLOT_MASK)
+            if delta < step:
+                break
+            cursor = self._cursor = ticks_add(cursor, step)
+            bucket = (cursor >> _SLOT_BITS) & _BUCKET_MASK
+            if not bucket:
+                self._rehash(_OVERFLOW)
+            self._rehash(_SLOTS + bucket)
+        if delta > 0:
+            self._cursor = ticks_add(cursor, delta)
+
+    def _bucket_end(self) -> int:
+        return ticks_add(self._cursor & ~_SLOT_MASK, _SLOTS)
+
+    def _find_next(self) -> Task:
+        heads = self._head
+        cursor = self._cursor
+        best = None
+        if self._level0:
+            for i in range(_SLOTS):
+                best = heads[(cursor + i) & _SLOT_MASK]
+                if best:
+                    # Overdue tasks share the current slot.
+                    best = _earliest(best, None)
+                    break
+            # Nothing on the upper levels is due before the next bucket.
+            if ticks_diff(best.ph_key, self._bucket_end()) < 0:
+                return best
+        for i in range(1, _BUCKETS + 1):
+            t = heads[_SLOTS + (((cursor >> _SLOT_BITS) + i) & _BUCKET_MASK)]
+            if t:
+                best = _earliest(t, best)
+                break
+        return _earliest(heads[_OVERFLOW], best)
@@ -1,5 +1,5 @@
 try:
-    from typing import Optional
+    from typing import Callable, Optional
 except ImportError:
     pass
 
@@ -37,3 +37,114 @@ class Debug:
     def enabled(self, enabled: bool):
         global _debug_enabled
         _debug_enabled = enabled
+
+
+class RingBuffer:
+    '''
+    Fixed capacity FIFO queue on top of a preallocated list.
+    Items that don't fit are dropped and counted in `overflows`. With `grow`,
+    the buffer doubles its capacity instead of dropping items; `overflows` then
+    counts how often that happened.
+
+    If a `factory` is given, all slots are pre-filled with reusable items, which
+    are handed out by `reserve` to be filled in place instead of allocating new
+    items on every `append`. Items returned by `popleft` are only valid until
+    the next call to `reserve` or `rotate`.
+    '''
+
+    def __init__(
+        self,
+        size: int,
+        factory: Optional[Callable[[], object]] = None,
+        grow: bool = False,
+    ):
+        self._factory = factory
+        self._grow = grow
+        self._frames = factory is not None
+        if self._frames:
+            self._buffer = [factory() for _ in range(size)]
+        else:
+            self._buffer = [None] * size
+        self._size = size
+        self._head = 0
+        self._count = 0
+        self.overflows = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def full(self) -> bool:
+        return self._count >= self._size
+
+    def _expand(self) -> bool:
+        self.overflows += 1
+        if not self._grow:
+            return False
+        # Unroll the items in order, then append the new slots.
+        size = self._size
+        buffer = self._buffer
+        head = self._head
+        self._buffer = buffer[head:] + buffer[:head]
+        if self._frames:
+            self._buffer.extend(self._factory() for _ in range(size))
+        else:
+            self._buffer.extend([None] * size)
+        self._head = 0
+        self._size = 2 * size
+        return True
+
+    def append(self, item) -> bool:
+        if self._count >= self._size and not self._expand():
+            return False
+        self._buffer[(self._head + self._count) % self._size] = item
+        self._count += 1
+        return True
+
+    def reserve(self):
+        '''
+        Append and return the next preallocated item, or `None` if full.
+        '''
+        if self._count >= self._size and not self._expand():
+            return None
+        item = self._buffer[(self._head + self._count) % self._size]
+        self._count += 1
+        return item
+
+    def peek(self, index: int = 0):
+        '''
+        Return the item at `index` without removing it; negative indices count
+        from the end.
+        '''
+        if not -self._count <= index < self._count:
+            raise IndexError('RingBuffer index out of range')
+        if index < 0:
+            index += self._count
+        return self._buffer[(self._head + index) % self._size]
+
+    def popleft(self):
+        if not self._count:
+            raise IndexError('pop from empty RingBuffer')
+        item = self._buffer[self._head]
+        if not self._frames:
+            self._buffer[self._head] = None
+        self._head = (self._head + 1) % self._size
+        self._count -= 1
+        return item
+
+    def rotate(self, n: int) -> None:
+        '''
+        Move the last `n` items to the front, preserving their order.
+        '''
+        buffer = self._buffer
+        size = self._size
+        for _ in range(n):
+            tail = (self._head + self._count - 1) % size
+            head = (self._head - 1) % size
+            # Swap instead of copy, so preallocated items are never shared.
+            buffer[head], buffer[tail] = buffer[tail], buffer[head]
+            self._head = head
+
+    def clear(self) -> None:
+        while self._count:
+            self.popleft()
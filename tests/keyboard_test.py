@@ -1,12 +1,19 @@
-import time
 from unittest.mock import Mock, patch
 
+from kmk import kmk_keyboard
+from kmk.handlers import stock
 from kmk.hid import HIDModes
 from kmk.keys import KC, ModifierKey
 from kmk.kmk_keyboard import KMKKeyboard
+from kmk.kmktime import ticks_diff
 from kmk.scanners import DiodeOrientation
 from kmk.scanners.digitalio import MatrixScanner
-from kmk.scheduler import _task_queue
+from kmk.scheduler import get_next_deadline
+from tests.mocks import clock
+
+# Sleeping advances the simulated clock instead of blocking.
+kmk_keyboard.sleep = clock.sleep
+stock.sleep = clock.sleep
 
 
 class DigitalInOut(Mock):
@@ -32,7 +39,7 @@ class KeyboardTest:
         keymap,
         keyboard_debug_enabled=False,
         debug_enabled=False,
-        extensions={},
+        extensions=[],
     ):
         self.debug_enabled = debug_enabled
 
@@ -69,22 +76,25 @@ class KeyboardTest:
         self.keyboard._main_loop()
         for e in key_events:
             if isinstance(e, int):
-                starttime_ms = time.time_ns() // 1_000_000
-                while time.time_ns() // 1_000_000 - starttime_ms < e:
-                    self.do_main_loop()
+                self.run_for(e)
             else:
                 key_pos = e[0]
                 is_pressed = e[1]
                 self.pins[key_pos].value = is_pressed
                 self.do_main_loop()
 
-        # wait up to 10s for delayed actions to resolve, if there are any
-        timeout = time.time_ns() + 10 * 1_000_000_000
-        while timeout > time.time_ns():
-            self.do_main_loop()
-            if not _task_queue.peek() and not self.keyboard._resume_buffer:
+        # wait up to 10s for delayed actions to resolve, if there are any,
+        # skipping ahead to the next deadline in between.
+        timeout = clock.now + 10_000
+        while timeout > clock.now:
+            self.keyboard._main_loop()
+            if self.keyboard._resume_buffer:
+                clock.advance(self.loop_delay_ms)
+            elif get_next_deadline() is not None:
+                clock.advance(max(1, self.time_to_next_deadline(timeout)))
+            else:
                 break
-        assert timeout > time.time_ns(), 'infinite loop detected'
+        assert timeout > clock.now, 'infinite loop detected'
 
         matching = True
         for i in range(max(len(hid_reports), len(assert_reports))):
@@ -131,4 +141,27 @@ class KeyboardTest:
 
     def do_main_loop(self):
         self.keyboard._main_loop()
-        time.sleep(self.loop_delay_ms / 1000)
+        clock.advance(self.loop_delay_ms)
+
+    def run_for(self, ms):
+        '''
+        Run main loop cycles every `loop_delay_ms` for `ms` of simulated time.
+        Scheduled tasks are run exactly at their deadline.
+        '''
+        end = clock.now + ms
+        while end > clock.now:
+            self.keyboard._main_loop()
+            clock.advance(
+                max(1, min(self.loop_delay_ms, self.time_to_next_deadline(end)))
+            )
+
+    def time_to_next_deadline(self, end):
+        '''
+        Simulated ms until the next scheduled task is due, but no later than
+        `end`.
+        '''
+        remaining = end - clock.now
+        deadline = get_next_deadline()
+        if deadline is not None:
+            remaining = min(remaining, ticks_diff(deadline, clock.ticks_ms()))
+        return remaining
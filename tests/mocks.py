@@ -1,5 +1,4 @@
 import sys
-import time
 from unittest.mock import Mock
 
 
@@ -9,8 +8,34 @@ class KeyEvent:
         self.pressed = pressed
 
 
-def ticks_ms():
-    return (time.time_ns() // 1_000_000) % (1 << 29)
+class VirtualClock:
+    '''
+    Simulated clock backing `supervisor.ticks_ms`. Time stands still unless
+    it's advanced explicitly or the code under test sleeps, which makes timing
+    dependent tests deterministic and independent of the host's speed.
+    '''
+
+    def __init__(self, start_ms=0):
+        self._us = start_ms * 1000
+
+    @property
+    def now(self):
+        return self._us // 1000
+
+    def ticks_ms(self):
+        return self.now % (1 << 29)
+
+    def advance(self, ms):
+        self._us += ms * 1000
+
+    def sleep(self, seconds):
+        self._us += int(seconds * 1_000_000)
+
+
+# Start shortly before the ticks_ms overflow, so that the test suite runs
+# across it and shakes out wraparound bugs.
+clock = VirtualClock((1 << 29) - 2_000)
+ticks_ms = clock.ticks_ms
 
 
 def init_circuit_python_modules_mocks():
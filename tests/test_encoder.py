@@ -0,0 +1,31 @@
+import unittest
+from unittest.mock import Mock
+
+from kmk.modules.encoder import EncoderHandler, GPIOEncoder
+
+
+class TestEncoder(unittest.TestCase):
+    def test_input_pending(self):
+        encoder = GPIOEncoder(Mock(), Mock(), Mock(), divisor=4)
+        for pin in (encoder.pin_a, encoder.pin_b, encoder.pin_button):
+            pin.io = Mock(value=True)
+        encoder._state = encoder._start_state = (True, True)
+        handler = EncoderHandler()
+        handler.encoders.append(encoder)
+
+        # Nothing to decode: let the keyboard idle.
+        self.assertFalse(handler.input_pending(None))
+
+        encoder.pin_a.io.value = False
+        self.assertTrue(handler.input_pending(None))
+        encoder.update_state()
+        self.assertFalse(handler.input_pending(None))
+
+        encoder.pin_button.io.value = False
+        self.assertTrue(handler.input_pending(None))
+        encoder.update_state()
+        self.assertFalse(handler.input_pending(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,429 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from kmk.hid import AbstractHID, BLEHID
+from kmk.keys import KC, Axis, make_consumer_key, make_mouse_key
+from tests.mocks import clock
+
+
+class TestHID(unittest.TestCase):
+    def setUp(self):
+        self.reports = []
+        patcher = patch.object(
+            AbstractHID,
+            'hid_send',
+            lambda hid, report: self.reports.append(bytes(report)),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.hid = AbstractHID()
+        self.hid.clear_all().send()
+
+    def send(self, keys, axes=()):
+        self.reports.clear()
+        self.hid.create_report(keys, axes).send()
+        return self.reports
+
+    def test_keys(self):
+        self.assertEqual(self.send({KC.A}), [bytes((1, 0, 0, 4, 0, 0, 0, 0))])
+        self.assertEqual(self.send({KC.A}), [])
+        self.assertEqual(self.send({KC.A, KC.B}), [bytes((1, 0, 0, 4, 5, 0, 0, 0))])
+        self.assertEqual(self.send({KC.B}), [bytes((1, 0, 0, 0, 5, 0, 0, 0))])
+        self.assertEqual(self.send(set()), [bytes((1, 0, 0, 0, 0, 0, 0, 0))])
+
+    def test_modifier_refcount(self):
+        self.send({KC.LSFT, KC.AT})
+        self.assertEqual(self.hid.report_mods[0], KC.LSFT.code)
+        self.send({KC.AT})
+        self.assertEqual(self.hid.report_mods[0], KC.LSFT.code)
+        self.send(set())
+        self.assertEqual(self.hid.report_mods[0], 0)
+
+        self.send({KC.LSFT(KC.LALT), KC.LALT})
+        self.assertEqual(self.hid.report_mods[0], KC.LSFT.code | KC.LALT.code)
+        self.send({KC.LALT})
+        self.assertEqual(self.hid.report_mods[0], KC.LALT.code)
+
+    def test_shared_code(self):
+        # KC.N2 and KC.AT share the same code.
+        self.send({KC.N2, KC.AT})
+        self.assertEqual(bytes(self.hid.report_non_mods), bytes((31, 0, 0, 0, 0)))
+        self.send({KC.N2})
+        self.assertEqual(bytes(self.hid.report_non_mods), bytes((31, 0, 0, 0, 0)))
+        self.assertEqual(self.hid.report_mods[0], 0)
+
+    def test_rollover(self):
+        keys = {KC.A, KC.B, KC.C, KC.D, KC.E}
+        self.send(keys)
+        self.assertTrue(all(self.hid.has_key(key) for key in keys))
+
+        # Too many keys: report ErrorRollOver, but keep the modifiers.
+        self.assertEqual(
+            self.send({KC.LSFT, KC.F, *keys}),
+            [bytes((1, 2, 0, 1, 1, 1, 1, 1))],
+        )
+        self.assertFalse(self.hid.has_key(KC.A))
+        self.assertTrue(self.hid.has_key(KC.LSFT))
+
+        # The key that didn't fit is reported as soon as a slot is free.
+        keys = {KC.F, *keys} - {KC.C}
+        reports = self.send(keys)
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(set(reports[0][3:]), {key.code for key in keys})
+        self.assertTrue(all(self.hid.has_key(key) for key in keys))
+
+    def test_consumer_and_mouse(self):
+        vol_up = make_consumer_key(code=0xE9)
+        vol_down = make_consumer_key(code=0xEA)
+        left = make_mouse_key(code=0x01)
+
+        self.assertEqual(self.send({vol_up}), [bytes((3, 0xE9, 0))])
+        self.assertEqual(self.send({vol_up, vol_down}), [bytes((3, 0xEA, 0))])
+        self.assertEqual(self.send({vol_up}), [bytes((3, 0xE9, 0))])
+        self.assertEqual(self.send({vol_up}), [])
+        self.assertEqual(self.send(set()), [bytes((3, 0, 0))])
+
+        self.assertEqual(self.send({left}), [bytes((2, 1, 0, 0, 0))])
+        self.assertEqual(self.send({left}), [])
+        self.assertEqual(self.send(set()), [bytes((2, 0, 0, 0, 0))])
+
+    def busy(self):
+        def hid_send(hid, report):
+            raise OSError('busy')
+
+        return patch.object(AbstractHID, 'hid_send', hid_send)
+
+    def flush(self):
+        clock.advance(100)
+        self.reports.clear()
+        self.hid.flush()
+        self.assertEqual(self.hid.queued, 0)
+        return self.reports
+
+    def test_queue_coalesce(self):
+        with self.busy():
+            self.send({KC.A})
+            self.send({KC.A, KC.B})
+            self.send({KC.B})
+        self.assertEqual(self.hid.queued, 2)
+        self.assertEqual(self.hid.reports_coalesced, 1)
+        self.assertEqual(
+            self.flush(),
+            [bytes((1, 0, 0, 4, 5, 0, 0, 0)), bytes((1, 0, 0, 0, 5, 0, 0, 0))],
+        )
+
+    def test_queue_keeps_taps(self):
+        with self.busy():
+            self.send({KC.A})
+            self.send(set())
+            self.send({KC.A})
+            self.send({KC.LSFT})
+            self.send({KC.LSFT, KC.A})
+        self.assertEqual(self.hid.reports_coalesced, 0)
+        self.assertEqual(
+            self.flush(),
+            [
+                bytes((1, 0, 0, 4, 0, 0, 0, 0)),
+                bytes((1, 0, 0, 0, 0, 0, 0, 0)),
+                bytes((1, 0, 0, 4, 0, 0, 0, 0)),
+                bytes((1, 2, 0, 0, 0, 0, 0, 0)),
+                bytes((1, 2, 0, 4, 0, 0, 0, 0)),
+            ],
+        )
+
+    def test_queue_retry_and_drop(self):
+        with self.busy():
+            self.send({KC.A})
+            self.assertEqual(self.hid.send_errors, 1)
+
+            # Backoff: nothing is sent until the retry is due.
+            self.hid.flush()
+            self.assertEqual(self.hid.send_errors, 1)
+            for retry in range(1, self.hid.send_retries + 1):
+                clock.advance(1 << (retry - 1))
+                self.hid.flush()
+                self.assertEqual(self.hid.send_errors, retry + 1)
+
+        self.assertEqual(self.hid.queued, 0)
+        self.assertEqual(self.hid.reports_dropped, 1)
+
+        sent = self.hid.reports_sent
+        self.send(set())
+        self.assertEqual(self.hid.reports_sent, sent + 1)
+
+    def test_queue_dropped_release(self):
+        self.send({KC.A})
+        with self.busy():
+            self.send(set())
+            for retry in range(self.hid.send_retries):
+                clock.advance(1 << retry)
+                self.hid.flush()
+        self.assertEqual(self.hid.queued, 0)
+        self.assertEqual(self.hid.reports_dropped, 1)
+        self.assertTrue(self.hid.pending)
+
+        # The dropped release is the latest state, and is queued again.
+        self.reports.clear()
+        self.hid.send()
+        self.assertEqual(self.reports, [bytes((1, 0, 0, 0, 0, 0, 0, 0))])
+        self.assertFalse(self.hid.pending)
+        self.assertEqual(self.send(set()), [])
+
+    def test_queue_dropped_superseded(self):
+        with self.busy():
+            self.send({KC.A})
+            self.send(set())
+            for retry in range(self.hid.send_retries):
+                clock.advance(1 << retry)
+                self.hid.flush()
+        # Only the press is dropped; the release is still queued.
+        self.assertEqual(self.hid.queued, 1)
+        self.assertEqual(self.hid.reports_dropped, 1)
+        self.assertEqual(self.flush(), [bytes((1, 0, 0, 0, 0, 0, 0, 0))])
+        self.assertFalse(self.hid.pending)
+
+    def test_queue_missing_endpoint(self):
+        left = make_mouse_key(code=0x01)
+
+        def hid_send(hid, report):
+            if report[0] == 2:
+                raise KeyError(2)
+            self.reports.append(bytes(report))
+
+        with patch.object(AbstractHID, 'hid_send', hid_send):
+            self.send({left})
+            self.send({KC.A})
+        # Press and release are dropped right away, without holding up the
+        # keyboard report.
+        self.assertEqual(self.hid.queued, 0)
+        self.assertEqual(self.hid.reports_dropped, 2)
+        self.assertEqual(self.reports, [bytes((1, 0, 0, 4, 0, 0, 0, 0))])
+
+    def test_queue_latency(self):
+        with self.busy():
+            self.send({KC.A})
+            clock.advance(2)
+            self.send(set())
+        self.assertEqual(self.hid.queue_depth_max, 2)
+
+        clock.advance(3)
+        self.hid.flush()
+        self.assertEqual(self.hid.send_latency, 3)
+        self.assertEqual(self.hid.send_latency_max, 5)
+
+    def test_queue_overflow(self):
+        with self.busy():
+            for _ in range(self.hid.queue_size // 2 + 1):
+                self.send({KC.A})
+                self.send(set())
+        self.assertEqual(self.hid.queued, self.hid.queue_size)
+        self.assertEqual(self.hid.reports_dropped, 2)
+
+    def test_axes(self):
+        x = Axis(0)
+        pan = Axis(3)
+        x.delta = 200
+        pan.delta = 1
+        self.assertEqual(self.send(set(), (x, pan)), [bytes((2, 0, 127, 0, 0))])
+        self.assertEqual((x.delta, pan.delta), (73, 0))
+        self.assertEqual(self.send(set(), (x,)), [bytes((2, 0, 73, 0, 0))])
+
+    def test_unsupported_axis(self):
+        # AX.P, the 8-bit mouse has no pan field.
+        pan = Axis(3)
+        pan.delta = 5
+        self.assertEqual(self.send(set(), (pan,)), [])
+        self.assertEqual(pan.delta, 0)
+
+
+class Mouse16bitHID(AbstractHID):
+    def _probe_pointer(self):
+        return True
+
+
+class TestHIDMouse16bit(unittest.TestCase):
+    def test_axes(self):
+        reports = []
+        with patch.object(
+            AbstractHID, 'hid_send', lambda hid, report: reports.append(bytes(report))
+        ):
+            hid = Mouse16bitHID()
+            x, y, pan = Axis(0), Axis(1), Axis(3)
+            x.delta = 1000
+            y.delta = -40000
+            pan.delta = -1
+            hid.create_report(set(), (x, y, pan)).send()
+
+        self.assertEqual(
+            reports[-1], bytes((2, 0, 0xE8, 0x03, 0x01, 0x80, 0, 0, 0xFF, 0xFF))
+        )
+        self.assertEqual((x.delta, y.delta, pan.delta), (0, -7233, 0))
+
+
+class TestAxis(unittest.TestCase):
+    def setUp(self):
+        self.keyboard = Mock()
+        self.keyboard.axes = set()
+        self.axis = Axis(0)
+
+    def test_subcounts(self):
+        for _ in range(3):
+            self.axis.move(self.keyboard, 0.4)
+        self.assertEqual(self.axis.delta, 1)
+        self.assertIn(self.axis, self.keyboard.axes)
+
+        self.axis.delta = 0
+        for _ in range(5):
+            self.axis.move(self.keyboard, -0.4)
+        self.assertEqual(self.axis.delta, -1)
+
+    def test_fraction_only(self):
+        self.axis.move(self.keyboard, 0.5)
+        self.assertEqual(self.axis.delta, 0)
+        self.assertNotIn(self.axis, self.keyboard.axes)
+
+
+class SpilloverHID(AbstractHID):
+    spillover = True
+    boot = False
+
+    @property
+    def boot_protocol(self):
+        return self.boot
+
+
+class TestHIDSpillover(TestHID):
+    def setUp(self):
+        super().setUp()
+        self.hid = SpilloverHID()
+        self.hid.clear_all().send()
+        self.reports.clear()
+
+    def test_rollover(self):
+        keys = {KC.A, KC.B, KC.C, KC.D, KC.E}
+        self.send(keys)
+
+        # Keys that don't fit spill over into the NKRO bitmap.
+        spill = bytearray(17)
+        spill[0] = 6
+        spill[3] = 1 << 1 | 1 << 2  # KC.F, KC.G
+        self.assertEqual(self.send({KC.F, KC.G, *keys}), [bytes(spill)])
+        self.assertTrue(self.hid.has_key(KC.F))
+        self.assertTrue(self.hid.has_key(KC.G))
+
+        # A spilled key moves over to the 6KRO report when a slot is free.
+        keys = {KC.F, KC.G, *keys} - {KC.A}
+        report, spill = self.send(keys)
+        self.assertEqual(report[0], 1)
+        self.assertEqual(spill[0], 6)
+        self.assertEqual(bin(spill[3]).count('1'), 1)
+        self.assertTrue(all(self.hid.has_key(key) for key in keys))
+
+        # BIOS doesn't know about the NKRO endpoint.
+        self.hid.boot = True
+        self.assertEqual(
+            self.send(keys),
+            [bytes((1, 0, 0, 1, 1, 1, 1, 1)), bytes((6,)) + bytes(16)],
+        )
+
+
+class FakeConnection:
+    def __init__(self, paired=True):
+        self.paired = paired
+        self.connected = True
+        self.connection_interval = None
+
+
+class FakeRadio:
+    def __init__(self):
+        self.name = None
+        self.connections = [FakeConnection(), FakeConnection(paired=False)]
+        self.advertising = False
+
+    @property
+    def connected(self):
+        return bool(self.connections)
+
+
+class TestBLEHID(unittest.TestCase):
+    def setUp(self):
+        self.reports = []
+        for target, new in (
+            ('kmk.hid.BLERadio', FakeRadio),
+            ('kmk.hid.HIDService', Mock),
+            ('kmk.hid.ProvideServicesAdvertisement', Mock),
+            (
+                'kmk.hid.BLEHID.hid_send',
+                lambda hid, report: self.reports.append(bytes(report)),
+            ),
+        ):
+            patcher = patch(target, new, create=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def make_hid(self, **kwargs):
+        hid = BLEHID(**kwargs)
+        hid.clear_all().send()
+        clock.advance(100)
+        hid.flush()
+        self.reports.clear()
+        return hid
+
+    def send(self, hid, keys):
+        hid.create_report(keys, ()).send()
+
+    def test_default_profile(self):
+        hid = self.make_hid()
+        self.assertEqual(hid.profile, 'default')
+        self.send(hid, {KC.A})
+        self.send(hid, set())
+        self.assertEqual(len(self.reports), 2)
+        intervals = [c.connection_interval for c in hid.ble.connections]
+        self.assertEqual(intervals, [None, None])
+
+        hid.on_powersave_enable()
+        self.assertEqual(hid.profile, 'default')
+
+    def test_batching(self):
+        hid = self.make_hid(ble_profile='balanced')
+        self.send(hid, {KC.A})
+        self.assertEqual(len(self.reports), 1)
+        self.send(hid, set())
+        self.send(hid, {KC.B})
+        self.assertEqual(len(self.reports), 1)
+        # Batched reports are coalesced as well.
+        self.assertEqual(hid.queued, 1)
+
+        clock.advance(5)
+        hid.flush()
+        self.assertEqual(self.reports[-1], bytes((1, 0, 0, 5, 0, 0, 0, 0)))
+        self.assertEqual(hid.queued, 0)
+
+    def test_connection_interval(self):
+        hid = self.make_hid(ble_profile='gaming')
+        # The split connection isn't paired, and is left alone.
+        intervals = [c.connection_interval for c in hid.ble.connections]
+        self.assertEqual(intervals, [7.5, None])
+
+        with self.assertRaises(ValueError):
+            hid.set_profile('turbo')
+
+    def test_powersave(self):
+        hid = self.make_hid(ble_profile='gaming')
+        hid.on_powersave_enable()
+        self.assertEqual(hid.profile, 'battery')
+        self.assertEqual(hid._batch_time, 30)
+
+        self.send(hid, {KC.A})
+        self.send(hid, set())
+        self.assertEqual(len(self.reports), 1)
+        self.assertEqual(hid.ble.connections[0].connection_interval, 60)
+
+        hid.on_powersave_disable()
+        self.assertEqual(hid.profile, 'gaming')
+        hid.flush()
+        self.assertEqual(len(self.reports), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
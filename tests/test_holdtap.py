@@ -363,3 +363,26 @@ class TestHoldTap(unittest.TestCase):
             [(2, True), (2, False), (2, True), t_after, (2, False)],
             [{KC.A}, {}, {KC.B}, {}],
         )
+
+    def test_holdtap_buffer_burst(self):
+        # Buffer more key events than the resume buffer has preallocated frames.
+        HoldTap.tap_time = 1000
+        taps = [KC.B, KC.C, KC.D, KC.E, KC.F, KC.G, KC.H, KC.I, KC.J, KC.K]
+        taps += [KC.L, KC.M, KC.N, KC.O, KC.P, KC.Q, KC.R, KC.S, KC.T, KC.U]
+
+        keyboard = KeyboardTest(
+            [HoldTap()],
+            [[KC.HT(KC.A, KC.LCTL, prefer_hold=False)] + taps],
+            debug_enabled=False,
+        )
+
+        events = [(0, True)]
+        reports = [{KC.A}]
+        for n, key in enumerate(taps, 1):
+            events += [(n, True), (n, False)]
+            reports += [{KC.A, key}, {KC.A}]
+        events.append((0, False))
+        reports.append({})
+
+        keyboard.test('HT tap with burst of buffered taps', events, reports)
+        self.assertEqual(keyboard.keyboard.keys_pressed, set())
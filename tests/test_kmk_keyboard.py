@@ -1,6 +1,14 @@
+from supervisor import ticks_ms
+
 import unittest
+from keypad import Event as KeyEvent
 
 from kmk.keys import KC
+from kmk.kmktime import ticks_add, ticks_diff
+from kmk.modules import Module
+from kmk.scanners import Scanner
+from kmk.scheduler import create_task
+from kmk.utils import RingBuffer
 from tests.keyboard_test import KeyboardTest
 
 
@@ -10,6 +18,232 @@ class TestKmkKeyboard(unittest.TestCase):
 
         keyboard.test('Simple key press', [(0, True), (0, False)], [{KC.N1}, {}])
 
+    def test_batched_kmk_keyboard(self):
+        keyboard = KeyboardTest([], [[KC.N1, KC.N2, KC.N3, KC.N4]])
+        keyboard.keyboard.max_events_per_cycle = 4
+
+        keyboard.test(
+            'Batched key presses',
+            [(0, True), (1, True), (0, False), (1, False)],
+            [{KC.N1}, {KC.N1, KC.N2}, {KC.N2}, {}],
+        )
+
+        # Simultaneous presses are handled within a single cycle.
+        keyboard.pins[2].value = True
+        keyboard.pins[3].value = True
+        keyboard.keyboard._main_loop()
+        self.assertEqual(keyboard.keyboard.keys_pressed, {KC.N3, KC.N4})
+
+        keyboard.pins[2].value = False
+        keyboard.pins[3].value = False
+        keyboard.keyboard._main_loop()
+        self.assertEqual(keyboard.keyboard.keys_pressed, set())
+        self.assertEqual(keyboard.keyboard.matrix_update_queue.overflows, 0)
+
+    def test_full_event_queue_kmk_keyboard(self):
+        class Flood(Module):
+            # A secondary source, like a split, that's faster than the keyboard.
+            def __init__(self, events):
+                self.events = events
+
+            def during_bootup(self, keyboard):
+                return
+
+            def before_matrix_scan(self, keyboard):
+                if self.events and keyboard.secondary_matrix_update is None:
+                    keyboard.secondary_matrix_update = self.events.pop(0)
+
+        events = [KeyEvent(1, n % 2 == 0) for n in range(20)]
+        keyboard = KeyboardTest([Flood(events)], [[KC.N1, KC.N2]])
+        kb = keyboard.keyboard
+        kb.event_queue_size = 4
+        kb.matrix_update_queue = RingBuffer(4)
+
+        for n in range(20):
+            keyboard.pins[0].value = n % 2 == 0
+            kb._main_loop()
+        for _ in range(40):
+            kb._main_loop()
+
+        self.assertEqual(events, [])
+        self.assertEqual(kb.matrix_update_queue.overflows, 0)
+        self.assertEqual(kb.keys_pressed, set())
+        self.assertEqual(kb._coordkeys_pressed, {})
+
+    def test_secondary_updates_kmk_keyboard(self):
+        class Observer(Module):
+            def __init__(self):
+                self.seen = []
+
+            def during_bootup(self, keyboard):
+                return
+
+            def after_matrix_scan(self, keyboard):
+                if keyboard.secondary_matrix_update:
+                    self.seen.append(keyboard.secondary_matrix_update.key_number)
+
+        observer = Observer()
+        keyboard = KeyboardTest([observer], [[KC.N1, KC.N2]])
+        kb = keyboard.keyboard
+        kb.max_events_per_cycle = 8
+        kb.secondary_matrix_updates = RingBuffer(8)
+        for n in range(8):
+            kb.secondary_matrix_updates.append(KeyEvent(n % 2, n % 4 < 2))
+
+        # Every event of a burst is seen by modules, in a single cycle.
+        kb._main_loop()
+        self.assertEqual(observer.seen, [0, 1, 0, 1, 0, 1, 0, 1])
+        self.assertEqual(kb.keys_pressed, set())
+
+    def test_coord_mapping_kmk_keyboard(self):
+        keyboard = KeyboardTest(
+            [], [[KC.N1, KC.N2, KC.N3, KC.N4], [KC.A, KC.TRNS, KC.NO, KC.D]]
+        )
+
+        # Replacing the coord_mapping rebuilds the inverse mapping.
+        keyboard.keyboard.coord_mapping = (3, 2, 1, 0)
+        keyboard.test('Remapped key press', [(0, True), (0, False)], [{KC.N4}, {}])
+
+        # Changing the layer stack invalidates cached key resolutions.
+        keyboard.keyboard.active_layers.insert(0, 1)
+        keyboard.test(
+            'Remapped key press on layer',
+            [(0, True), (0, False), (2, True), (2, False)],
+            [{KC.D}, {}, {KC.N2}, {}],
+        )
+        keyboard.keyboard.active_layers.remove(1)
+        keyboard.test('Remapped key press', [(0, True), (0, False)], [{KC.N4}, {}])
+
+    def test_resume_buffer_kmk_keyboard(self):
+        class Frame:
+            value = None
+
+        buffer = RingBuffer(4, Frame)
+        for value in range(3):
+            buffer.reserve().value = value
+        self.assertEqual(buffer.popleft().value, 0)
+
+        # Items buffered while processing are moved in front of the rest.
+        count = len(buffer)
+        buffer.reserve().value = 3
+        buffer.reserve().value = 4
+        buffer.rotate(len(buffer) - count)
+        self.assertEqual(
+            [buffer.popleft().value for _ in range(len(buffer))], [3, 4, 1, 2]
+        )
+
+        # Frames are reused and overflows are dropped.
+        for _ in range(4):
+            self.assertIsNotNone(buffer.reserve())
+        self.assertIsNone(buffer.reserve())
+        self.assertEqual(buffer.overflows, 1)
+        self.assertEqual(len({id(buffer.popleft()) for _ in range(4)}), 4)
+
+        # A growing buffer keeps every item, in order.
+        buffer = RingBuffer(4, Frame, grow=True)
+        buffer.reserve().value = 0
+        buffer.popleft()
+        for value in range(10):
+            buffer.reserve().value = value
+        self.assertEqual(buffer.overflows, 2)
+        self.assertEqual(
+            [buffer.popleft().value for _ in range(len(buffer))], list(range(10))
+        )
+
+    def test_hook_dispatch_kmk_keyboard(self):
+        class Counter(Module):
+            def __init__(self):
+                self.count = 0
+
+            def during_bootup(self, keyboard):
+                return
+
+            def after_hid_send(self, keyboard):
+                self.count += 1
+
+        counter = Counter()
+        keyboard = KeyboardTest([counter], [[KC.N1, KC.N2]])
+
+        # Only hooks that are actually implemented are dispatched.
+        hooks = keyboard.keyboard._hooks
+        self.assertEqual([_[0] for _ in hooks['after_hid_send']], [counter])
+        self.assertEqual(hooks['before_matrix_scan'], [])
+
+        keyboard.keyboard._main_loop()
+        self.assertEqual(counter.count, 1)
+
+        # Modules added at runtime are picked up on the next cycle.
+        other = Counter()
+        keyboard.keyboard.modules.append(other)
+        keyboard.keyboard._main_loop()
+        self.assertEqual((counter.count, other.count), (2, 1))
+
+        # So are replaced and shrunk lists.
+        keyboard.keyboard.modules = [other]
+        keyboard.keyboard._main_loop()
+        self.assertEqual((counter.count, other.count), (2, 2))
+        keyboard.keyboard.modules.remove(other)
+        keyboard.keyboard._main_loop()
+        self.assertEqual((counter.count, other.count), (2, 2))
+
+    def test_virtual_clock_kmk_keyboard(self):
+        keyboard = KeyboardTest([], [[KC.N1, KC.N2]])
+        ran = []
+        create_task(lambda: ran.append(ticks_ms()), after_ms=5000)
+        create_task(lambda: ran.append(ticks_ms()), after_ms=3)
+
+        # Delays run on simulated time, and tasks run on their deadline.
+        start = ticks_ms()
+        keyboard.test('Delay', [(0, True), 10, (0, False)], [{KC.N1}, {}])
+        self.assertEqual([ticks_diff(t, start) for t in ran], [3, 5000])
+        self.assertEqual(ticks_diff(ticks_ms(), start), 5000)
+
+    def test_idle_kmk_keyboard(self):
+        class IdleScanner(Scanner):
+            key_count = 2
+            events_pending = False
+
+            def scan_for_changes(self):
+                return None
+
+        keyboard = KeyboardTest([], [[KC.N1, KC.N2]])
+        keyboard.keyboard.max_idle_time = 100
+
+        # The digitalio scanner can't signal pending events: don't idle.
+        start = ticks_ms()
+        keyboard.keyboard._main_loop()
+        self.assertEqual(ticks_diff(ticks_ms(), start), 0)
+
+        # Idle until the next task is due.
+        keyboard.keyboard.matrix = (IdleScanner(),)
+        ran = []
+        create_task(lambda: ran.append(True), after_ms=20)
+        start = ticks_ms()
+        keyboard.keyboard._main_loop()
+        self.assertEqual(ticks_diff(ticks_ms(), start), 20)
+        keyboard.keyboard._main_loop()
+        self.assertEqual(ran, [True])
+
+        # Wake up on input reported by modules.
+        class Input(Module):
+            pending_at = None
+
+            def during_bootup(self, keyboard):
+                return
+
+            def input_pending(self, keyboard):
+                return ticks_diff(ticks_ms(), self.pending_at) >= 0
+
+        module = Input()
+        module.pending_at = ticks_add(ticks_ms(), 30)
+        keyboard.keyboard.modules.append(module)
+        keyboard.keyboard._init_hooks()
+        start = ticks_ms()
+        keyboard.keyboard._main_loop()
+        self.assertEqual(ticks_diff(ticks_ms(), start), 30)
+        keyboard.keyboard._main_loop()
+        self.assertEqual(ticks_diff(ticks_ms(), start), 30)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 
-from kmk.keys import KC, Key, ModifierKey, make_key
+from kmk.keys import KC, KEY_DEFINITIONS, Key, ModifierKey, make_key
 from tests.keyboard_test import KeyboardTest
 
 
@@ -280,5 +280,75 @@ class TestKeys_instances(unittest.TestCase):
         assert KC.get('A') is KC.A
 
 
+class TestKeys_cache(unittest.TestCase):
+    def setUp(self):
+        KC.clear()
+
+    def test_many_keys(self):
+        created = [make_key(names=(f'CACHE_TEST_{i}',)) for i in range(200)]
+        for i, key in enumerate(created):
+            assert KC[f'CACHE_TEST_{i}'] is key
+        assert len([name for name in KC if name.startswith('CACHE_TEST_')]) == 200
+
+    def test_overwrite(self):
+        first = make_key(names=('CACHE_TEST',))
+        second = make_key(names=('CACHE_TEST',))
+        assert first is not second
+        assert KC.CACHE_TEST is second
+        assert len([name for name in KC if name == 'CACHE_TEST']) == 1
+
+    def test_all_names_resolve(self):
+        for name in ('z', 'N0', '0', 'LWIN', '\n', 'F24', 'PGDN', 'P0'):
+            assert KC[name] is not KC.NO, name
+        for name in ('?', 'LANG9', 'UC_MODE_OSX', 'GRAVE_ESC', 'RLD'):
+            assert KC[name] is not KC.NO, name
+        assert KC['NUMPAD_0'] is KC.P0
+
+    def test_every_name_resolves(self):
+        for _, definitions in KEY_DEFINITIONS:
+            for definition in definitions:
+                for name in definition[-1]:
+                    assert KC.get(name) is KC.get(definition[-1][0]), name
+        assert KC['NOT_A_KEY'] is KC.NO
+        assert KC[''] is KC.NO
+
+
+class TestKeys_handlers(unittest.TestCase):
+    def test_handler_chain(self):
+        calls = []
+        key = make_key(
+            names=('HANDLER_TEST',),
+            on_press=lambda *args: calls.append('press'),
+            on_release=lambda *args: calls.append('release'),
+        )
+        key.before_press_handler(lambda *args: calls.append('before') or allow)
+        key.after_press_handler(lambda *args: calls.append('after'))
+        key.after_release_handler(lambda *args: calls.append('after release'))
+
+        allow = True
+        key.on_press(None)
+        key.on_release(None)
+        self.assertEqual(
+            calls, ['before', 'press', 'after', 'release', 'after release']
+        )
+
+        calls.clear()
+        allow = False
+        key.on_press(None)
+        self.assertEqual(calls, ['before'])
+
+        # Clones and variants don't inherit attached handlers.
+        calls.clear()
+        key.clone().on_press(None)
+        key(no_release=True).on_press(None)
+        self.assertEqual(calls, ['press', 'press'])
+
+    def test_compact_key(self):
+        # Defaults aren't stored per key.
+        self.assertEqual(vars(KC.A), {'code': 4})
+        self.assertEqual(vars(KC.A(no_press=True)), {'code': 4, 'no_press': True})
+        self.assertTrue(KC.A.meta)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from kmk.keys import KC
+from kmk.modules.holdtap import HoldTap
+from kmk.modules.profiler import Histogram, Profiler
+from tests.keyboard_test import KeyboardTest
+
+
+class TestProfiler(unittest.TestCase):
+    def test_histogram(self):
+        hist = Histogram('test', 1000)
+        for us in (0, 1, 3, 700, 1500):
+            hist.record(us)
+
+        self.assertEqual(hist.count, 5)
+        self.assertEqual(hist.max, 1500)
+        self.assertEqual(hist.overruns, 1)
+        self.assertEqual(list(hist.bins[:11]), [2, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1])
+        self.assertEqual(hist.percentile(50), 4)
+        self.assertEqual(hist.percentile(99), 2048)
+
+        hist.reset()
+        self.assertEqual((hist.count, hist.max, sum(hist.bins)), (0, 0, 0))
+
+    def test_profiler(self):
+        profiler = Profiler()
+        keyboard = KeyboardTest([profiler, HoldTap()], [[KC.HT(KC.A, KC.B), KC.C]])
+
+        keyboard.test('Profiled key press', [(1, True), (1, False)], [{KC.C}, {}])
+
+        hists = {hist.name: hist for hist in profiler.histograms}
+        self.assertGreater(hists['main_loop'].count, 0)
+        self.assertGreater(hists['matrix_scan'].count, 0)
+        self.assertEqual(hists['HoldTap.process_key'].count, 2)
+        self.assertEqual(hists['send_hid'].count, 2)
+
+        profiler.reset()
+        self.assertEqual(sum(hist.count for hist in profiler.histograms), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
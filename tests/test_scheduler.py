@@ -0,0 +1,369 @@
+import random
+import unittest
+from unittest.mock import patch
+
+from kmk import scheduler
+from kmk.keys import KC
+from kmk.kmktime import ticks_add, ticks_diff
+from kmk.modules.holdtap import HoldTap
+from kmk.scheduler import (
+    MissedPeriods,
+    Priority,
+    Timer,
+    cancel_task,
+    create_task,
+    get_due_max,
+    get_next_deadline,
+    get_stats,
+    pop_due_task,
+    reset_stats,
+)
+from kmk.timer_wheel import Task, TimerWheel
+from tests.keyboard_test import KeyboardTest
+from tests.mocks import clock
+from tests.task import Task as HeapTask
+from tests.task import TaskQueue
+
+
+def run_due_tasks():
+    task = pop_due_task()
+    while task:
+        task()
+        task = pop_due_task()
+
+
+class TestTimer(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+        self.timer = Timer(self.callback)
+
+    def tearDown(self):
+        self.timer.cancel()
+
+    def callback(self):
+        self.calls += 1
+
+    def test_start(self):
+        self.timer.start(10)
+        self.assertTrue(self.timer.active)
+        clock.advance(9)
+        run_due_tasks()
+        self.assertEqual(self.calls, 0)
+        clock.advance(1)
+        run_due_tasks()
+        self.assertEqual(self.calls, 1)
+        self.assertFalse(self.timer.active)
+
+        # Timers can be started again after they fired.
+        self.timer.start()
+        run_due_tasks()
+        self.assertEqual(self.calls, 2)
+
+    def test_restart(self):
+        self.timer.start(10)
+        clock.advance(5)
+        self.timer.start(10)
+        clock.advance(5)
+        run_due_tasks()
+        self.assertEqual(self.calls, 0)
+        clock.advance(5)
+        run_due_tasks()
+        self.assertEqual(self.calls, 1)
+
+    def test_cancel(self):
+        self.timer.start(10)
+        self.timer.cancel()
+        self.assertFalse(self.timer.active)
+        self.assertIsNone(get_next_deadline())
+        # Cancelling an inactive timer is a no-op.
+        self.timer.cancel()
+
+
+class TestTaskStats(unittest.TestCase):
+    def setUp(self):
+        reset_stats()
+
+    def test_lateness(self):
+        timer = Timer(lambda: None, 'test')
+        timer.start(10)
+        clock.advance(15)
+        run_due_tasks()
+        timer.start()
+        clock.advance(1)
+        run_due_tasks()
+
+        stats = get_stats('test')
+        self.assertEqual(stats.runs, 2)
+        self.assertEqual(stats.late_max, 5)
+        self.assertEqual(stats.late_mean, 3)
+
+    def test_periodic_overrun(self):
+        durations = [15, 0]
+
+        def task():
+            clock.advance(durations.pop(0))
+
+        # The first run takes longer than the period, the second one is late.
+        task = create_task(task, after_ms=10, period_ms=10, category='slow')
+        clock.advance(10)
+        run_due_tasks()
+        cancel_task(task)
+
+        stats = get_stats('slow')
+        self.assertEqual(stats.runs, 2)
+        self.assertEqual(stats.late_max, 5)
+        self.assertEqual(stats.overruns, 1)
+
+    def test_due_max(self):
+        timers = [Timer(lambda: None) for _ in range(3)]
+        for timer in timers:
+            timer.start(10)
+        clock.advance(10)
+        run_due_tasks()
+        self.assertEqual(get_due_max(), 3)
+        self.assertEqual(get_stats('timer').runs, 3)
+
+
+class TestMissedPeriods(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+    def run_stalled(self, missed):
+        task = create_task(
+            lambda *args: self.calls.append((clock.now, args)),
+            after_ms=10,
+            period_ms=10,
+            missed=missed,
+        )
+        start = clock.now
+        # The loop stalls for 3.5 periods.
+        clock.advance(45)
+        run_due_tasks()
+        clock.advance(5)
+        run_due_tasks()
+        cancel_task(task)
+        return [(now - start, args) for now, args in self.calls]
+
+    def test_catch_up(self):
+        self.assertEqual(
+            self.run_stalled(MissedPeriods.CATCH_UP),
+            [(45, ()), (45, ()), (45, ()), (45, ()), (50, ())],
+        )
+
+    def test_skip(self):
+        self.assertEqual(
+            self.run_stalled(MissedPeriods.SKIP),
+            [(45, ()), (50, ())],
+        )
+
+    def test_coalesce(self):
+        self.assertEqual(
+            self.run_stalled(MissedPeriods.COALESCE),
+            [(45, (4,)), (50, (1,))],
+        )
+
+
+class TestPriority(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+    def timer(self, name, priority, duration=0):
+        def run():
+            self.calls.append(name)
+            clock.advance(duration)
+
+        return Timer(run, priority=priority)
+
+    def test_order(self):
+        background = self.timer('background', Priority.BACKGROUND)
+        normal = self.timer('normal', Priority.NORMAL)
+        key = self.timer('input', Priority.INPUT)
+        background.start(1)
+        normal.start(2)
+        key.start(3)
+        clock.advance(3)
+        run_due_tasks()
+        self.assertEqual(self.calls, ['input', 'normal', 'background'])
+
+    def test_background_budget(self):
+        timers = [
+            self.timer(n, Priority.BACKGROUND, scheduler.background_budget)
+            for n in range(3)
+        ]
+        for timer in timers:
+            timer.start()
+        key = self.timer('input', Priority.INPUT)
+        key.start(1)
+        clock.advance(1)
+
+        # The first background task uses up the budget of the cycle.
+        run_due_tasks()
+        self.assertEqual(self.calls, ['input', 0])
+        run_due_tasks()
+        self.assertEqual(self.calls, ['input', 0, 1])
+        self.assertEqual(get_next_deadline(), timers[2]._task.ph_key)
+        run_due_tasks()
+        self.assertEqual(self.calls, ['input', 0, 1, 2])
+
+
+class TestTimerWheelBackend(TestTimer):
+    def setUp(self):
+        scheduler.set_backend('wheel')
+        self.addCleanup(scheduler.set_backend, 'heap')
+        super().setUp()
+
+
+def pop_due(queue):
+    due = []
+    while True:
+        t = queue.peek()
+        if not t or ticks_diff(t.ph_key, clock.ticks_ms()) > 0:
+            return due
+        queue.pop_head()
+        due.append(t.coro)
+
+
+class TestTimerWheel(unittest.TestCase):
+    def setUp(self):
+        self.wheel = TimerWheel()
+
+    def push(self, name, after_ms):
+        t = Task(name)
+        self.wheel.push_sorted(t, ticks_add(clock.ticks_ms(), after_ms))
+        return t
+
+    def test_order(self):
+        self.push('c', 300)
+        self.push('b', 20)
+        self.push('a', 10)
+        self.push('d', 20_000)
+        self.assertEqual(self.wheel.peek().coro, 'a')
+        clock.advance(300)
+        self.assertEqual(pop_due(self.wheel), ['a', 'b', 'c'])
+        self.assertEqual(ticks_diff(self.wheel.peek().ph_key, clock.ticks_ms()), 19_700)
+        clock.advance(19_700)
+        self.assertEqual(pop_due(self.wheel), ['d'])
+        self.assertIsNone(self.wheel.peek())
+
+    def test_remove(self):
+        a = self.push('a', 10)
+        self.push('b', 500)
+        self.wheel.remove(a)
+        self.assertEqual(self.wheel.peek().coro, 'b')
+        # Removing a task that isn't queued is a no-op.
+        self.wheel.remove(a)
+        clock.advance(500)
+        self.assertEqual(pop_due(self.wheel), ['b'])
+
+    def test_overdue(self):
+        self.push('a', 10)
+        clock.advance(50)
+        self.push('b', -20)
+        self.assertEqual(pop_due(self.wheel), ['a', 'b'])
+
+    def test_same_as_heap(self):
+        rng = random.Random(0)
+        heap = TaskQueue()
+        wheel = self.wheel
+        tasks = [(HeapTask(n), Task(n)) for n in range(50)]
+        for _ in range(5_000):
+            h, w = rng.choice(tasks)
+            if rng.random() < 0.3:
+                # The pairing heap can't remove tasks that aren't queued.
+                if w.slot >= 0:
+                    heap.remove(h)
+                wheel.remove(w)
+            elif w.slot < 0:
+                key = ticks_add(clock.ticks_ms(), rng.choice((0, 30, 600, 40_000)))
+                heap.push_sorted(h, key)
+                wheel.push_sorted(w, key)
+            clock.advance(rng.randrange(20))
+            self.assertEqual(pop_due(heap), pop_due(wheel))
+            if heap.peek():
+                self.assertEqual(heap.peek().ph_key, wheel.peek().ph_key)
+
+    def test_ties_same_as_heap(self):
+        # Many tasks share their deadlines, some are pushed long in advance
+        # and some only once overdue; both backends pop them in the same order.
+        rng = random.Random(1)
+        heap = TaskQueue()
+        wheel = self.wheel
+        base = clock.ticks_ms()
+        n = 0
+        for _ in range(2_000):
+            if rng.random() < 0.6:
+                key = ticks_add(base, rng.randrange(0, 2_000, 50))
+                heap.push_sorted(HeapTask(n), key)
+                wheel.push_sorted(Task(n), key)
+                n += 1
+            else:
+                clock.advance(rng.randrange(100))
+                self.assertEqual(pop_due(heap), pop_due(wheel))
+            if ticks_diff(clock.ticks_ms(), base) > 1_500:
+                base = clock.ticks_ms()
+        clock.advance(2_000)
+        self.assertEqual(pop_due(heap), pop_due(wheel))
+
+    def test_idle(self):
+        self.wheel.remove(self.push('a', 10))
+        clock.advance(10 * 3600 * 1000)
+        self.push('b', 10)
+        self.assertEqual(self.wheel._cursor, clock.ticks_ms())
+        clock.advance(10)
+        self.assertEqual(pop_due(self.wheel), ['b'])
+
+    def test_stale_cursor(self):
+        # A long lived task doesn't leave the cursor behind while idle.
+        self.push('a', 3 * 3600 * 1000)
+        clock.advance(3600 * 1000)
+        b = self.push('b', 5)
+        self.assertLess(b.slot, 256)
+
+        rehash = self.wheel._rehash
+        calls = []
+
+        def counting_rehash(slot):
+            calls.append(slot)
+            rehash(slot)
+
+        self.wheel._rehash = counting_rehash
+        clock.advance(5)
+        self.assertEqual(pop_due(self.wheel), ['b'])
+        self.assertLess(len(calls), 100)
+        clock.advance(2 * 3600 * 1000)
+        self.assertEqual(pop_due(self.wheel), ['a'])
+        self.assertLess(len(calls), 200)
+
+
+class TestTaskAllocation(unittest.TestCase):
+    def setUp(self):
+        KC.clear()
+
+    def test_steady_state(self):
+        keyboard = KeyboardTest(
+            [HoldTap()],
+            [[KC.HT(KC.A, KC.LCTL), KC.B]],
+            debug_enabled=False,
+        )
+        sequence = [(0, True), (0, False), (1, True), (1, False), 10]
+        keyboard.test('', sequence, [{KC.A}, {}, {KC.B}, {}])
+        keyboard.keyboard.tap_key(KC.C)
+        keyboard.test('', [10], [{KC.C}, {}])
+
+        tasks = []
+        task = scheduler.Task
+
+        def counting_task(*args):
+            tasks.append(args)
+            return task(*args)
+
+        with patch.object(scheduler, 'Task', counting_task):
+            keyboard.test('', sequence, [{KC.A}, {}, {KC.B}, {}])
+            keyboard.keyboard.tap_key(KC.C)
+            keyboard.test('', [10], [{KC.C}, {}])
+
+        self.assertEqual(tasks, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,506 @@
+import sys
+import unittest
+from keypad import Event as KeyEvent
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from kmk.extensions.lock_status import LockStatus
+from kmk.modules.split import Split, SplitSide, SplitState, SplitType
+from kmk.utils import RingBuffer
+from tests.mocks import clock
+
+
+class FakeUART:
+    def __init__(self):
+        self.rx = bytearray()
+        self.writes = []
+
+    @property
+    def in_waiting(self):
+        return len(self.rx)
+
+    def read(self, n):
+        data = bytes(self.rx[:n])
+        del self.rx[:n]
+        return data
+
+    def readinto(self, buf):
+        n = min(len(buf), len(self.rx))
+        buf[:n] = self.rx[:n]
+        del self.rx[:n]
+        return n
+
+    def write(self, buf):
+        self.writes.append(bytes(buf))
+
+
+def make_keyboard():
+    return SimpleNamespace(
+        matrix_update=None,
+        secondary_matrix_update=None,
+        matrix_update_queue=RingBuffer(32),
+        event_queue_size=32,
+        hid_pending=False,
+        _coordkeys_pressed={},
+        _resume_buffer=RingBuffer(8),
+        active_layers=[0],
+    )
+
+
+class TestSplitUART(unittest.TestCase):
+    def setUp(self):
+        self.sender = Split()
+        self.sender._uart = FakeUART()
+        self.sender._is_target = False
+        self.receiver = Split()
+        self.receiver._uart = FakeUART()
+        self.keyboard = make_keyboard()
+
+    def send(self, *events):
+        for key_number, pressed in events:
+            self.sender._send_uart(KeyEvent(key_number, pressed))
+        self.sender.before_hid_send(make_keyboard())
+
+    def transfer(self):
+        for frame in self.sender._uart.writes:
+            self.receiver._uart.rx += frame
+        self.sender._uart.writes.clear()
+
+    def received(self):
+        # One event per cycle, each seen as the `secondary_matrix_update`.
+        self.receiver._receive_uart(self.keyboard)
+        events = []
+        while self.keyboard.secondary_matrix_update:
+            events.append(self.keyboard.secondary_matrix_update)
+            self.keyboard.secondary_matrix_update = None
+            self.receiver._queue_updates(self.keyboard)
+        return [(e.key_number, e.pressed) for e in events]
+
+    def enable_digest(self, first, count):
+        self.sender._digest[0] = first
+        self.sender._digest[1] = self.sender._digest_count = count
+
+    def test_events_in_one_frame(self):
+        events = [(1, True), (2, True), (1, False)]
+        self.send(*events)
+        self.assertEqual(len(self.sender._uart.writes), 1)
+        self.transfer()
+        self.assertEqual(self.received(), events)
+
+    def test_input_pending(self):
+        self.receiver.split_type = SplitType.UART
+        self.assertFalse(self.receiver.input_pending(self.keyboard))
+        self.send((1, True))
+        self.transfer()
+        self.assertTrue(self.receiver.input_pending(self.keyboard))
+        self.received()
+        self.assertFalse(self.receiver.input_pending(self.keyboard))
+
+    def test_partial_frame(self):
+        self.send((3, True), (4, True))
+        frame = self.sender._uart.writes.pop()
+        self.receiver._uart.rx += frame[:4]
+        self.assertEqual(self.received(), [])
+        self.receiver._uart.rx += frame[4:]
+        self.assertEqual(self.received(), [(3, True), (4, True)])
+
+    def test_resync(self):
+        self.send((5, True))
+        self.send((6, True))
+        corrupt = bytearray(self.sender._uart.writes[0])
+        corrupt[4] ^= 0xFF
+        self.sender._uart.writes[0] = bytes(corrupt)
+        self.receiver._uart.rx += b'\x00\xb2'
+        self.transfer()
+        self.assertEqual(self.received(), [(6, True)])
+        decoder = self.receiver._decoder
+        # The stray header counts as a corrupt frame as well.
+        self.assertEqual((decoder.frames, decoder.corrupt), (1, 2))
+
+    def test_lost_frames(self):
+        self.send((1, True))
+        self.send((1, False))
+        self.send((2, True))
+        del self.sender._uart.writes[1]
+        self.transfer()
+        self.assertEqual(self.received(), [(1, True), (2, True)])
+        self.assertEqual(self.receiver._decoder.lost, 1)
+
+    def test_backlog(self):
+        # Far more than fits into the receive buffer at once.
+        events = [(n % 64, n % 2 == 0) for n in range(200)]
+        for n in range(0, len(events), 10):
+            self.send(*events[n : n + 10])
+        self.transfer()
+        self.keyboard.matrix_update_queue = RingBuffer(256)
+        self.keyboard.event_queue_size = 256
+        self.assertEqual(self.received(), events)
+        self.assertEqual(self.receiver._decoder.overflows, 0)
+
+    def test_digest_repairs(self):
+        self.enable_digest(36, 20)
+        self.send((40, True), (41, True))
+        self.send((40, False), (55, True))
+        # The second frame is lost: 40 is stuck and 55 never pressed.
+        del self.sender._uart.writes[1]
+        self.transfer()
+        self.assertEqual(self.received(), [(40, True), (41, True)])
+        self.keyboard._coordkeys_pressed.update({40: None, 41: None})
+
+        clock.advance(self.sender.digest_interval)
+        self.send()
+        self.transfer()
+        self.receiver._receive_uart(self.keyboard)
+        self.receiver._check_digest(self.keyboard)
+        self.assertEqual(self.received(), [(40, False), (55, True)])
+        self.assertEqual(self.receiver.digest_repairs, 2)
+
+    def test_digest_interval(self):
+        self.enable_digest(0, 8)
+        self.send()
+        self.assertEqual(self.sender._uart.writes, [])
+        clock.advance(self.sender.digest_interval)
+        self.send()
+        self.assertEqual(len(self.sender._uart.writes), 1)
+        self.send()
+        self.assertEqual(len(self.sender._uart.writes), 1)
+
+    def test_digest_outdated(self):
+        self.enable_digest(0, 8)
+        clock.advance(self.sender.digest_interval)
+        self.send()
+        self.send((3, True))
+        self.transfer()
+        # Events after the digest supersede it.
+        self.assertEqual(self.received(), [(3, True)])
+        self.assertFalse(self.receiver._remote_digest_pending)
+
+    def test_digest_waits_for_events(self):
+        self.enable_digest(0, 8)
+        self.send((3, True))
+        clock.advance(self.sender.digest_interval)
+        self.send()
+        self.transfer()
+        self.receiver._receive_uart(self.keyboard)
+        # Key 3 hasn't been handled by the keyboard yet.
+        self.receiver._check_digest(self.keyboard)
+        self.assertTrue(self.receiver._remote_digest_pending)
+        self.assertEqual(self.receiver.digest_repairs, 0)
+
+
+class TestSplitState(unittest.TestCase):
+    def setUp(self):
+        self.target = Split(data_pin2=1)
+        self.target._uart = FakeUART()
+        self.target._state_last = clock.ticks_ms()
+        self.peripheral = Split(data_pin2=1)
+        self.peripheral._uart = FakeUART()
+        self.peripheral._is_target = False
+        self.keyboard = make_keyboard()
+        self.remote = make_keyboard()
+
+    def sync(self):
+        uart = self.target._uart
+        self.target.after_hid_send(self.keyboard)
+        frames = len(uart.writes)
+        for frame in uart.writes:
+            self.peripheral._uart.rx += frame
+        uart.writes.clear()
+        self.peripheral._receive_uart(self.remote)
+        return frames
+
+    def test_layers(self):
+        self.assertEqual(self.sync(), 1)
+        self.assertEqual(self.sync(), 0)
+        self.keyboard.active_layers.insert(0, 2)
+        self.assertEqual(self.sync(), 1)
+        self.assertEqual(self.remote.active_layers, [2, 0])
+        self.assertEqual(self.peripheral.state[SplitState.LAYERS], bytes((2, 0)))
+
+    def test_delta(self):
+        self.target._locks = SimpleNamespace(report=0)
+        self.target._rgb = SimpleNamespace(
+            hue=0, sat=255, val=255, animation_mode=1, animation_speed=1
+        )
+        self.peripheral._locks = LockStatus()
+        self.peripheral._locks.hid = Mock()
+        self.peripheral._locks.hid.get_last_received_report.return_value = None
+        self.peripheral._rgb = SimpleNamespace(
+            hue=0, sat=0, val=0, animation_mode=0, animation_speed=0
+        )
+        self.sync()
+
+        self.target._locks.report = 2
+        self.target._uart.writes.clear()
+        self.target.after_hid_send(self.keyboard)
+        # Version, then a single slot: slot, length, value.
+        self.assertEqual(self.target._uart.writes[0][4:-1], bytes((1, 1, 1, 2)))
+        self.peripheral._uart.rx += self.target._uart.writes.pop()
+        self.peripheral._receive_uart(self.remote)
+        locks = self.peripheral._locks
+        self.assertEqual(locks.report, 2)
+        self.assertTrue(locks.report_updated)
+        # Still an update during the next HID send, but only that one.
+        locks.after_hid_send(None)
+        self.assertTrue(locks.report_updated)
+        locks.after_hid_send(None)
+        self.assertFalse(locks.report_updated)
+
+        # Standby is the same as static.
+        self.target._rgb.animation_mode = 2
+        self.assertEqual(self.sync(), 0)
+        self.target._rgb.hue = 30
+        self.assertEqual(self.sync(), 1)
+        rgb = self.peripheral._rgb
+        self.assertEqual(
+            (rgb.hue, rgb.sat, rgb.val, rgb.animation_mode, rgb.animation_speed),
+            (30, 255, 255, 1, 1),
+        )
+
+    def test_rgb_animation(self):
+        rgb = SimpleNamespace(
+            hue=0, sat=255, val=100, animation_mode=5, animation_speed=2
+        )
+        self.target._rgb = rgb
+        remote = SimpleNamespace(
+            hue=7, sat=0, val=9, animation_mode=1, animation_speed=0
+        )
+        self.peripheral._rgb = remote
+        self.sync()
+        # Breathing rainbow animates hue and value on both halves on their own.
+        self.assertEqual((remote.hue, remote.val), (7, 9))
+        self.assertEqual((remote.animation_mode, remote.animation_speed), (5, 2))
+        rgb.hue = 40
+        rgb.val = 300
+        self.assertEqual(self.sync(), 0)
+
+        # Values out of range are clamped.
+        rgb.animation_mode = 1
+        self.assertEqual(self.sync(), 1)
+        self.assertEqual((remote.hue, remote.val), (40, 255))
+
+    def test_refresh_without_change(self):
+        values = []
+        self.peripheral.subscribe(SplitState.LAYERS, values.append)
+        self.sync()
+        clock.advance(self.target.digest_interval)
+        self.assertEqual(self.sync(), 1)
+        self.assertEqual(values, [bytes((0,))])
+
+    def test_subscribe_user_state(self):
+        values = []
+        self.peripheral.subscribe(SplitState.USER, values.append)
+        self.target.set_user_state(b'hi')
+        self.sync()
+        self.target.set_user_state(b'hi')
+        self.sync()
+        self.target.set_user_state(b'ho')
+        self.sync()
+        self.assertEqual(values, [b'hi', b'ho'])
+        with self.assertRaises(ValueError):
+            self.target.set_user_state(bytes(9))
+
+    def test_refresh(self):
+        self.sync()
+        self.assertEqual(self.sync(), 0)
+        clock.advance(self.target.digest_interval)
+        self.assertEqual(self.sync(), 1)
+
+    def test_version_mismatch(self):
+        # A state update of an unknown version setting layer 1.
+        self.target._send_frame(3, bytes((2, 0, 1, 1)), 4)
+        self.peripheral._uart.rx += self.target._uart.writes.pop()
+        self.peripheral._receive_uart(self.remote)
+        self.assertEqual(self.remote.active_layers, [0])
+        self.assertIsNone(self.peripheral.state[SplitState.LAYERS])
+
+
+class FakeConnection:
+    def __init__(self, uart=None, paired=False):
+        self.connected = True
+        self.paired = paired
+        self.connection_interval = 0
+        self.uart = uart
+
+    def __contains__(self, service):
+        return self.uart is not None
+
+    def __getitem__(self, service):
+        return self.uart
+
+
+class FakeRadio:
+    '''
+    A radio that hands out scheduled advertisements, one scan slice at a time.
+    '''
+
+    def __init__(self):
+        self.connections = ()
+        self.advertising = None
+        self.scans = 0
+        self.seen = []
+
+    def start_scan(self, *types, timeout=None):
+        self.scans += 1
+        if self.seen:
+            yield self.seen.pop(0)
+
+    def stop_scan(self):
+        pass
+
+    def connect(self, adv, timeout=None):
+        connection = FakeConnection(FakeUART())
+        self.connections += (connection,)
+        return connection
+
+    def start_advertising(self, adv):
+        self.advertising = adv
+
+    def stop_advertising(self):
+        self.advertising = None
+
+
+def advertisement(address, rssi=-50):
+    return SimpleNamespace(address=address, rssi=rssi, services=('uart',))
+
+
+class TestSplitBLE(unittest.TestCase):
+    def make_split(self, is_target):
+        ble = {
+            'adafruit_ble': Mock(),
+            'adafruit_ble.advertising.standard': Mock(),
+            'adafruit_ble.services.nordic': Mock(),
+        }
+        with patch.dict(sys.modules, ble):
+            split = Split(split_type=SplitType.BLE)
+        split.UARTService = 'uart'
+        split.ProvideServicesAdvertisement = lambda uart: ('advertisement', uart)
+        split._ble = FakeRadio()
+        split._is_target = is_target
+        return split
+
+    def step(self, split, keyboard):
+        split.before_matrix_scan(keyboard)
+
+    def test_initiator_scans_in_slices(self):
+        split = self.make_split(False)
+        keyboard = make_keyboard()
+        self.step(split, keyboard)
+        for _ in range(3):
+            self.step(split, keyboard)
+        self.assertEqual(split._ble.scans, 3)
+        self.assertIsNone(split._uart)
+
+        # Too far away the first time around.
+        split._ble.seen += [advertisement('far', rssi=-90), advertisement('peer')]
+        self.step(split, keyboard)
+        self.step(split, keyboard)
+        self.assertIsNotNone(split._uart)
+        self.assertEqual(split.peer_address, 'peer')
+
+    def test_initiator_reconnects_to_peer(self):
+        split = self.make_split(False)
+        keyboard = make_keyboard()
+        split.peer_address = 'peer'
+        self.step(split, keyboard)
+        split._ble.seen += [advertisement('other'), advertisement('peer', rssi=-90)]
+        self.step(split, keyboard)
+        self.assertIsNone(split._uart)
+        self.step(split, keyboard)
+        self.assertIsNotNone(split._uart)
+
+        # Lost connection: wait out the backoff before scanning again.
+        split._uart_connection.connected = False
+        self.step(split, keyboard)
+        self.assertIsNone(split._uart)
+        scans = split._ble.scans
+        self.step(split, keyboard)
+        self.step(split, keyboard)
+        self.assertEqual(split._ble.scans, scans)
+        clock.advance(100)
+        self.step(split, keyboard)
+        self.step(split, keyboard)
+        self.assertEqual(split._ble.scans, scans + 1)
+
+    def test_initiator_reuses_connection(self):
+        split = self.make_split(False)
+        keyboard = make_keyboard()
+        # Still connected to the other half, e.g. after a soft reload, and to
+        # the host.
+        uart = FakeUART()
+        split._ble.connections = (FakeConnection(), FakeConnection(uart))
+        self.step(split, keyboard)
+        self.assertEqual(split._ble.scans, 0)
+        self.assertIs(split._uart, uart)
+        self.assertIs(split._uart_connection, split._ble.connections[1])
+        self.assertEqual(split._uart_connection.connection_interval, 11.25)
+
+    def test_target_backoff(self):
+        split = self.make_split(True)
+        keyboard = make_keyboard()
+        split._uart = FakeUART()
+        keyboard.hid_type = None
+        self.step(split, keyboard)
+        self.assertIsNotNone(split._ble.advertising)
+
+        # Nobody answers: back off, then advertise again.
+        clock.advance(5000)
+        self.step(split, keyboard)
+        self.assertIsNone(split._ble.advertising)
+        self.assertEqual(split._ble_backoff, 200)
+        clock.advance(100)
+        self.step(split, keyboard)
+        self.assertIsNotNone(split._ble.advertising)
+
+        # The new connection is the other half.
+        uart = split._uart
+        split._ble.connections = (FakeConnection(),)
+        self.step(split, keyboard)
+        self.assertIsNone(split._ble.advertising)
+        self.assertIs(split._uart_connection, split._ble.connections[0])
+        self.assertIs(split._uart, uart)
+        self.assertEqual(split._ble_backoff, 100)
+
+    def test_target_ignores_host(self):
+        split = self.make_split(True)
+        keyboard = make_keyboard()
+        split._uart = FakeUART()
+        keyboard.hid_type = None
+        self.step(split, keyboard)
+        self.assertIsNotNone(split._ble.advertising)
+
+        # A bonded host reconnects while the split is advertising.
+        host = FakeConnection(paired=True)
+        split._ble.connections = (host,)
+        self.step(split, keyboard)
+        self.assertIsNotNone(split._ble.advertising)
+        self.assertIsNone(split._uart_connection)
+
+        peer = FakeConnection()
+        split._ble.connections = (host, peer)
+        self.step(split, keyboard)
+        self.assertIsNone(split._ble.advertising)
+        self.assertIs(split._uart_connection, peer)
+
+    def test_no_digest(self):
+        split = self.make_split(False)
+        split.BLERadio = FakeRadio
+        split.split_side = SplitSide.RIGHT
+        keyboard = make_keyboard()
+        keyboard.hid_type = None
+        keyboard.extensions = []
+        keyboard.coord_mapping = tuple(range(8))
+        keyboard.matrix = [SimpleNamespace(key_count=4, offset=0, coord_mapping=[3])]
+        split.during_bootup(keyboard)
+        self.assertEqual(split._digest_count, 0)
+
+        split._uart = FakeUART()
+        split._digest[1] = split._digest_count = 8
+        clock.advance(split.digest_interval)
+        split.before_hid_send(make_keyboard())
+        # The target only understands bare key events.
+        self.assertEqual(split._uart.writes, [])
+
+
+if __name__ == '__main__':
+    unittest.main()